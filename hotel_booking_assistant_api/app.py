@@ -1,21 +1,28 @@
 """ Main file for Hotel-Booking-Assistant API """
 
 # IMPORTS
-import json
 from werkzeug.exceptions import HTTPException
 from werkzeug.routing import BaseConverter
 from flask_restful import Api
-from flask import Response, request, send_from_directory
-from orm import Booking, Customer, app, BookingAssistantBuilder, create_error_response
-from static.constants import LINK_RELATIONS_URL, MASON
+from flask import Flask, current_app, request, send_from_directory
+from sqlalchemy.orm import joinedload
+from orm import Hotel, Room, Booking, Customer, db, BookingAssistantBuilder, create_error_response
+from config import load_config, apply_sqlite_pragmas
+from occupancy import init_occupancy
+from searchcache import init_search_cache
+from instrumentation import init_instrumentation
+from metrics import init_metrics
+from render import mason_response
+from static.constants import LINK_RELATIONS_URL
 from resources.apikeycollection import ApiKeyCollection
 from resources.roomcollection import RoomCollection
 from resources.customeritem import CustomerItem
 from resources.customercollection import CustomerCollection
 from resources.bookingitem import BookingItem
 from resources.bookingcollection import BookingCollection
-
-api = Api(app)
+from resources.bookingbatch import BookingBatch
+from resources.bookingexport import BookingExport
+from resources.hoteloccupancy import HotelOccupancy
 
 class CustomerConverter(BaseConverter):
     """
@@ -37,12 +44,34 @@ class CustomerConverter(BaseConverter):
     def to_url(self, value):
         return str(value.id)
 
+class HotelConverter(BaseConverter):
+    """
+    Base converter for Hotel
+    """
+    def to_python(self, value):
+        hotel_db = Hotel.query.filter_by(name=value).first()
+        if hotel_db is None:
+            raise HTTPException(
+                response=create_error_response(
+                    404,
+                    "NotFound",
+                    f'Hotel with name: {value} was not found!')
+                )
+        return hotel_db
+
+    def to_url(self, value):
+        return value.name
+
 class BookingConverter(BaseConverter):
     """
-    Base converter for Booking
+    Base converter for Booking, loads the room, hotel and customer used by
+    authorization, serialization and booking changes in the same query
     """
     def to_python(self, value):
-        booking_db = Booking.query.filter_by(booking_ref=value).first()
+        booking_db = Booking.query.options(
+            joinedload(Booking.room).joinedload(Room.hotel),
+            joinedload(Booking.customer)
+            ).filter_by(booking_ref=value).first()
         if booking_db is None:
             # allow 405 to be raised (no double exceptions)
             if request.method != "POST":
@@ -57,7 +86,6 @@ class BookingConverter(BaseConverter):
     def to_url(self, value):
         return str(value.booking_ref)
 
-@app.route("/api/")
 def entry_point():
     """
     Entry point to API
@@ -73,23 +101,67 @@ def entry_point():
     body.add_control_add_customer()
     body.add_control_add_apikey()
     body.add_control_delete_apikey()
-    return Response(json.dumps(body), mimetype=MASON, status=200)
+    return mason_response(body, 200)
 
-@app.route(LINK_RELATIONS_URL)
 def send_link_relations_html():
     """
     Get link relation document (HTML)
     """
-    return send_from_directory(app.static_folder, "links-relations.html")
-
-# add converters
-app.url_map.converters["customer"] = CustomerConverter
-app.url_map.converters["booking"] = BookingConverter
-
-# add resources
-api.add_resource(ApiKeyCollection, "/api/keys/", endpoint = "apikeycollection")
-api.add_resource(RoomCollection, "/api/rooms/", endpoint = "roomcollection")
-api.add_resource(CustomerItem, "/api/customers/<customer:customer>/", endpoint = "customer")
-api.add_resource(CustomerCollection, "/api/customers/", endpoint = "customercollection")
-api.add_resource(BookingItem, "/api/bookings/<booking:booking>/", endpoint = "booking")
-api.add_resource(BookingCollection, "/api/bookings/", endpoint = "bookingcollection")
+    return send_from_directory(current_app.static_folder, "links-relations.html")
+
+def init_swagger(app):
+    """
+    Serve the API documentation with Flasgger, imported here so that
+    applications without docs never load it
+    """
+    from flasgger import Swagger
+    Swagger(app, template_file=app.config["SWAGGER_TEMPLATE_FILE"])
+
+def create_app(config=None):
+    """
+    Application factory. Settings are read by config.load_config(), the
+    given mapping overrides everything else (used by tests).
+    """
+    app = Flask(__name__)
+    load_config(app, config)
+
+    # bind database and tune SQLite connections
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+        init_instrumentation(app, db.engine)
+
+    # build the room occupancy index from the database
+    init_occupancy(app)
+    init_search_cache(app)
+    init_metrics(app)
+
+    if app.config["SWAGGER_ENABLED"]:
+        init_swagger(app)
+
+    # add converters
+    app.url_map.converters["customer"] = CustomerConverter
+    app.url_map.converters["booking"] = BookingConverter
+    app.url_map.converters["hotel"] = HotelConverter
+
+    # add views
+    app.add_url_rule("/api/", view_func=entry_point)
+    app.add_url_rule(LINK_RELATIONS_URL, view_func=send_link_relations_html)
+
+    # add resources
+    api = Api(app)
+    api.add_resource(ApiKeyCollection, "/api/keys/", endpoint = "apikeycollection")
+    api.add_resource(RoomCollection, "/api/rooms/", endpoint = "roomcollection")
+    api.add_resource(CustomerItem, "/api/customers/<customer:customer>/", endpoint = "customer")
+    api.add_resource(CustomerCollection, "/api/customers/", endpoint = "customercollection")
+    api.add_resource(BookingItem, "/api/bookings/<booking:booking>/", endpoint = "booking")
+    api.add_resource(BookingCollection, "/api/bookings/", endpoint = "bookingcollection")
+    api.add_resource(BookingBatch, "/api/bookings/batch/", endpoint = "bookingbatch")
+    api.add_resource(BookingExport, "/api/bookings/export/", endpoint = "bookingexport")
+    api.add_resource(HotelOccupancy, "/api/hotels/<hotel:hotel>/occupancy/", endpoint = "hoteloccupancy")
+
+    # precompute hypermedia controls shared by every response (once per process)
+    if not BookingAssistantBuilder.fragments:
+        BookingAssistantBuilder.build_fragments()
+
+    return app
@@ -0,0 +1,212 @@
+"""
+ASGI entry point for Hotel-Booking-Assistant API
+
+Serve with any ASGI server that accepts an application factory, e.g.
+    uvicorn --factory asgi:create_asgi_app --port 5000
+Requires asgiref (pip install asgiref).
+"""
+
+# IMPORTS
+import asyncio
+import io
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+
+# response chunks a worker thread may produce ahead of a slow client
+RESPONSE_QUEUE_SIZE = 16
+
+class ClientDisconnected(Exception):
+
+    """ The client went away while the response was being produced """
+
+def build_environ(scope, body, duplicate_header_limit=100):
+    """
+    WSGI environ of an ASGI http scope and its complete request body.
+    Raises ValueError if a header is repeated more than duplicate_header_limit times.
+    """
+    script_name = scope.get("root_path", "").encode("utf8").decode("latin1")
+    path_info = scope["path"].encode("utf8").decode("latin1")
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        }
+    if scope.get("client") is not None:
+        environ["REMOTE_ADDR"] = scope["client"][0]
+
+    headers = defaultdict(list)
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        if name not in ("CONTENT_LENGTH", "CONTENT_TYPE"):
+            name = "HTTP_" + name
+        if duplicate_header_limit and len(headers[name]) >= duplicate_header_limit:
+            raise ValueError(f"Too many duplicate headers: {name}")
+        headers[name].append(value.decode("latin1"))
+    for name, values in headers.items():
+        environ[name] = ",".join(values)
+    return environ
+
+class WsgiCall:
+
+    """
+    One WSGI call run in a worker thread. The response is handed to the
+    event loop through a bounded queue, so the thread is released as soon
+    as the application has produced it and never waits on the network
+    unless the client falls RESPONSE_QUEUE_SIZE chunks behind.
+    """
+
+    def __init__(self, wsgi_application, loop):
+        self.wsgi_application = wsgi_application
+        self.loop = loop
+        self.messages = asyncio.Queue(maxsize=RESPONSE_QUEUE_SIZE)
+        self.disconnected = False
+        self.response_start = None
+        self.response_started = False
+
+    def put(self, message):
+        """ Queue an ASGI message for the event loop (worker thread) """
+        if self.disconnected:
+            raise ClientDisconnected()
+        asyncio.run_coroutine_threadsafe(self.messages.put(message), self.loop).result()
+
+    def start_response(self, status, response_headers, exc_info=None):
+        """ WSGI start_response callable """
+        if exc_info is not None and self.response_started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        if self.response_start is not None and exc_info is None:
+            raise ValueError("start_response called a second time without exc_info")
+        self.response_start = {
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in response_headers],
+            }
+        return self.write
+
+    def write(self, data):
+        """ Legacy WSGI write callable """
+        if not self.response_started:
+            self.response_started = True
+            self.put(self.response_start)
+        if data:
+            self.put({"type": "http.response.body", "body": data, "more_body": True})
+
+    def run(self, environ):
+        """ Run the application and queue its whole response (worker thread) """
+        try:
+            iterable = self.wsgi_application(environ, self.start_response)
+            try:
+                for data in iterable:
+                    self.write(data)
+            finally:
+                if hasattr(iterable, "close"):
+                    iterable.close()
+            self.write(b"")
+            self.put({"type": "http.response.body", "body": b"", "more_body": False})
+        except ClientDisconnected:
+            pass
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+
+    """
+    ASGI application serving a WSGI application from a bounded thread pool.
+    The request body is read and the response is written by the event loop,
+    so a worker thread is held only while the application runs and slow
+    clients do not tie up the pool.
+    """
+
+    def __init__(self, wsgi_application, threads, duplicate_header_limit=100):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError("WSGI wrapper received a non-HTTP scope")
+
+        # read the whole request body before a worker thread is taken
+        body = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        try:
+            environ = build_environ(scope, b"".join(body), self.duplicate_header_limit)
+        except ValueError:
+            await send({"type": "http.response.start", "status": 400, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"Bad Request: Too many duplicate headers"})
+            return
+
+        loop = asyncio.get_running_loop()
+        call = WsgiCall(self.wsgi_application, loop)
+        done = loop.run_in_executor(self.executor, call.run, environ)
+        try:
+            await self.send_response(call, done, send)
+        finally:
+            # let a worker blocked on a full queue see the disconnect
+            call.disconnected = True
+            while not call.messages.empty():
+                call.messages.get_nowait()
+        await done
+
+    @staticmethod
+    async def send_response(call, done, send):
+        """
+        Send queued response messages until the last body message, or until
+        the worker thread fails
+        """
+        while True:
+            get = asyncio.ensure_future(call.messages.get())
+            await asyncio.wait((get, done), return_when=asyncio.FIRST_COMPLETED)
+            if not get.done():
+                # the worker finished without a last message, i.e. it raised
+                get.cancel()
+                if call.messages.empty():
+                    return
+                get = asyncio.ensure_future(call.messages.get())
+            message = await get
+            await send(message)
+            if message["type"] == "http.response.body" and not message["more_body"]:
+                return
+
+    async def lifespan(self, receive, send):
+        """
+        Accept server startup and release the thread pool at shutdown
+        """
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+def create_asgi_app(config=None):
+    """
+    Build the application with create_app() and wrap it for ASGI servers
+    """
+    flask_app = create_app(config)
+    return PooledWsgiToAsgi(flask_app, flask_app.config["ASGI_THREADS"])
@@ -0,0 +1,185 @@
+""" Room availability checks for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from sqlalchemy import and_, exists
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import contains_eager
+from werkzeug.exceptions import HTTPException
+from orm import Hotel, Room, Booking, db, create_error_response
+from instrumentation import timed
+
+# attempts to get the allocation lock before giving up with 503
+ALLOCATION_RETRIES = 3
+# first back-off in seconds, doubled on every attempt
+ALLOCATION_BACKOFF = 0.05
+
+def overlaps(check_in, check_out, other_check_in, other_check_out):
+    """
+    Half-open interval overlap test: [check_in, check_out) against
+    [other_check_in, other_check_out). Back-to-back stays do not overlap,
+    the check-out day of one booking is free for the next check-in.
+    """
+    return check_in < other_check_out and other_check_in < check_out
+
+class RoomIntervals:
+
+    """
+    Sorted booking intervals of a single room. Intervals are kept ordered by
+    check-in together with a running maximum of check-out dates, so a stay can
+    be tested with a single binary search even if history contains overlaps.
+    """
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals)
+        self._reindex()
+
+    def _reindex(self):
+        """ Rebuild the check-in keys and the running check-out maximum """
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = []
+        latest = None
+        for _, check_out in self.intervals:
+            if latest is None or check_out > latest:
+                latest = check_out
+            self.max_ends.append(latest)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def is_free(self, check_in, check_out):
+        """ True if no stored interval overlaps [check_in, check_out) """
+        # intervals starting at or after check_out can never overlap
+        idx = bisect_left(self.starts, check_out)
+        return idx == 0 or self.max_ends[idx - 1] <= check_in
+
+    def add(self, check_in, check_out):
+        """ Store a new booked interval """
+        insort(self.intervals, (check_in, check_out))
+        self._reindex()
+
+    def remove(self, check_in, check_out):
+        """ Drop a booked interval (no-op if it is not stored) """
+        try:
+            self.intervals.remove((check_in, check_out))
+        except ValueError:
+            return
+        self._reindex()
+
+def overlap_clause(check_in, check_out):
+    """
+    SQL predicate for bookings overlapping [check_in, check_out)
+    """
+    return and_(Booking.check_in < check_out, Booking.check_out > check_in)
+
+def room_booked_clause(check_in, check_out, exclude=None):
+    """
+    Correlated EXISTS clause which is true for rooms that have a booking
+    overlapping the requested stay
+    """
+    clause = exists().where(Booking.room_id == Room.id, overlap_clause(check_in, check_out))
+    if exclude is not None:
+        clause = clause.where(Booking.booking_ref != exclude.booking_ref)
+    return clause
+
+def _acquire_allocation_lock(hotel_ids, room_types):
+    """
+    Start the write transaction used for room allocation. SQLite has no row
+    locks, BEGIN IMMEDIATE takes the database write lock up front so other
+    writers wait until this transaction ends. Other databases lock the
+    candidate room rows (in id order to avoid deadlocks) with FOR UPDATE.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == "sqlite":
+        # nothing to do if this transaction already holds the write lock
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        return
+    db.session.query(Room.id).filter(
+        Room.hotel_id.in_(hotel_ids),
+        Room.type.in_(room_types)
+        ).order_by(Room.id).with_for_update().all()
+
+@timed("lock")
+def lock_allocation(hotel_ids, room_types):
+    """
+    Serialize room allocation for the given hotels and room types until the
+    session is committed or rolled back. Availability must be checked after
+    this call so that two requests can never pick the same free room.
+    Lock timeouts are retried a few times with back-off, after that the
+    request fails with 503 instead of waiting indefinitely.
+    """
+    for attempt in range(ALLOCATION_RETRIES):
+        try:
+            _acquire_allocation_lock(hotel_ids, room_types)
+            return
+        except OperationalError:
+            db.session.rollback()
+            time.sleep(ALLOCATION_BACKOFF * 2 ** attempt)
+
+    response = create_error_response(
+        503,
+        "ServiceUnavailable",
+        "Rooms are being booked by other requests, try again later")
+    response.headers["Retry-After"] = "1"
+    raise HTTPException(response=response)
+
+@timed("availability")
+def find_free_room(hotel_id, room_type, check_in, check_out, exclude=None):
+    """
+    Return the first room of the given hotel and type that is free for the
+    whole stay, or None if every room is taken
+    """
+    return Room.query.filter(
+        Room.hotel_id == hotel_id,
+        Room.type == room_type,
+        ~room_booked_clause(check_in, check_out, exclude)
+        ).order_by(Room.id).first()
+
+def available_rooms_query(country=None, city=None, room_type=None, check_in=None, check_out=None,
+                          free_room_ids=None):
+    """
+    Single query for room search: rooms are joined with their hotel (loaded
+    into Room.hotel for serialization) and rooms with overlapping bookings are
+    dropped with NOT EXISTS. Every filter is optional. Ids of the rooms free
+    for the stay can be given if already known (occupancy index), they
+    replace the NOT EXISTS check.
+    """
+    query = Room.query.join(Room.hotel).options(contains_eager(Room.hotel))
+    if country:
+        query = query.filter(Hotel.country == country)
+    if city:
+        query = query.filter(Hotel.city == city)
+    if room_type:
+        query = query.filter(Room.type == room_type)
+    if free_room_ids is not None:
+        query = query.filter(Room.id.in_(free_room_ids))
+    elif check_in and check_out:
+        query = query.filter(~room_booked_clause(check_in, check_out))
+    return query.order_by(Room.id)
+
+@timed("availability")
+def booking_snapshot(hotel_ids, room_types, check_in, check_out):
+    """
+    Load the bookings overlapping [check_in, check_out) for rooms of the given
+    hotels and types with one query. Returns RoomIntervals per room id, rooms
+    without bookings get an empty structure.
+    """
+    rows = db.session.query(Booking.room_id, Booking.check_in, Booking.check_out).join(
+        Booking.room
+        ).filter(
+        Room.hotel_id.in_(hotel_ids),
+        Room.type.in_(room_types),
+        overlap_clause(check_in, check_out)
+        )
+
+    intervals = defaultdict(list)
+    for room_id, booked_in, booked_out in rows:
+        intervals[room_id].append((booked_in, booked_out))
+
+    snapshot = defaultdict(RoomIntervals)
+    for room_id, booked in intervals.items():
+        snapshot[room_id] = RoomIntervals(booked)
+    return snapshot
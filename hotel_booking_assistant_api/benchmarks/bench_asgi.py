@@ -0,0 +1,150 @@
+"""
+Concurrency benchmark for WSGI and ASGI serving
+
+Starts the API on a populated temporary database once with the threaded
+Werkzeug server (flask run) and once with uvicorn through asgi.py, then
+keeps CONNECTIONS keep-alive connections busy with room searches for
+DURATION seconds and prints requests/s and latency percentiles. The load
+generator uses plain asyncio streams so it needs no HTTP client package.
+
+Run from the hotel_booking_assistant_api directory (uvicorn must be installed
+for the ASGI row):
+    python benchmarks/bench_asgi.py [connections] [duration]
+"""
+
+# IMPORTS
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+CONNECTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+DURATION = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+PORT = 5077
+PATH = "/api/rooms/?country=Finland&city=Oulu&check_in=2024-03-05&check_out=2024-03-07"
+SERVERS = [
+    ("wsgi, flask run --with-threads", [sys.executable, "-m", "flask", "--app", "app:create_app", "run",
+                                        "--with-threads", "--port", str(PORT)]),
+    ("asgi, uvicorn + asgi.py", [sys.executable, "-m", "uvicorn", "--factory", "asgi:create_asgi_app",
+                                 "--port", str(PORT), "--log-level", "warning", "--backlog", "2048"]),
+]
+
+async def fetch(reader, writer, request):
+    """
+    Send one request on an open connection, return status and whether the
+    server keeps the connection open
+    """
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {key.lower(): value.strip() for key, _, value in (line.partition(":") for line in lines[1:] if line)}
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+    keep_alive = lines[0].startswith("HTTP/1.1") and headers.get("connection", "").lower() != "close"
+    return int(lines[0].split()[1]), keep_alive
+
+async def client(request, deadline, latencies, errors):
+    """
+    Issue requests back to back on one connection until the deadline,
+    reconnecting whenever the server closes it
+    """
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+            status, keep_alive = await fetch(reader, writer, request)
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append(None)
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(status)
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+async def load(request):
+    """
+    Run CONNECTIONS clients for DURATION seconds
+    """
+    latencies, errors = [], []
+    deadline = time.perf_counter() + DURATION
+    await asyncio.gather(*(client(request, deadline, latencies, errors) for _ in range(CONNECTIONS)))
+    return latencies, errors
+
+def wait_for_server(process):
+    """
+    Poll the entry point until the server answers
+    """
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{PORT}/api/", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+def api_key_request():
+    """
+    Create an API key through the running server, return the raw GET request
+    """
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{PORT}/api/keys/", method="POST",
+        data=json.dumps({"username": "aino", "password": "root"}).encode(),
+        headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        key = response.headers["Hotels-Api-Key"]
+    return (f"GET {PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Hotels-Api-Key: {key}\r\nAdmin-User-Name: aino\r\n\r\n").encode()
+
+def run():
+    """
+    Benchmark every server and print a summary row for each
+    """
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{CONNECTIONS} connections, {DURATION:.0f} s per server")
+    print(f"{'server':<32} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    db_dir = tempfile.mkdtemp()
+    try:
+        for idx, (name, command) in enumerate(SERVERS):
+            env = dict(os.environ, BOOKING_ASSISTANT_SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_dir}/{idx}.db",
+                       BOOKING_ASSISTANT_SWAGGER_ENABLED="false",
+                       # every request is the same search, measure it rather than the search cache
+                       BOOKING_ASSISTANT_SEARCH_CACHE_ENABLED="false")
+            subprocess.run([sys.executable, "populate.py"], cwd=here, env=env, check=True, capture_output=True)
+            process = subprocess.Popen(command, cwd=here, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_server(process)
+                latencies, errors = asyncio.run(load(api_key_request()))
+            except RuntimeError as e:
+                print(f"{name:<32} {e}")
+                continue
+            finally:
+                process.terminate()
+                process.wait()
+            latencies.sort()
+            print(f"{name:<32} {len(latencies) / DURATION:>8.0f} "
+                  f"{statistics.median(latencies) * 1000:>8.1f} "
+                  f"{latencies[int(len(latencies) * 0.99)] * 1000:>8.1f} {len(errors):>7}")
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,108 @@
+"""
+Benchmark for room availability checks
+
+Compares the old per-day date list expansion and a linear scan of the
+bookings against the half-open interval checks in availability.py while the
+booking history of a room grows.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_availability.py
+"""
+
+# IMPORTS
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+from sqlalchemy import create_engine, select, insert
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from orm import db, Hotel, Room, Booking
+from availability import overlaps, RoomIntervals, room_booked_clause
+
+HISTORY_SIZES = [10, 100, 365, 1000]
+ROOMS = 20
+STAY = 5
+START = date(2024, 1, 1)
+
+class _Stay:
+
+    """ Lightweight stand-in for a Booking row """
+
+    def __init__(self, check_in, check_out):
+        self.check_in = check_in
+        self.check_out = check_out
+
+def make_history(size):
+    """
+    Back-to-back stays of three nights with a free night in between
+    """
+    stays = []
+    for idx in range(size):
+        check_in = START + timedelta(days=idx * 4)
+        stays.append(_Stay(check_in, check_in + timedelta(days=3)))
+    return stays
+
+def legacy_free(bookings, check_in, check_out):
+    """
+    Previous implementation: expand every booking into a list of days
+    """
+    days_to_book = [check_in + timedelta(days=day) for day in range((check_out - check_in).days)]
+    dates_booked = []
+    for booking in bookings:
+        duration = booking.check_out - booking.check_in
+        dates_booked.extend([booking.check_in + timedelta(days=day) for day in range(duration.days)])
+    return not any(day_to_book in dates_booked for day_to_book in days_to_book)
+
+def linear_free(bookings, check_in, check_out):
+    """
+    Baseline: test every booking for overlap with the requested stay
+    """
+    return not any(overlaps(check_in, check_out, booking.check_in, booking.check_out)
+                   for booking in bookings)
+
+def sql_engine(size):
+    """
+    In-memory database with ROOMS rooms sharing the same history
+    """
+    engine = create_engine("sqlite://")
+    db.metadata.create_all(engine)
+    history = make_history(size)
+    with engine.begin() as conn:
+        conn.execute(insert(Hotel), [{"id": 1, "name": "Bench", "country": "FI", "city": "Oulu", "street": "-"}])
+        conn.execute(insert(Room), [
+            {"id": room_id, "hotel_id": 1, "number": room_id, "type": "single", "price": 80}
+            for room_id in range(1, ROOMS + 1)])
+        conn.execute(insert(Booking), [
+            {"room_id": room_id, "customer_id": None, "check_in": stay.check_in,
+             "check_out": stay.check_out, "payment": "cash"}
+            for room_id in range(1, ROOMS + 1) for stay in history])
+    return engine
+
+def run():
+    """
+    Time one availability search over ROOMS rooms for each history size
+    """
+    print(f"{'history':>8} {'legacy ms':>10} {'linear ms':>10} {'sorted ms':>10} {'sql ms':>10} {'speedup':>8}")
+    for size in HISTORY_SIZES:
+        history = make_history(size)
+        # request the free night in the middle of the history
+        check_in = START + timedelta(days=(size // 2) * 4 + 3)
+        check_out = check_in + timedelta(days=STAY)
+        intervals = RoomIntervals((stay.check_in, stay.check_out) for stay in history)
+        engine = sql_engine(size)
+        query = select(Room.id).where(~room_booked_clause(check_in, check_out))
+
+        def sql_search():
+            with engine.connect() as conn:
+                conn.execute(query).all()
+
+        number = 5
+        legacy = timeit.timeit(lambda: [legacy_free(history, check_in, check_out) for _ in range(ROOMS)], number=number)
+        linear = timeit.timeit(lambda: [linear_free(history, check_in, check_out) for _ in range(ROOMS)], number=number)
+        indexed = timeit.timeit(lambda: [intervals.is_free(check_in, check_out) for _ in range(ROOMS)], number=number)
+        sql = timeit.timeit(sql_search, number=number)
+        print(f"{size:>8} {legacy / number * 1000:>10.3f} {linear / number * 1000:>10.3f} "
+              f"{indexed / number * 1000:>10.3f} {sql / number * 1000:>10.3f} {legacy / linear:>7.0f}x")
+
+if __name__ == "__main__":
+    run()
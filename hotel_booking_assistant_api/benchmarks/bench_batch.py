@@ -0,0 +1,85 @@
+"""
+Benchmark for batch booking creation
+
+Books the same group of rooms once through N single POST /api/bookings/
+requests and once through a single POST /api/bookings/batch/ request.
+A temporary hotel, admin and customer are created in the application
+database and removed again afterwards.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_batch.py [group size]
+"""
+
+# IMPORTS
+import os
+import sys
+import time
+import uuid
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db, Hotel, Room, Booking, Customer, Admin, ApiKey
+
+app = create_app({"SWAGGER_ENABLED": False})
+
+GROUP_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+def setup(tag):
+    """
+    Create the temporary hotel with GROUP_SIZE double rooms
+    """
+    hotel = Hotel(name=f"Bench {tag}", country="Finland", city="Bench", street="-")
+    db.session.add(hotel)
+    db.session.add_all([Room(number=idx, type="double", price=100, hotel=hotel) for idx in range(GROUP_SIZE)])
+    db.session.add(Admin(username=f"bench-{tag}", password="bench", hotel=hotel))
+    customer = Customer(name="Bench", phone="-", mail=f"bench-{tag}@example.com", address="-")
+    db.session.add(customer)
+    db.session.commit()
+    return hotel.id, customer.id
+
+def teardown(tag, hotel_id, customer_id):
+    """
+    Remove everything created by setup() and the benchmark
+    """
+    Booking.query.filter_by(customer_id=customer_id).delete()
+    ApiKey.query.filter_by(admin_username=f"bench-{tag}").delete()
+    Admin.query.filter_by(username=f"bench-{tag}").delete()
+    Room.query.filter_by(hotel_id=hotel_id).delete()
+    Hotel.query.filter_by(id=hotel_id).delete()
+    Customer.query.filter_by(id=customer_id).delete()
+    db.session.commit()
+
+def run():
+    """
+    Print wall time of both ways of booking the group
+    """
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        db.create_all()
+        hotel_id, customer_id = setup(tag)
+
+    try:
+        client = app.test_client()
+        response = client.post("/api/keys/", json={"username": f"bench-{tag}", "password": "bench"})
+        headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": f"bench-{tag}"}
+        booking = {"customer_id": customer_id, "hotel": f"Bench {tag}", "room_type": "double",
+                   "payment": "credit", "check_in": "2030-01-01", "check_out": "2030-01-05"}
+
+        start = time.perf_counter()
+        for _ in range(GROUP_SIZE):
+            assert client.post("/api/bookings/", json=booking, headers=headers).status_code == 201
+        single = time.perf_counter() - start
+
+        batch = [dict(booking, check_in="2030-02-01", check_out="2030-02-05")] * GROUP_SIZE
+        start = time.perf_counter()
+        response = client.post("/api/bookings/batch/", json=batch, headers=headers)
+        batched = time.perf_counter() - start
+        assert all(item["status"] == "created" for item in response.json["items"])
+
+        print(f"{GROUP_SIZE} single POSTs: {single * 1000:8.1f} ms")
+        print(f"1 batch POST:    {batched * 1000:8.1f} ms ({single / batched:.1f}x faster)")
+    finally:
+        with app.app_context():
+            teardown(tag, hotel_id, customer_id)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark for building Mason hypermedia
+
+Times entry_point() and CustomerItem.get for a single request each, first
+with every control schema rebuilt per call (the behaviour before
+BookingAssistantBuilder.build_fragments()) and then with the shared
+fragments. The database is not touched: the customer is a transient object
+and the API key is served from the verified key cache.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_controls.py
+"""
+
+# IMPORTS
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import url_for
+from app import create_app, entry_point
+from orm import ApiKey, Booking, Customer, BookingAssistantBuilder
+from keyFunc import AdminIdentity, api_key_cache
+from resources.customeritem import CustomerItem
+
+app = create_app({"SWAGGER_ENABLED": False})
+
+NUMBER = 20000
+HEADERS = {"Hotels-Api-Key": "bench-key", "Admin-User-Name": "bench"}
+SCHEMAS = {
+    "add-apikey": ApiKey.json_schema,
+    "add-customer": Customer.json_schema,
+    "add-booking": Booking.json_schema,
+    "edit-customer": Customer.json_schema,
+    "edit-booking": Booking.json_schema,
+}
+
+def add_control_per_call(self, ctrl_name, fragment, href=None):
+    """
+    Baseline: build the control and its schema on every call
+    """
+    if href is None:
+        endpoint, query = self.collection_hrefs[fragment]
+        href = url_for(endpoint) + query
+    control = dict(self.fragments[fragment], href=href)
+    if fragment in SCHEMAS:
+        control["schema"] = SCHEMAS[fragment]()
+    self.setdefault("@controls", {})[ctrl_name] = control
+
+def run():
+    """
+    Print the average time per call in microseconds, before and after
+    """
+    api_key_cache.put("bench", ApiKey.key_hash("bench-key"), AdminIdentity("bench", [1], ["Hotel1"]))
+    customer = Customer(id=1, name="Matti Meikalainen", phone="0401234567",
+                        mail="matti@example.com", address="Matintie 1")
+    resource = CustomerItem()
+    shared = BookingAssistantBuilder.add_shared_control
+
+    print(f"{'us/call':<18} {'before':>8} {'after':>8}")
+    with app.test_request_context("/api/", headers=HEADERS):
+        for name, func in [("entry_point()", entry_point),
+                           ("CustomerItem.get", lambda: resource.get(customer))]:
+            timings = []
+            for add_control in (add_control_per_call, shared):
+                BookingAssistantBuilder.add_shared_control = add_control
+                timings.append(timeit.timeit(func, number=NUMBER) / NUMBER * 1e6)
+            print(f"{name:<18} {timings[0]:8.1f} {timings[1]:8.1f}")
+    BookingAssistantBuilder.add_shared_control = shared
+
+if __name__ == "__main__":
+    run()
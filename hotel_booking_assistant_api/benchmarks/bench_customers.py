@@ -0,0 +1,80 @@
+"""
+Benchmark for customer search
+
+Populates CUSTOMERS synthetic customers and times GET /api/customers/
+searches by name prefix and phone with and without their indexes (mail
+is always indexed by its unique constraint), and a deep page read by
+OFFSET against one read by keyset cursor (database query only).
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_customers.py
+"""
+
+# IMPORTS
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db, Admin, Customer, Hotel
+from pagination import NEXT, encode_cursor, keyset_page
+from populate import insert_chunks
+
+CUSTOMERS = 100000
+REPEAT = 50
+PAGE = 50
+
+SEARCHES = (
+    ("name prefix", "name=customer 9999"),
+    ("phone", "phone=%2B358000099999"),
+    )
+
+def timed(func):
+    """ Mean milliseconds of REPEAT calls """
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        func()
+    return (time.perf_counter() - started) * 1000 / REPEAT
+
+def run():
+    """
+    Print search and deep page times
+    """
+    with tempfile.TemporaryDirectory() as db_dir:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/customers.db", "SWAGGER_ENABLED": False})
+        with app.app_context():
+            db.create_all()
+            db.session.add(Hotel(name="Bench", street="Street 1", city="Oulu", country="Finland"))
+            db.session.add(Admin(username="bench", password="bench", hotel_id=1))
+            insert_chunks(Customer, ({
+                "id": customer, "name": f"Customer {customer}", "phone": f"+358{customer:09d}",
+                "mail": f"customer{customer}@example.com", "address": f"Street {customer}"
+                } for customer in range(1, CUSTOMERS + 1)))
+            db.session.commit()
+            db.session.execute(db.text("ANALYZE"))
+        client = app.test_client()
+        response = client.post("/api/keys/", json={"username": "bench", "password": "bench"})
+        headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "bench"}
+
+        def search(query):
+            assert client.get(f"/api/customers/?{query}", headers=headers).get_json()["items"]
+
+        indexed = {name: timed(lambda: search(query)) for name, query in SEARCHES}
+        with app.app_context():
+            for index in ("ix_customer_name_lower", "ix_customer_phone"):
+                db.session.execute(db.text(f"DROP INDEX {index}"))
+            db.session.commit()
+        for name, query in SEARCHES:
+            print(f"{name:<12} indexed {indexed[name]:>8.2f} ms   without index {timed(lambda: search(query)):>8.2f} ms")
+
+        # last page but one, by OFFSET and by keyset_page with a cursor past the previous row
+        offset = CUSTOMERS - 2 * PAGE
+        cursor = encode_cursor(NEXT, offset)
+        with app.app_context():
+            by_offset = timed(lambda: Customer.query.order_by(Customer.id).offset(offset).limit(PAGE).all())
+            by_keyset = timed(lambda: keyset_page(Customer.query, Customer.id, PAGE, cursor))
+        print(f"page at {offset}: OFFSET {by_offset:>8.2f} ms   keyset {by_keyset:>8.2f} ms")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,65 @@
+"""
+Benchmark for the booking export
+
+Populates synthetic datasets of growing size (see populate.py) and
+streams the CSV and NDJSON export of every booking through
+GET /api/bookings/export/ of the admin of each hotel in turn and through
+export_chunks for all hotels at once. Prints rows/sec and the peak
+Python memory of the all-hotels export (traced, so slower than the
+HTTP export), which should stay flat as the dataset grows.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_export.py
+"""
+
+# IMPORTS
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from export import export_chunks, export_rows
+from populate import populate_synthetic, SYNTHETIC_PASSWORD
+
+SIZES = ((1000, 20), (10000, 20))
+
+def run():
+    """
+    Print export throughput and memory per dataset size
+    """
+    print(f"{'bookings':>9} {'format':<7} {'HTTP rows/s':>12} {'traced rows/s':>15} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as db_dir:
+        for rooms, bookings_per_room in SIZES:
+            app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/export-{rooms}.db",
+                              "SWAGGER_ENABLED": False})
+            counts = populate_synthetic(rooms, bookings_per_room, app=app)
+            client = app.test_client()
+            hotel_headers = []
+            for hotel in range(1, counts["hotel"] + 1):
+                response = client.post("/api/keys/", json={"username": f"admin{hotel}", "password": SYNTHETIC_PASSWORD})
+                hotel_headers.append({"Hotels-Api-Key": response.headers["Hotels-Api-Key"],
+                                      "Admin-User-Name": f"admin{hotel}"})
+
+            for export_format in ("csv", "ndjson"):
+                started = time.perf_counter()
+                for headers in hotel_headers:
+                    response = client.get(f"/api/bookings/export/?format={export_format}", headers=headers)
+                    for _ in response.response:
+                        pass
+                http = counts["booking"] / (time.perf_counter() - started)
+
+                with app.app_context():
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    for _ in export_chunks(export_rows(), export_format):
+                        pass
+                    seconds = time.perf_counter() - started
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                print(f"{counts['booking']:>9} {export_format:<7} {http:>12.0f} "
+                      f"{counts['booking'] / seconds:>15.0f} {peak / 2**20:>8.2f}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,97 @@
+"""
+Benchmark for the hotel occupancy summary
+
+Builds one hotel with ROOMS rooms and about two years of bookings per room
+in a temporary SQLite database and times a WINDOW night occupancy summary
+computed from the database (one outer join query) and from the occupancy
+index, both for the counts alone and for the full
+GET /api/hotels/<hotel>/occupancy/ request.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_hotel_occupancy.py
+"""
+
+# IMPORTS
+import os
+import random
+import sys
+import tempfile
+import timeit
+from datetime import date, timedelta
+from sqlalchemy import insert
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db, Hotel, Room, Booking, Customer, Admin
+from occupancy import OccupancyIndex, count_nights, hotel_masks_from_db
+
+ROOMS = 500
+WINDOW = 90
+ORIGIN = date(2030, 1, 1)
+HORIZON = 730
+NUMBER = 20
+
+def populate():
+    """
+    Insert the synthetic hotel with Core bulk inserts
+    """
+    rng = random.Random(1)
+    db.session.execute(insert(Customer), [{"id": 1, "name": "Bench", "phone": "-", "mail": "b@example.com", "address": "-"}])
+    db.session.execute(insert(Hotel), [{"id": 1, "name": "Bench", "country": "Finland", "city": "Bench", "street": "-"}])
+    db.session.execute(insert(Admin), [{"username": "bench", "password": "bench", "hotel_id": 1}])
+    rooms, bookings = [], []
+    for room_id in range(1, ROOMS + 1):
+        rooms.append({"id": room_id, "hotel_id": 1, "number": room_id,
+                      "type": rng.choice(["single", "double", "suite"]), "price": 100})
+        night = ORIGIN
+        while night < ORIGIN + timedelta(days=HORIZON):
+            night += timedelta(days=rng.randint(0, 6))
+            stay = rng.randint(1, 7)
+            bookings.append({"room_id": room_id, "customer_id": 1, "payment": "cash",
+                             "check_in": night, "check_out": night + timedelta(days=stay)})
+            night += timedelta(days=stay)
+    db.session.execute(insert(Room), rooms)
+    db.session.execute(insert(Booking), bookings)
+    db.session.commit()
+    return len(bookings)
+
+def counts(masks):
+    """
+    Booked rooms per night for every room type
+    """
+    return {room_type: count_nights(room_masks, WINDOW) for room_type, room_masks in masks.items()}
+
+def run():
+    """
+    Print per-summary cost with and without the index
+    """
+    with tempfile.TemporaryDirectory() as db_dir:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/bench.db", "SWAGGER_ENABLED": False})
+        start = ORIGIN + timedelta(days=200)
+        end = start + timedelta(days=WINDOW)
+        with app.app_context():
+            db.create_all()
+            count = populate()
+            index = OccupancyIndex(ORIGIN, HORIZON)
+            index.rebuild()
+            app.extensions["occupancy"] = index
+            app.config["OCCUPANCY_MAX_AGE"] = 0
+
+            assert counts(index.hotel_masks(1, start, end)) == counts(hotel_masks_from_db(1, start, end))
+            sql_counts = timeit.timeit(lambda: counts(hotel_masks_from_db(1, start, end)), number=NUMBER) / NUMBER
+            index_counts = timeit.timeit(lambda: counts(index.hotel_masks(1, start, end)), number=NUMBER) / NUMBER
+
+        client = app.test_client()
+        response = client.post("/api/keys/", json={"username": "bench", "password": "bench"})
+        headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "bench"}
+        url = f"/api/hotels/Bench/occupancy/?start={start}&end={end}"
+        with_index = timeit.timeit(lambda: client.get(url, headers=headers), number=NUMBER) / NUMBER
+        app.extensions["occupancy"] = None
+        without_index = timeit.timeit(lambda: client.get(url, headers=headers), number=NUMBER) / NUMBER
+
+    print(f"{ROOMS} rooms, {count} bookings, {WINDOW} night window")
+    print(f"{'':<36} {'SQL ms':>8} {'index ms':>9}")
+    print(f"{'counts per type and night':<36} {sql_counts * 1000:>8.2f} {index_counts * 1000:>9.2f}")
+    print(f"{'GET /api/hotels/<hotel>/occupancy/':<36} {without_index * 1000:>8.2f} {with_index * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    run()
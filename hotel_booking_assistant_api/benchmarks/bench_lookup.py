@@ -0,0 +1,57 @@
+"""
+Benchmark for looking up bookings by reference
+
+Populates the 1k synthetic dataset (see populate.py) and fetches the
+REFS bookings of hotel Synth1 once with one GET /api/bookings/<ref>/
+per booking and once with GET /api/bookings/?refs=... in batches of
+BATCH, counting SQL statements of both.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_lookup.py
+"""
+
+# IMPORTS
+import os
+import sys
+import tempfile
+import time
+from sqlalchemy import event
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db
+from populate import populate_synthetic, SCALES, SYNTHETIC_PASSWORD
+
+REFS = 1000
+BATCH = 250
+
+def run():
+    """
+    Print time and SQL statements of single and batched lookups
+    """
+    with tempfile.TemporaryDirectory() as db_dir:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/lookup.db", "SWAGGER_ENABLED": False})
+        populate_synthetic(*SCALES["1k"], app=app)
+        client = app.test_client()
+        response = client.post("/api/keys/", json={"username": "admin1", "password": SYNTHETIC_PASSWORD})
+        headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "admin1"}
+
+        statements = [0]
+        def count(*args):
+            statements[0] += 1
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", count)
+
+        refs = list(range(1, REFS + 1))
+        for name, urls in (
+                ("one GET per booking", [f"/api/bookings/{ref}/" for ref in refs]),
+                (f"refs, {BATCH} per GET", [f"/api/bookings/?refs={','.join(map(str, refs[idx:idx + BATCH]))}"
+                                          for idx in range(0, REFS, BATCH)])):
+            statements[0] = 0
+            started = time.perf_counter()
+            for url in urls:
+                assert client.get(url, headers=headers).status_code == 200
+            seconds = time.perf_counter() - started
+            print(f"{name:<22} {len(urls):>5} requests {seconds * 1000:>8.1f} ms {statements[0]:>6} SQL statements")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,89 @@
+"""
+Benchmark for request metrics
+
+Times the recording done for every request (in-flight gauge, status
+counter and latency histogram) alone, single threaded and from THREADS
+threads at once, the scrape of a registry holding every endpoint, and a
+GET /api/customers/<customer>/ request with metrics enabled and disabled.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_metrics.py
+"""
+
+# IMPORTS
+import os
+import sys
+import tempfile
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from metrics import MetricsRegistry, render_metrics
+from populate import populate_db
+
+NUMBER = 100000
+REQUESTS = 2000
+THREADS = 8
+ENDPOINTS = ("roomcollection", "bookingcollection", "booking", "customer", "customercollection",
+             "bookingbatch", "hoteloccupancy", "apikeycollection")
+
+def record(registry, endpoint="booking"):
+    registry.request_started(endpoint)
+    registry.request_finished(endpoint, "GET", 200, 0.004)
+    registry.request_ended(endpoint)
+
+def request_cost(metrics_enabled, db_dir):
+    """
+    Mean time of one customer GET through the test client
+    """
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/bench-{metrics_enabled}.db",
+        "SWAGGER_ENABLED": False,
+        "METRICS_ENABLED": metrics_enabled,
+        })
+    populate_db(app)
+    client = app.test_client()
+    response = client.post("/api/keys/", json={"username": "aino", "password": "root"})
+    headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "aino"}
+    client.get("/api/customers/1/", headers=headers)
+    return timeit.timeit(lambda: client.get("/api/customers/1/", headers=headers), number=REQUESTS) / REQUESTS
+
+def run():
+    """
+    Print per-request recording cost, scrape cost and request overhead
+    """
+    registry = MetricsRegistry()
+    single = timeit.timeit(lambda: record(registry), number=NUMBER) / NUMBER
+    print(f"record, 1 thread        {single * 1e6:8.2f} us/request")
+
+    registry = MetricsRegistry()
+
+    def worker(_):
+        for _ in range(NUMBER // THREADS):
+            record(registry)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        threaded = timeit.timeit(lambda: list(executor.map(worker, range(THREADS))), number=1) / NUMBER
+    print(f"record, {THREADS} threads       {threaded * 1e6:8.2f} us/request")
+
+    registry = MetricsRegistry()
+    for endpoint in ENDPOINTS:
+        for status in (200, 201, 204, 400, 404, 409):
+            record(registry, endpoint)
+            registry.request_finished(endpoint, "POST", status, 0.03)
+    scrape = timeit.timeit(lambda: render_metrics(registry), number=1000) / 1000
+    print(f"scrape                  {scrape * 1e3:8.2f} ms")
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        try:
+            disabled = request_cost(False, db_dir)
+            enabled = request_cost(True, db_dir)
+        finally:
+            os.chdir(cwd)
+    print(f"GET customer, disabled  {disabled * 1e6:8.1f} us")
+    print(f"GET customer, enabled   {enabled * 1e6:8.1f} us")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,98 @@
+"""
+Benchmark for the room occupancy index
+
+Builds a synthetic city (HOTELS hotels with ROOMS rooms each, about two
+years of bookings per room) in a temporary SQLite database and compares a
+city-wide availability search done with the SQL NOT EXISTS check against
+the bitset index, both for the free room ids alone and for the full
+GET /api/rooms/ request.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_occupancy.py
+"""
+
+# IMPORTS
+import os
+import random
+import sys
+import tempfile
+import timeit
+from datetime import date, timedelta
+from sqlalchemy import insert
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db, Hotel, Room, Booking, Customer, Admin
+from availability import available_rooms_query
+from occupancy import OccupancyIndex
+
+HOTELS = 40
+ROOMS = 50
+ORIGIN = date(2030, 1, 1)
+HORIZON = 730
+NUMBER = 20
+
+def populate():
+    """
+    Insert the synthetic city with Core bulk inserts
+    """
+    rng = random.Random(1)
+    db.session.execute(insert(Customer), [{"id": 1, "name": "Bench", "phone": "-", "mail": "b@example.com", "address": "-"}])
+    db.session.execute(insert(Hotel), [
+        {"id": hotel, "name": f"Bench{hotel}", "country": "Finland", "city": "Bench", "street": "-"}
+        for hotel in range(1, HOTELS + 1)])
+    db.session.execute(insert(Admin), [{"username": "bench", "password": "bench", "hotel_id": 1}])
+    rooms, bookings = [], []
+    for room_id in range(1, HOTELS * ROOMS + 1):
+        rooms.append({"id": room_id, "hotel_id": (room_id - 1) // ROOMS + 1, "number": room_id,
+                      "type": rng.choice(["single", "double", "suite"]), "price": 100})
+        night = ORIGIN
+        while night < ORIGIN + timedelta(days=HORIZON):
+            night += timedelta(days=rng.randint(0, 6))
+            stay = rng.randint(1, 7)
+            bookings.append({"room_id": room_id, "customer_id": 1, "payment": "cash",
+                             "check_in": night, "check_out": night + timedelta(days=stay)})
+            night += timedelta(days=stay)
+    db.session.execute(insert(Room), rooms)
+    db.session.execute(insert(Booking), bookings)
+    db.session.commit()
+    return len(bookings)
+
+def run():
+    """
+    Print per-search cost with and without the index
+    """
+    with tempfile.TemporaryDirectory() as db_dir:
+        # without the search cache every timed GET runs the search
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/bench.db", "SWAGGER_ENABLED": False,
+                          "SEARCH_CACHE_ENABLED": False})
+        check_in, check_out = ORIGIN + timedelta(days=200), ORIGIN + timedelta(days=203)
+        with app.app_context():
+            db.create_all()
+            count = populate()
+            index = OccupancyIndex(ORIGIN, HORIZON)
+            rebuild = timeit.timeit(index.rebuild, number=1)
+            app.extensions["occupancy"] = index
+            app.config["OCCUPANCY_MAX_AGE"] = 0
+
+            query = available_rooms_query(city="Bench", check_in=check_in, check_out=check_out)
+            assert [room.id for room in query] == index.free_rooms(check_in, check_out, city="Bench")
+            sql_ids = timeit.timeit(lambda: db.session.execute(
+                query.with_entities(Room.id).statement).all(), number=NUMBER) / NUMBER
+            index_ids = timeit.timeit(lambda: index.free_rooms(check_in, check_out, city="Bench"),
+                                      number=NUMBER) / NUMBER
+
+        client = app.test_client()
+        response = client.post("/api/keys/", json={"username": "bench", "password": "bench"})
+        headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "bench"}
+        url = f"/api/rooms/?city=Bench&check_in={check_in}&check_out={check_out}&limit=500"
+        with_index = timeit.timeit(lambda: client.get(url, headers=headers), number=NUMBER) / NUMBER
+        app.extensions["occupancy"] = None
+        without_index = timeit.timeit(lambda: client.get(url, headers=headers), number=NUMBER) / NUMBER
+
+    print(f"{HOTELS * ROOMS} rooms, {count} bookings, index rebuilt in {rebuild * 1000:.0f} ms")
+    print(f"{'':<22} {'SQL ms':>8} {'index ms':>9}")
+    print(f"{'free room ids':<22} {sql_ids * 1000:>8.2f} {index_ids * 1000:>9.2f}")
+    print(f"{'GET /api/rooms/ (500)':<22} {without_index * 1000:>8.2f} {with_index * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,118 @@
+"""
+Load test for database engine settings
+
+Runs the same mixed workload (room searches, booking reads and booking
+POSTs from concurrent threads) against a fresh database for every
+settings profile and prints requests per second. Every profile runs in its
+own process configured only through BOOKING_ASSISTANT_* environment
+variables. Set BENCH_POSTGRES_URI to an empty PostgreSQL database to add
+the pooled PostgreSQL profiles.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_pool.py [threads] [requests per thread]
+"""
+
+# IMPORTS
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+def profiles(db_dir):
+    """
+    Name and environment of every settings profile
+    """
+    result = [
+        ("sqlite, no pragmas", {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/plain.db",
+            "SQLITE_PRAGMAS": "{}"}),
+        ("sqlite, WAL + pragmas", {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/tuned.db"}),
+    ]
+    postgres = os.environ.get("BENCH_POSTGRES_URI")
+    if postgres:
+        result += [
+            ("postgresql, pool 5/0", {
+                "SQLALCHEMY_DATABASE_URI": postgres, "DB_POOL_SIZE": "5", "DB_MAX_OVERFLOW": "0"}),
+            ("postgresql, pool 10/20", {
+                "SQLALCHEMY_DATABASE_URI": postgres}),
+        ]
+    return [(name, {f"BOOKING_ASSISTANT_{key}": value for key, value in env.items()}) for name, env in result]
+
+def worker():
+    """
+    Populate the configured database, run the workload and print the result as JSON
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app
+    from orm import db
+    from populate import populate_db
+
+    # searches repeat, without the search cache each one reaches the database
+    app = create_app({"SWAGGER_ENABLED": False, "SEARCH_CACHE_ENABLED": False})
+    with app.app_context():
+        db.drop_all()
+    populate_db(app)
+
+    client = app.test_client()
+    response = client.post("/api/keys/", json={"username": "aino", "password": "root"})
+    headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "aino"}
+    search = "/api/rooms/?country=Finland&city=Oulu&check_in=2024-03-05&check_out=2024-03-07"
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def run_thread(thread):
+        client = app.test_client()
+        barrier.wait()
+        for idx in range(REQUESTS):
+            if idx % 5 == 4:
+                # every thread books its own nights so most POSTs succeed
+                night = date(2030, 1, 1) + timedelta(days=thread * REQUESTS + idx)
+                booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+                           "check_in": night.isoformat(), "check_out": (night + timedelta(days=1)).isoformat()}
+                status = client.post("/api/bookings/", json=booking, headers=headers).status_code
+            elif idx % 5 == 3:
+                status = client.get("/api/bookings/1001/", headers=headers).status_code
+            else:
+                status = client.get(search, headers=headers).status_code
+            if status >= 500:
+                errors.append(status)
+
+    threads = [threading.Thread(target=run_thread, args=(thread,)) for thread in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({"rps": THREADS * REQUESTS / elapsed, "errors": len(errors)}))
+
+def run():
+    """
+    Run every profile in a subprocess and print requests/s
+    """
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{THREADS} threads x {REQUESTS} requests")
+    print(f"{'profile':<24} {'req/s':>8} {'5xx':>5}")
+    with tempfile.TemporaryDirectory() as db_dir:
+        for name, env in profiles(db_dir):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), str(THREADS), str(REQUESTS), "--worker"],
+                cwd=here, env=dict(os.environ, **env), capture_output=True, text=True, check=True
+                ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{name:<24} {result['rps']:>8.0f} {result['errors']:>5}")
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        worker()
+    else:
+        run()
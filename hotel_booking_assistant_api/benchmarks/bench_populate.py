@@ -0,0 +1,122 @@
+"""
+Benchmark for populate_db
+
+Writes a data.json shaped file with HOTELS hotels of ROOMS rooms,
+BOOKINGS bookings per room and one customer per two bookings, then loads
+it into a temporary SQLite database with populate_db (chunked Core
+inserts, incremental parsing if ijson is installed) and with the previous
+ORM loader (customer lookup by scanning every customer, unit of work
+insert) on a smaller file. Prints rows/sec, with --memory also the peak
+Python memory (traced, which slows both loaders down).
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_populate.py [--memory]
+"""
+
+# IMPORTS
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db, Hotel, Room, Booking, Customer, Admin
+from populate import populate_db, ijson
+
+HOTELS = 200
+ROOMS = 50
+BOOKINGS = 20
+LEGACY_HOTELS = 10
+MEMORY = "--memory" in sys.argv
+
+def write_data(path, hotels):
+    """
+    Write the test file one hotel at a time, return the number of rows in it
+    """
+    refs = hotels * ROOMS * BOOKINGS
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"hotels": [')
+        for hotel in range(hotels):
+            rooms = []
+            for room in range(ROOMS):
+                first = (hotel * ROOMS + room) * BOOKINGS
+                rooms.append({"number": room, "type": "double", "price": 100, "bookings": [
+                    {"booking_ref": first + idx + 1, "check_in": [2024, 1, 1 + idx],
+                     "check_out": [2024, 1, 2 + idx], "payment": "cash"} for idx in range(BOOKINGS)]})
+            f.write(("," if hotel else "") + json.dumps({
+                "name": f"Hotel{hotel}", "country": "Finland", "city": "Oulu", "street": "-",
+                "rooms": rooms, "admins": [{"username": f"admin{hotel}", "password": "root"}]}))
+        f.write('], "customers": [')
+        f.write(",".join(json.dumps({
+            "name": f"Customer {idx}", "phone": "-", "mail": f"c{idx}@example.com", "address": "-",
+            "bookings": [ref, ref + 1]}) for idx, ref in enumerate(range(1, refs + 1, 2))))
+        f.write("]}")
+    return hotels + hotels * ROOMS + hotels + refs + refs // 2
+
+def legacy_populate(path):
+    """
+    The loader populate_db replaced
+    """
+    with open(path) as f:
+        data = json.load(f)
+    customers = [Customer(name=c["name"], phone=c["phone"], mail=c["mail"], address=c["address"])
+                 for c in data["customers"]]
+    bookings, admins = [], []
+    for hotel in data["hotels"]:
+        hotel_entry = Hotel(name=hotel["name"], country=hotel["country"], city=hotel["city"], street=hotel["street"])
+        for room in hotel["rooms"]:
+            room_entry = Room(number=room["number"], type=room["type"], price=room["price"], hotel=hotel_entry)
+            for booking in room["bookings"]:
+                booking_ref = booking["booking_ref"]
+                customer = customers[[idx for idx, customer in enumerate(data["customers"])
+                                      if booking_ref in customer["bookings"]].pop()]
+                bookings.append(Booking(booking_ref=booking_ref, check_in=datetime.date(*booking["check_in"]),
+                                        check_out=datetime.date(*booking["check_out"]),
+                                        payment=booking["payment"], room=room_entry, customer=customer))
+        for admin in hotel["admins"]:
+            admins.append(Admin(username=admin["username"], password=admin["password"], hotel=hotel_entry))
+    db.session.add_all(bookings)
+    db.session.add_all(admins)
+    db.session.commit()
+
+def measure(name, rows, load):
+    """
+    Run a loader and print rows/sec (and peak memory)
+    """
+    if MEMORY:
+        tracemalloc.start()
+    started = time.perf_counter()
+    load()
+    seconds = time.perf_counter() - started
+    line = f"{name:<28} {rows:>9} rows {seconds:>7.2f} s {rows / seconds:>9.0f} rows/s"
+    if MEMORY:
+        line += f" {tracemalloc.get_traced_memory()[1] / 2**20:>7.1f} MB"
+        tracemalloc.stop()
+    print(line)
+
+def run():
+    """
+    Print the cost of both loaders
+    """
+    print(f"incremental parsing: {'ijson' if ijson is not None else 'no (ijson not installed)'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, hotels, loader in (
+                ("ORM loader", LEGACY_HOTELS, "legacy"),
+                ("populate_db", LEGACY_HOTELS, "bulk"),
+                ("populate_db", HOTELS, "bulk")):
+            path = os.path.join(tmp, f"data-{hotels}.json")
+            rows = write_data(path, hotels)
+            app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/{loader}-{hotels}.db",
+                              "SWAGGER_ENABLED": False})
+            with app.app_context():
+                db.create_all()
+                if loader == "legacy":
+                    measure(name, rows, lambda: legacy_populate(path))
+                else:
+                    measure(name, rows, lambda: populate_db(app, path))
+
+if __name__ == "__main__":
+    run()
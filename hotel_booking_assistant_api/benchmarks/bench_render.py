@@ -0,0 +1,85 @@
+"""
+Throughput benchmark for Mason response rendering
+
+Serializes a room listing and a booking listing built from transient model
+objects with every installed encoder, and with the old stdlib path
+(isoformat() strings followed by json.dumps).
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_render.py
+"""
+
+# IMPORTS
+import json
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import Hotel, Room, Booking, Customer, BookingAssistantBuilder
+import render
+
+app = create_app({"SWAGGER_ENABLED": False})
+
+ROOMS = 500
+BOOKINGS = 500
+NUMBER = 50
+
+def room_listing():
+    """
+    Body of a room search returning ROOMS rooms
+    """
+    hotels = [Hotel(id=idx, name=f"Hotel{idx}", country="Finland", city="Oulu", street=f"Katu {idx}")
+              for idx in range(10)]
+    body = BookingAssistantBuilder()
+    body.add_control_add_customer()
+    body.add_control_add_bookings()
+    body["items"] = [
+        Room(id=idx, number=100 + idx, type="double", price=99.5 + idx, hotel=hotels[idx % 10]).serialize()
+        for idx in range(ROOMS)]
+    return body
+
+def booking_listing():
+    """
+    Body with BOOKINGS bookings in short form
+    """
+    hotel = Hotel(id=1, name="Hotel1", country="Finland", city="Oulu", street="Katu 1")
+    room = Room(id=1, number=101, type="single", price=80.0, hotel=hotel)
+    customer = Customer(id=1, name="Matti", phone="040", mail="m@example.com", address="Matintie 1")
+    body = BookingAssistantBuilder()
+    body["items"] = [
+        Booking(booking_ref=1000 + idx, room=room, customer=customer, customer_id=1, payment="cash",
+                check_in=date(2024, 1, 1) + timedelta(days=idx),
+                check_out=date(2024, 1, 3) + timedelta(days=idx)).serialize(short_form=True)
+        for idx in range(BOOKINGS)]
+    return body
+
+def legacy_dumps(body):
+    """
+    Old path: dates converted to strings up front, then stdlib json.dumps
+    """
+    for item in body.get("items", []):
+        for key in ("check_in", "check_out"):
+            if key in item:
+                item[key] = item[key].isoformat()
+    return json.dumps(body).encode()
+
+def run():
+    """
+    Print payload size and documents/s for every encoder
+    """
+    with app.test_request_context("/api/"):
+        payloads = {"rooms": room_listing(), "bookings": booking_listing()}
+
+    print(f"{'payload':<10} {'encoder':<12} {'KiB':>7} {'docs/s':>10} {'MiB/s':>8}")
+    for label, body in payloads.items():
+        candidates = [("legacy", lambda body=body: legacy_dumps(dict(body, items=[dict(i) for i in body["items"]])))]
+        candidates += [(name, lambda body=body, name=name: render.ENCODERS[name](body)) for name in render.ENCODERS]
+        for name, func in candidates:
+            size = len(func())
+            elapsed = timeit.timeit(func, number=NUMBER) / NUMBER
+            print(f"{label:<10} {name:<12} {size / 1024:>7.1f} {1 / elapsed:>10.0f} {size / elapsed / 2**20:>8.1f}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,71 @@
+"""
+Benchmark for the room search result cache
+
+Uses the synthetic city of bench_occupancy.py and times the same
+GET /api/rooms/ search answered by the database (cache disabled), on a
+cache miss (cache cleared before every request) and on a cache hit, for
+the in-process backend and, if fakeredis is installed, the Redis backend.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_search_cache.py
+"""
+
+# IMPORTS
+import os
+import sys
+import tempfile
+import timeit
+from datetime import timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db
+from searchcache import SearchCache, MemoryBackend, RedisBackend
+from bench_occupancy import populate, ORIGIN
+
+NUMBER = 50
+
+def backends():
+    """
+    Cache backends available in this environment
+    """
+    yield "memory", MemoryBackend(1024)
+    try:
+        import fakeredis
+    except ImportError:
+        return
+    yield "redis (fakeredis)", RedisBackend(fakeredis.FakeRedis())
+
+def run():
+    """
+    Print per-request cost of the search with and without the cache
+    """
+    with tempfile.TemporaryDirectory() as db_dir:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/bench.db", "SWAGGER_ENABLED": False})
+        with app.app_context():
+            db.create_all()
+            populate()
+            app.extensions["occupancy"].rebuild(ORIGIN)
+
+        client = app.test_client()
+        response = client.post("/api/keys/", json={"username": "bench", "password": "bench"})
+        headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "bench"}
+        check_in = ORIGIN + timedelta(days=200)
+        url = f"/api/rooms/?city=Bench&check_in={check_in}&check_out={check_in + timedelta(days=3)}&limit=100"
+
+        app.extensions["search_cache"] = None
+        uncached = timeit.timeit(lambda: client.get(url, headers=headers), number=NUMBER) / NUMBER
+        print(f"{'':<20} {'miss ms':>8} {'hit ms':>8}   (no cache {uncached * 1000:.2f} ms)")
+
+        for name, backend in backends():
+            cache = app.extensions["search_cache"] = SearchCache(backend, 30)
+
+            def miss():
+                cache.clear()
+                client.get(url, headers=headers)
+
+            missed = timeit.timeit(miss, number=NUMBER) / NUMBER
+            hit = timeit.timeit(lambda: client.get(url, headers=headers), number=NUMBER) / NUMBER
+            print(f"{name:<20} {missed * 1000:>8.2f} {hit * 1000:>8.2f}")
+
+if __name__ == "__main__":
+    run()
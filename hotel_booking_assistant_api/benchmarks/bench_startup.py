@@ -0,0 +1,80 @@
+"""
+Benchmark for worker startup time and memory
+
+Starts a fresh interpreter for every measurement, like a new worker
+process, and reports the time to import the application modules, the
+time to build an app with create_app() (with and without Swagger docs) and
+the resident memory of the worker after serving its first request.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_startup.py [repeats]
+"""
+
+# IMPORTS
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 5
+PROFILES = [("create_app(), no docs", False), ("create_app(), Swagger", True)]
+
+def rss_mib():
+    """
+    Current resident set size of this process in MiB (Linux), None elsewhere
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+def worker(swagger):
+    """
+    Measure one startup and print the result as JSON
+    """
+    import time
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app({"SWAGGER_ENABLED": swagger, "SQLALCHEMY_DATABASE_URI": "sqlite://"})
+    created = time.perf_counter()
+    app.test_client().get("/api/")
+    print(json.dumps({
+        "import": imported - start,
+        "create": created - imported,
+        "rss": rss_mib(),
+        "flasgger": "flasgger" in sys.modules,
+    }))
+
+def run():
+    """
+    Print median startup times and memory for every profile
+    """
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'profile':<24} {'import ms':>10} {'create ms':>10} {'RSS MiB':>8} {'flasgger':>9}")
+    for name, swagger in PROFILES:
+        results = []
+        for _ in range(REPEATS):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", str(int(swagger))],
+                cwd=here, capture_output=True, text=True, check=True
+                ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        rss = [result["rss"] for result in results if result["rss"] is not None]
+        print(f"{name:<24} "
+              f"{statistics.median(result['import'] for result in results) * 1000:>10.1f} "
+              f"{statistics.median(result['create'] for result in results) * 1000:>10.1f} "
+              f"{statistics.median(rss) if rss else float('nan'):>8.1f} "
+              f"{str(results[0]['flasgger']):>9}")
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        worker(sys.argv[sys.argv.index("--worker") + 1] == "1")
+    else:
+        run()
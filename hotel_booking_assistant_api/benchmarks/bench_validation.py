@@ -0,0 +1,68 @@
+"""
+Benchmark for request body validation
+
+Compares jsonschema.validate with a fresh schema per request (old
+behaviour) against the compiled validators in validation.py, with and
+without the optional fastjsonschema fast path.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/bench_validation.py
+"""
+
+# IMPORTS
+import os
+import sys
+import timeit
+from jsonschema import validate, ValidationError, draft7_format_checker
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from orm import Booking, Customer
+from validation import CompiledSchema
+
+NUMBER = 5000
+BODIES = {
+    Booking: {
+        "customer_id": 1, "hotel": "Hotel2", "room_type": "double", "payment": "credit",
+        "check_in": "2024-03-01", "check_out": "2024-03-05"
+    },
+    Customer: {
+        "name": "Matti Meikalainen", "phone": "0401234567",
+        "mail": "matti.meikalainen@gmail.com", "address": "Matintie 1"
+    },
+}
+
+def per_request(model, body):
+    """
+    Old behaviour: new schema dict and validator for every request
+    """
+    validate(body, model.json_schema(), format_checker=draft7_format_checker)
+
+def timed(func):
+    """
+    Average microseconds per call, invalid bodies are expected to raise
+    """
+    def call():
+        try:
+            func()
+        except ValidationError:
+            pass
+    return timeit.timeit(call, number=NUMBER) / NUMBER * 1e6
+
+def run():
+    """
+    Print validation cost per request for valid and invalid bodies
+    """
+    print(f"{'body':<18} {'per request us':>15} {'compiled us':>12} {'fast path us':>13}")
+    for model, valid in BODIES.items():
+        invalid = dict(valid)
+        invalid.pop(next(iter(invalid)))
+        compiled = CompiledSchema(model.json_schema())
+        plain = CompiledSchema(model.json_schema())
+        plain.fast = None
+        for label, body in [("valid", valid), ("invalid", invalid)]:
+            old = timed(lambda: per_request(model, body))
+            new = timed(lambda: plain.validate(body))
+            fast = timed(lambda: compiled.validate(body)) if compiled.fast else float("nan")
+            print(f"{model.__name__ + ' ' + label:<18} {old:>15.1f} {new:>12.1f} {fast:>13.1f}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,310 @@
+"""
+Load test of every endpoint
+
+Populates a temporary SQLite database with a synthetic dataset of each
+requested scale (see populate.SCALES) and runs one scenario per resource
+method through the Flask test client and through a threaded WSGI server
+on a local port. Prints (or writes) a JSON report with p50/p95/p99
+latency and throughput of every scenario, tagged with the current git
+commit so reports of different commits can be compared.
+
+Scenarios run in order, later ones use the bookings and customers created
+by the POST scenarios. Every scenario sends the same requests for a given
+scale, request count and thread count.
+
+Run from the hotel_booking_assistant_api directory:
+    python benchmarks/loadtest.py --scale 10 --scale 1k --driver client --driver wsgi --output report.json
+"""
+
+# IMPORTS
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from orm import db, Admin
+from populate import SCALES, SYNTHETIC_ORIGIN, SYNTHETIC_PASSWORD, SYNTHETIC_ROOM_TYPES, insert_chunks, populate_synthetic
+
+# nights booked by the load test lie after the synthetic bookings
+FREE_NIGHTS = SYNTHETIC_ORIGIN + timedelta(days=1000)
+
+class ClientDriver:
+
+    """ Requests through the Flask test client, in process """
+
+    name = "client"
+
+    def __init__(self, app):
+        self.app = app
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def session(self):
+        """ Client for one thread """
+        return self.app.test_client()
+
+    def send(self, session, method, path, headers=None, body=None):
+        """ Send a request, return status, headers and JSON body (or None) """
+        response = session.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.headers, response.get_json(silent=True)
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    """ Request handler without the access log """
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+class WsgiDriver:
+
+    """ HTTP requests to a threaded WSGI server on a local port """
+
+    name = "wsgi"
+
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+    def session(self):
+        """ Keep-alive session for one thread """
+        return requests.Session()
+
+    def send(self, session, method, path, headers=None, body=None):
+        """ Send a request, return status, headers and JSON body (or None) """
+        response = session.request(method, self.base + path, headers=headers, json=body)
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        return response.status_code, response.headers, data
+
+class Scenarios:
+
+    """
+    Requests of every scenario. Each scenario is a method taking the request
+    index and returning (method, path, headers, body, expected status,
+    callback for the JSON body of the response or None).
+    """
+
+    ORDER = (
+        "apikey_post",
+        "rooms_get",
+        "booking_post",
+        "booking_get",
+        "booking_put",
+        "booking_delete",
+        "customer_post",
+        "customer_get",
+        "customer_put",
+        "customer_delete",
+        )
+
+    def __init__(self, run_id, headers, requests_per_scenario):
+        self.run_id = run_id
+        self.headers = headers
+        self.count = requests_per_scenario
+        self.booking_refs = {}
+        self.customer_ids = {}
+
+    def apikey_post(self, idx):
+        body = {"username": f"{self.run_id}-{idx}", "password": SYNTHETIC_PASSWORD}
+        return "POST", "/api/keys/", None, body, 201, None
+
+    def rooms_get(self, idx):
+        check_in = SYNTHETIC_ORIGIN + timedelta(days=idx % 60)
+        path = f"/api/rooms/?city=City1&check_in={check_in}&check_out={check_in + timedelta(days=2)}"
+        return "GET", path, self.headers, None, 200, None
+
+    def _booking(self, idx, night):
+        return {"customer_id": idx % 10 + 1, "hotel": "Synth1", "payment": "cash",
+                "room_type": SYNTHETIC_ROOM_TYPES[idx % len(SYNTHETIC_ROOM_TYPES)],
+                "check_in": night.isoformat(), "check_out": (night + timedelta(days=1)).isoformat()}
+
+    def booking_post(self, idx):
+        def remember(data):
+            self.booking_refs[idx] = data["item"][0]["booking_ref"]
+        body = self._booking(idx, FREE_NIGHTS + timedelta(days=idx))
+        return "POST", "/api/bookings/", self.headers, body, 201, remember
+
+    def booking_get(self, idx):
+        return "GET", f"/api/bookings/{self.booking_refs[idx]}/", self.headers, None, 200, None
+
+    def booking_put(self, idx):
+        body = self._booking(idx, FREE_NIGHTS + timedelta(days=self.count + idx))
+        return "PUT", f"/api/bookings/{self.booking_refs[idx]}/", self.headers, body, 204, None
+
+    def booking_delete(self, idx):
+        return "DELETE", f"/api/bookings/{self.booking_refs[idx]}/", self.headers, None, 204, None
+
+    def _customer(self, idx, version):
+        return {"name": f"Load Test {idx}", "phone": "+358000000000", "address": "Street 1",
+                "mail": f"{self.run_id}-{version}-{idx}@example.com"}
+
+    def customer_post(self, idx):
+        def remember(data):
+            self.customer_ids[idx] = data["item"][0]["id"]
+        return "POST", "/api/customers/", self.headers, self._customer(idx, 1), 201, remember
+
+    def customer_get(self, idx):
+        return "GET", f"/api/customers/{self.customer_ids[idx]}/", self.headers, None, 200, None
+
+    def customer_put(self, idx):
+        path = f"/api/customers/{self.customer_ids[idx]}/"
+        return "PUT", path, self.headers, self._customer(idx, 2), 204, None
+
+    def customer_delete(self, idx):
+        return "DELETE", f"/api/customers/{self.customer_ids[idx]}/", self.headers, None, 204, None
+
+def run_scenario(driver, requests_for, count, threads):
+    """
+    Send count requests from threads threads (request idx from thread
+    idx % threads), return latency percentiles, throughput and errors
+    """
+    latencies = [[] for _ in range(threads)]
+    errors = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(thread):
+        session = driver.session()
+        barrier.wait()
+        for idx in range(thread, count, threads):
+            method, path, headers, body, expected, callback = requests_for(idx)
+            started = time.perf_counter()
+            status, _, data = driver.send(session, method, path, headers, body)
+            latencies[thread].append(time.perf_counter() - started)
+            if status != expected:
+                errors[thread] += 1
+            elif callback is not None:
+                callback(data)
+
+    workers = [threading.Thread(target=worker, args=(thread,)) for thread in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = sorted(latency for thread in latencies for latency in thread)
+    percentiles = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {
+        "requests": len(samples),
+        "errors": sum(errors),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p95_ms": round(percentiles[94] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        }
+
+def run_scale(scale, drivers, count, threads, db_dir):
+    """
+    Populate a database of the scale and run every scenario with every driver
+    """
+    rooms, bookings_per_room = SCALES[scale]
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_dir}/loadtest-{scale}.db",
+        "SWAGGER_ENABLED": False,
+        # rooms_get repeats its searches, each one should reach the database
+        "SEARCH_CACHE_ENABLED": False,
+        })
+    started = time.perf_counter()
+    counts = populate_synthetic(rooms, bookings_per_room, app=app)
+    with app.app_context():
+        # admins whose keys are created by the apikey_post scenario
+        insert_chunks(Admin, ({"username": f"{driver}-{idx}", "password": SYNTHETIC_PASSWORD, "hotel_id": 1}
+                              for driver in drivers for idx in range(count)))
+        db.session.commit()
+        if app.extensions.get("occupancy") is not None:
+            app.extensions["occupancy"].rebuild(SYNTHETIC_ORIGIN)
+    populate_seconds = time.perf_counter() - started
+
+    client = app.test_client()
+    response = client.post("/api/keys/", json={"username": "admin1", "password": SYNTHETIC_PASSWORD})
+    headers = {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": "admin1"}
+
+    results = []
+    for name in drivers:
+        driver_class = ClientDriver if name == "client" else WsgiDriver
+        scenarios = Scenarios(name, headers, count)
+        with driver_class(app) as driver:
+            results.append({
+                "scale": scale,
+                "rooms": counts["room"],
+                "bookings": counts["booking"],
+                "populate_s": round(populate_seconds, 2),
+                "driver": name,
+                "threads": threads,
+                "scenarios": {
+                    scenario: run_scenario(driver, getattr(scenarios, scenario), count, threads)
+                    for scenario in Scenarios.ORDER
+                    },
+                })
+    return results
+
+def git_commit():
+    """
+    Commit the code under test was checked out at, None outside a git tree
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    """
+    Parse arguments, run the load test and report as JSON
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", action="append", choices=SCALES, help="dataset scale, repeatable (default 10)")
+    parser.add_argument("--driver", action="append", choices=("client", "wsgi"),
+                        help="request driver, repeatable (default both)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "runs": [],
+        }
+    with tempfile.TemporaryDirectory() as db_dir:
+        for scale in args.scale or ["10"]:
+            report["runs"] += run_scale(scale, args.driver or ["client", "wsgi"], args.requests, args.threads, db_dir)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
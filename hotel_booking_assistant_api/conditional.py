@@ -0,0 +1,60 @@
+""" Conditional requests (ETag, If-None-Match, If-Match) for Hotel-Booking-Assistant API """
+
+# IMPORTS
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import quote_etag
+from flask import Response, request
+from sqlalchemy import inspect
+from orm import db, create_error_response
+
+def entity_etag(key, version):
+    """
+    Strong ETag (unquoted) of one version of an entity, changes whenever the
+    version column is incremented
+    """
+    return f"{key}-{version}"
+
+def etag_headers(etag):
+    """
+    Response headers carrying the ETag
+    """
+    return {"ETag": quote_etag(etag)}
+
+def not_modified(etag):
+    """
+    Return 304 response if If-None-Match of the request matches the ETag,
+    None if the full response must be built
+    """
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=etag_headers(etag))
+    return None
+
+def precondition_failed():
+    """
+    Error response for a write based on an outdated version
+    """
+    return create_error_response(412,
+                                 "PreconditionFailed",
+                                 "Resource was modified by another request!")
+
+def stale_write(entity):
+    """
+    Roll back a write of an entity that was changed or deleted by another
+    request since it was loaded (StaleDataError). Returns 404 response if
+    the entity no longer exists, else 412 response.
+    """
+    identity = inspect(entity).identity
+    db.session.rollback()
+    if db.session.get(type(entity), identity) is None:
+        return create_error_response(404,
+                                     "NotFound",
+                                     "Resource was deleted by another request!")
+    return precondition_failed()
+
+def check_if_match(etag):
+    """
+    Raises HTTPException (412) if the request has an If-Match header which
+    does not match the ETag. Requests without the header are not checked.
+    """
+    if request.if_match and not request.if_match.contains(etag):
+        raise HTTPException(response=precondition_failed())
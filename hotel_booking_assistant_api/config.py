@@ -0,0 +1,122 @@
+""" Configuration for Hotel-Booking-Assistant API """
+
+# IMPORTS
+from sqlalchemy import event
+
+# environment variable naming a Python settings file
+SETTINGS_ENVVAR = "BOOKING_ASSISTANT_SETTINGS"
+# prefix of environment variables overriding single settings,
+# e.g. BOOKING_ASSISTANT_SQLALCHEMY_DATABASE_URI=postgresql://...
+ENV_PREFIX = "BOOKING_ASSISTANT"
+
+class DefaultConfig:
+
+    """ Settings used when nothing else is configured """
+
+    SQLALCHEMY_DATABASE_URI = "sqlite:///hotel_booking_assistant.db"
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # extra create_engine() arguments, these win over the pool settings below
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    # connection pool for server databases (PostgreSQL, MySQL)
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+
+    # API documentation served by Flasgger at /apidocs/, flasgger is only
+    # imported when this is enabled
+    SWAGGER_ENABLED = True
+    SWAGGER_TEMPLATE_FILE = "doc/bookingassistant.yml"
+    SWAGGER = {
+        "title": "Booking Assistant API",
+        "openapi": "3.0.3",
+        "uiversion": 3,
+        "doc_dir": "./doc"
+    }
+
+    # worker threads running requests when served through asgi.py
+    ASGI_THREADS = 32
+
+    # in-memory occupancy index used by room searches (see occupancy.py),
+    # rebuilt when older than OCCUPANCY_MAX_AGE seconds (0 = never)
+    OCCUPANCY_INDEX_ENABLED = True
+    OCCUPANCY_HORIZON_DAYS = 730
+    OCCUPANCY_MAX_AGE = 60
+
+    # room search result cache (see searchcache.py), "memory" keeps up to
+    # SEARCH_CACHE_SIZE searches per process, "redis" shares them between
+    # workers through the server at SEARCH_CACHE_REDIS_URL
+    SEARCH_CACHE_ENABLED = True
+    SEARCH_CACHE_BACKEND = "memory"
+    SEARCH_CACHE_SIZE = 1024
+    SEARCH_CACHE_TTL = 30
+    SEARCH_CACHE_REDIS_URL = "redis://localhost:6379/0"
+
+    # per-request phase and SQL timings as Server-Timing headers and
+    # "bookie.timing" log lines (see instrumentation.py), PROFILE_MODE
+    # "cprofile" or "pyinstrument" profiles a PROFILE_SAMPLE_RATE fraction of
+    # requests and keeps the PROFILE_KEEP slowest in PROFILE_DIR
+    INSTRUMENTATION_ENABLED = False
+    PROFILE_MODE = None
+    PROFILE_SAMPLE_RATE = 0.01
+    PROFILE_KEEP = 10
+    PROFILE_DIR = "profiles"
+
+    # per-endpoint request counts, latency histograms, status codes and
+    # in-flight requests with cache and connection pool gauges, served in
+    # Prometheus text format at /metrics (see metrics.py)
+    METRICS_ENABLED = True
+
+    # pragmas run on every new SQLite connection
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 268435456,
+    }
+
+def load_config(app, config=None):
+    """
+    Fill app.config from DefaultConfig, the settings file named by
+    BOOKING_ASSISTANT_SETTINGS, BOOKING_ASSISTANT_* environment variables and
+    finally the given mapping, later sources overriding earlier ones
+    """
+    app.config.from_object(DefaultConfig)
+    app.config.from_envvar(SETTINGS_ENVVAR, silent=True)
+    app.config.from_prefixed_env(ENV_PREFIX)
+    if config:
+        app.config.update(config)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+
+def engine_options(config):
+    """
+    create_engine() arguments for the configured database. SQLite keeps the
+    Flask-SQLAlchemy defaults, server databases get a tuned connection pool.
+    """
+    options = {}
+    if not config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        options.update(
+            pool_size=config["DB_POOL_SIZE"],
+            max_overflow=config["DB_MAX_OVERFLOW"],
+            pool_recycle=config["DB_POOL_RECYCLE"],
+            pool_pre_ping=config["DB_POOL_PRE_PING"],
+        )
+    options.update(config["SQLALCHEMY_ENGINE_OPTIONS"])
+    return options
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Run the given pragmas on every new connection of a SQLite engine,
+    other engines are left untouched
+    """
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    event.listen(engine, "connect", set_pragmas)
@@ -0,0 +1,105 @@
+""" Booking export (CSV, NDJSON) for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import csv
+import io
+import json
+from datetime import date
+from sqlalchemy import select
+from orm import Booking, Room, Hotel, Customer, db
+
+# rows fetched from the database cursor (and encoded) at a time
+EXPORT_BATCH_SIZE = 1000
+
+# exported columns, in order
+EXPORT_COLUMNS = (
+    "booking_ref", "hotel", "room_number", "room_type", "check_in", "check_out",
+    "payment", "customer_id", "customer_name", "customer_mail",
+    )
+
+# media types of the export formats
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def export_query(hotel_ids=None, check_in_from=None, check_in_to=None, payment=None):
+    """
+    Bookings joined with room, hotel and customer in booking_ref order,
+    limited to hotel_ids (None for every hotel), check_in_from <= check_in
+    < check_in_to and the payment type when given
+    """
+    query = (
+        select(Booking.booking_ref, Hotel.name, Room.number, Room.type, Booking.check_in,
+               Booking.check_out, Booking.payment, Customer.id, Customer.name, Customer.mail)
+        .outerjoin(Booking.room)
+        .outerjoin(Room.hotel)
+        .outerjoin(Booking.customer)
+        .order_by(Booking.booking_ref)
+        )
+    if hotel_ids is not None:
+        query = query.where(Room.hotel_id.in_(hotel_ids))
+    if check_in_from is not None:
+        query = query.where(Booking.check_in >= check_in_from)
+    if check_in_to is not None:
+        query = query.where(Booking.check_in < check_in_to)
+    if payment is not None:
+        query = query.where(Booking.payment == payment)
+    return query
+
+def export_rows(hotel_ids=None, check_in_from=None, check_in_to=None, payment=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Iterate exported rows (tuples in EXPORT_COLUMNS order) fetched
+    batch_size at a time from a server-side cursor, so memory use does not
+    grow with the number of bookings
+    """
+    query = export_query(hotel_ids, check_in_from, check_in_to, payment)
+    yield from db.session.execute(query.execution_options(yield_per=batch_size))
+
+def export_chunks(rows, export_format, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Encode rows as CSV with a header line or as NDJSON, yielding bytes of
+    batch_size rows at a time
+    """
+    buffer = io.StringIO()
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=date.isoformat) + "\n")
+
+    for count, row in enumerate(rows, 1):
+        write(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def hotel_ids_by_name(names):
+    """
+    Ids of the hotels with the given names
+    """
+    return [hotel_id for hotel_id, in db.session.execute(select(Hotel.id).where(Hotel.name.in_(names)))]
+
+if __name__ == "__main__":
+
+    import argparse
+    import sys
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Export bookings as CSV or NDJSON")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--hotel", action="append", help="hotel name, repeatable (default every hotel)")
+    parser.add_argument("--check-in-from", type=date.fromisoformat, help="first check-in date included")
+    parser.add_argument("--check-in-to", type=date.fromisoformat, help="first check-in date not included")
+    parser.add_argument("--payment", help="payment type")
+    parser.add_argument("--output", help="file to write (default stdout)")
+    args = parser.parse_args()
+
+    app = create_app({"SWAGGER_ENABLED": False})
+    with app.app_context():
+        rows = export_rows(hotel_ids_by_name(args.hotel) if args.hotel else None,
+                           args.check_in_from, args.check_in_to, args.payment)
+        with open(args.output, "wb") if args.output else sys.stdout.buffer as out:
+            for chunk in export_chunks(rows, args.format):
+                out.write(chunk)
@@ -0,0 +1,197 @@
+""" Request timing and profiling instrumentation for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import cProfile
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from flask import request
+from sqlalchemy import event
+
+# pyinstrument is only needed for PROFILE_MODE = "pyinstrument"
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+# structured timing lines, one JSON object per request
+logger = logging.getLogger("bookie.timing")
+
+# timings of the request running in the current thread, None when disabled
+_current = ContextVar("request_timings", default=None)
+
+class RequestTimings:
+
+    """ Phase durations and SQL statistics of one request """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.profiler = None
+        self.token = None
+
+    def add(self, phase, seconds):
+        """ Add time spent in a phase (a phase may run several times) """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total):
+        """ Server-Timing header value, durations in milliseconds """
+        metrics = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in self.phases.items()]
+        metrics.append(f'sql;desc="{self.sql_count} queries";dur={self.sql_time * 1000:.2f}')
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+def timed(phase):
+    """
+    Decorator adding the run time of a function to the given phase of the
+    current request. Costs one context variable lookup when disabled.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.add(phase, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+class SlowestProfiles:
+
+    """
+    Profiles of the slowest sampled requests kept on disk, a profile is
+    written only if it ranks among the slowest PROFILE_KEEP seen so far and
+    the file of the one it displaces is removed
+    """
+
+    def __init__(self, directory, keep):
+        self.directory = directory
+        self.keep = keep
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def offer(self, duration, name, profiler):
+        """ Write the profile of a request if it is slow enough """
+        with self._lock:
+            if len(self._heap) >= self.keep and duration <= self._heap[0][0]:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            extension = "prof" if isinstance(profiler, cProfile.Profile) else "html"
+            path = os.path.join(self.directory, f"{duration * 1000:09.2f}ms-{name}-{time.time_ns()}.{extension}")
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(path)
+            else:
+                with open(path, "w", encoding="utf-8") as handle:
+                    handle.write(profiler.output_html())
+            if len(self._heap) >= self.keep:
+                _, evicted = heapq.heapreplace(self._heap, (duration, path))
+                os.remove(evicted)
+            else:
+                heapq.heappush(self._heap, (duration, path))
+
+def _start_profiler(mode):
+    """ Start a profiler of the given mode, None if one cannot run now """
+    if mode == "pyinstrument":
+        if Profiler is None:
+            # checked at startup, only reached if the mode was changed at runtime
+            return None
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is active (e.g. in a concurrent request)
+        return None
+    return profiler
+
+def _stop_profiler(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+def init_instrumentation(app, engine):
+    """
+    Register the request hooks and SQL event listeners of an application.
+    Nothing is recorded unless INSTRUMENTATION_ENABLED is set, so it can be
+    switched on at runtime.
+    """
+    if app.config["PROFILE_MODE"] == "pyinstrument" and Profiler is None:
+        raise RuntimeError("PROFILE_MODE pyinstrument requires the pyinstrument package")
+    app.extensions["profiles"] = SlowestProfiles(app.config["PROFILE_DIR"], app.config["PROFILE_KEEP"])
+
+    @app.before_request
+    def start_timing():
+        if not app.config["INSTRUMENTATION_ENABLED"]:
+            return
+        timings = RequestTimings()
+        timings.token = _current.set(timings)
+        mode = app.config["PROFILE_MODE"]
+        if mode and random.random() < app.config["PROFILE_SAMPLE_RATE"]:
+            timings.profiler = _start_profiler(mode)
+
+    @app.after_request
+    def report_timing(response):
+        timings = _current.get()
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.started
+        response.headers["Server-Timing"] = timings.server_timing(total)
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 3),
+            "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in timings.phases.items()},
+            "sql_count": timings.sql_count,
+            "sql_ms": round(timings.sql_time * 1000, 3),
+        }))
+        if timings.profiler is not None:
+            _stop_profiler(timings.profiler)
+            app.extensions["profiles"].offer(total, request.endpoint or "unknown", timings.profiler)
+            timings.profiler = None
+        return response
+
+    @app.teardown_request
+    def end_timing(exc):
+        timings = _current.get()
+        if timings is None:
+            return
+        if timings.profiler is not None:
+            _stop_profiler(timings.profiler)
+        _current.reset(timings.token)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        timings = _current.get()
+        started = conn.info.get("query_started")
+        if timings is not None and started:
+            timings.sql_count += 1
+            timings.sql_time += time.perf_counter() - started.pop()
+
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection else None
+        if started:
+            started.pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
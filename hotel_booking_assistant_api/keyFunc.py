@@ -2,9 +2,163 @@
 
 # IMPORTS
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from werkzeug.exceptions import HTTPException
 from flask import request
-from orm import ApiKey, create_error_response
+from sqlalchemy.orm import joinedload
+from orm import Admin, ApiKey, create_error_response
+from instrumentation import timed
+
+# verified keys kept in memory, the TTL bounds how long a key revoked
+# through another worker process stays usable in this one
+API_KEY_CACHE_SIZE = 1024
+API_KEY_CACHE_TTL = 60
+
+class AdminIdentity:
+
+    """ Admin resolved from a verified API key and the hotels they may act on """
+
+    def __init__(self, username, hotel_ids, hotel_names):
+        self.username = username
+        self.hotel_ids = frozenset(hotel_ids)
+        self.hotel_names = frozenset(hotel_names)
+
+class ApiKeyCache:
+
+    """
+    Bounded TTL/LRU cache mapping (username, key hash) to an AdminIdentity
+    """
+
+    def __init__(self, max_size=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, key_hash):
+        """
+        Return the cached identity or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get((username, key_hash))
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[(username, key_hash)]
+                self.misses += 1
+                return None
+            self._entries.move_to_end((username, key_hash))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, username, key_hash, identity):
+        """
+        Store a verified identity, evicting the least recently used entry
+        """
+        with self._lock:
+            self._entries[(username, key_hash)] = (identity, time.monotonic() + self.ttl)
+            self._entries.move_to_end((username, key_hash))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username=None):
+        """
+        Drop cached keys of an admin (or every key if username is None)
+        """
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+                return
+            for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == username]:
+                del self._entries[cache_key]
+
+    def stats(self):
+        """
+        Hit/miss counters and current size
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+api_key_cache = ApiKeyCache()
+
+def read_credentials():
+
+    """
+    Get the API key and admin username from the request headers.
+    Raises HTTPException (400) if either one is missing.
+    """
+
+    # get hashed key from headers
+    apikey = request.headers.get("Hotels-Api-Key")
+    if apikey is None:
+        raise HTTPException(
+            response=create_error_response(
+                400,
+                "BadRequest",
+                "Header (Hotels-Api-Key) was not provided!")
+                )
+
+    # get admin username
+    username = request.headers.get("Admin-User-Name")
+    if username is None:
+        raise HTTPException(response=create_error_response(
+            400,
+            "BadRequest",
+            "Header (Admin-User-Name) was not provided!")
+            )
+
+    return apikey, username
+
+@timed("auth")
+def authenticate_admin(apikey, username):
+
+    """
+    Verify an API key of the admin and return the matching AdminIdentity.
+    Raises HTTPException (403) if the key is missing or does not match.
+    """
+
+    # get hash for the apikey given
+    apikey_hash = ApiKey.key_hash(apikey)
+
+    # use a previously verified key if possible
+    identity = api_key_cache.get(username, apikey_hash)
+    if identity is not None:
+        return identity
+
+    # get hash, admin and hotel from the database
+    apikey_db = ApiKey.query.options(
+        joinedload(ApiKey.admin).joinedload(Admin.hotel)
+        ).filter_by(admin_username=username).first()
+
+    # check that an apikey was found
+    if apikey_db is None:
+        raise HTTPException(
+            response=create_error_response(
+                403,
+                "Forbidden",
+                "Admin has no API key!")
+            )
+
+    # check for matching hash
+    if not secrets.compare_digest(apikey_hash, apikey_db.key):
+        raise HTTPException(response=create_error_response(
+            403,
+            "Forbidden",
+            "Admin is unauthorized!")
+            )
+
+    # remember the hotels the admin may act on
+    hotel = apikey_db.admin.hotel if apikey_db.admin else None
+    identity = AdminIdentity(
+        username,
+        [hotel.id] if hotel else [],
+        [hotel.name] if hotel else []
+        )
+    api_key_cache.put(username, apikey_hash, identity)
+    return identity
 
 def new_booking_admin(func):
 
@@ -16,24 +170,7 @@ def new_booking_admin(func):
         Key must match the key of the admin for the hotel in question
         """
 
-        # get hashed key from headers
-        apikey = request.headers.get("Hotels-Api-Key")
-        if apikey is None:
-            raise HTTPException(
-                response=create_error_response(
-                    400,
-                    "BadRequest",
-                    "Header (Hotels-Api-Key) was not provided!")
-                    )
-
-        # get admin username
-        username = request.headers.get("Admin-User-Name")
-        if username is None:
-            raise HTTPException(response=create_error_response(
-                400,
-                "BadRequest",
-                "Header (Admin-User-Name) was not provided!")
-                )
+        apikey, username = read_credentials()
 
         hotel = request.json.get("hotel")
         if hotel is None:
@@ -43,26 +180,50 @@ def new_booking_admin(func):
                 "Hotel was not provided in request body!")
                 )
 
-        # get hash for the apikey given
-        apikey_hash = ApiKey.key_hash(apikey)
+        # check if the matching admin is actually authorized for the hotel
+        if hotel in authenticate_admin(apikey, username).hotel_names:
+            return func(self, *args, **kwargs)
+
+        # unauthorized (no match)
+        raise HTTPException(response=create_error_response(
+            403,
+            "Forbidden",
+            "Admin is unauthorized!")
+            )
+
+    return wrapper
+
+def batch_booking_admin(func):
+
+    """ wrapper for authentication regarding batches of new bookings """
+    def wrapper(self, *args, **kwargs):
+
+        """
+        Authorization for following request types: BookingBatch: POST
+        Key must match the key of an admin authorized for every hotel in the batch
+        """
 
-        # get hash from the database
-        apikey_db = ApiKey.query.filter_by(admin_username=username).first()
+        apikey, username = read_credentials()
+
+        bookings = request.json
+        if not isinstance(bookings, list) or not all(isinstance(booking, dict) for booking in bookings):
+            raise HTTPException(response=create_error_response(
+                400,
+                "BadRequest",
+                "Request body must be an array of bookings!")
+                )
 
-        # check that an apikey was found
-        if apikey_db is None:
-            raise HTTPException(
-                response=create_error_response(
-                    403,
-                    "Forbidden",
-                    "Admin has no API key!")
+        if not all(isinstance(booking.get("hotel"), str) for booking in bookings):
+            raise HTTPException(response=create_error_response(
+                400,
+                "BadRequest",
+                "Hotel was not provided for every booking in request body!")
                 )
 
-        # check for matching hash
-        if secrets.compare_digest(apikey_hash, apikey_db.key):
-            # check if the matching admin is actually authorized for the hotel
-            if apikey_db.admin.hotel.name == hotel:
-                return func(self, *args, **kwargs)
+        # check if the matching admin is authorized for all of the hotels
+        hotels = {booking["hotel"] for booking in bookings}
+        if hotels <= authenticate_admin(apikey, username).hotel_names:
+            return func(self, *args, **kwargs)
 
         # unauthorized (no match)
         raise HTTPException(response=create_error_response(
@@ -78,55 +239,45 @@ def booking_specific_admin(func):
     """ wrapper for authentication regarding existing bookings """
     def wrapper(self, booking, *args, **kwargs):
 
-        """ 
+        """
         Authorization for following request types: BookingItem: GET, DELETE
         Key must match the key of the admin for the hotel of the original booking
         """
 
-        # get hashed key from headers
-        apikey = request.headers.get("Hotels-Api-Key")
-        if apikey is None:
-            raise HTTPException(
-                response=create_error_response(
-                    400,
-                    "BadRequest",
-                    "Header (Hotels-Api-Key) was not provided!")
-                    )
+        identity = authenticate_admin(*read_credentials())
 
-        username = request.headers.get("Admin-User-Name")
-        if username is None:
-            raise HTTPException(response=create_error_response(
-                400,
-                "BadRequest",
-                "Header (Admin-User-Name) was not provided!")
-                )
+        # check if the matching admin is actually authorized for the hotel
+        if booking.room is not None and booking.room.hotel_id in identity.hotel_ids:
 
-        # get hash for the apikey given
-        apikey_hash = ApiKey.key_hash(apikey)
+            # successful validation
+            return func(self, booking, *args, **kwargs)
 
-        # get hash from the database
-        apikey_db = ApiKey.query.filter_by(admin_username=username).first()
+        # return response with unauthorized
+        raise HTTPException(response=create_error_response(
+            403,
+            "Forbidden",
+            "Admin is unauthorized!")
+            )
 
-        # check that an apikey was found
-        if apikey_db is None:
-            raise HTTPException(
-                response=create_error_response(
-                    403,
-                    "Forbidden",
-                    "Admin has no API key!")
-                    )
+    return wrapper
 
-        # check for matching hash
-        if secrets.compare_digest(apikey_hash, apikey_db.key):
-            # check if the matching admin is actually authorized for the hotel
-            if apikey_db.admin_username in [
-                admin_entry.username for admin_entry in booking.room.hotel.admins
-                ]:
+def hotel_specific_admin(func):
 
-                # successful validation
-                return func(self, booking, *args, **kwargs)
+    """ wrapper for authentication regarding a single hotel """
+    def wrapper(self, hotel, *args, **kwargs):
 
-        # return response with unauthorized
+        """
+        Authorization for following request types: HotelOccupancy: GET
+        Key must match the key of the admin for the hotel in question
+        """
+
+        identity = authenticate_admin(*read_credentials())
+
+        # check if the matching admin is actually authorized for the hotel
+        if hotel.id in identity.hotel_ids:
+            return func(self, hotel, *args, **kwargs)
+
+        # unauthorized (no match)
         raise HTTPException(response=create_error_response(
             403,
             "Forbidden",
@@ -135,58 +286,33 @@ def booking_specific_admin(func):
 
     return wrapper
 
-def any_admin(func):
+def hotels_admin(func):
 
-    """ wrapper for general authentication """
+    """ wrapper for authentication regarding all hotels of an admin """
     def wrapper(self, *args, **kwargs):
 
         """
-        Authorization for following request types: CustomerCollection: POST; RoomCollection: GET
-        Key can match any of the admins keys as long as the admin username and key also match
+        Authorization for following request types: BookingCollection: GET; BookingExport: GET
+        Key must match the key of an admin, the admin's identity is passed on
+        so that the request can be limited to the admin's hotels
         """
 
-        # get hashed key from headers
-        apikey = request.headers.get("Hotels-Api-Key")
-        if apikey is None:
-            raise HTTPException(
-                response=create_error_response(
-                    400,
-                    "BadRequest",
-                    "Header (Hotels-Api-Key) was not provided!")
-                    )
-
-        username = request.headers.get("Admin-User-Name")
-        if username is None:
-            raise HTTPException(response=create_error_response(
-                400,
-                "BadRequest",
-                "Header (Admin-User-Name) was not provided!")
-                )
+        identity = authenticate_admin(*read_credentials())
+        return func(self, identity, *args, **kwargs)
 
-        # get hash for the apikey given
-        apikey_hash = ApiKey.key_hash(apikey)
+    return wrapper
 
-        # get hash from the database
-        apikey_db = ApiKey.query.filter_by(admin_username=username).first()
+def any_admin(func):
 
-        # check that an apikey was found
-        if apikey_db is None:
-            raise HTTPException(response=create_error_response(
-                403,
-                "Forbidden",
-                "Admin has no API key!")
-                )
+    """ wrapper for general authentication """
+    def wrapper(self, *args, **kwargs):
 
-        # check for matching hash
-        if secrets.compare_digest(apikey_hash, apikey_db.key):
-            # check if the matching admin is actually authorized for the hotel
-            return func(self, *args, **kwargs)
+        """
+        Authorization for following request types: CustomerCollection: POST; RoomCollection: GET
+        Key can match any of the admins keys as long as the admin username and key also match
+        """
 
-        # return response with unauthorized
-        raise HTTPException(response=create_error_response(
-            403,
-            "Forbidden",
-            "Admin is unauthorized!")
-            )
+        authenticate_admin(*read_credentials())
+        return func(self, *args, **kwargs)
 
     return wrapper
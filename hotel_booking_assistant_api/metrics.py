@@ -0,0 +1,225 @@
+""" Prometheus-style metrics for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from flask import Response, current_app, g, request
+from keyFunc import api_key_cache
+from orm import db
+
+# upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# endpoints whose 409 responses are booking conflicts
+BOOKING_ENDPOINTS = ("bookingcollection", "booking", "bookingbatch")
+
+# text exposition format served to scrapers
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class ThreadMetrics:
+
+    """
+    Counters written by a single thread only, so recording needs no lock
+    """
+
+    def __init__(self):
+        self.requests = defaultdict(int)
+        self.in_flight = defaultdict(int)
+        self.latency = {}
+
+    def observe(self, endpoint, seconds):
+        """ Add a request duration to the histogram of the endpoint """
+        histogram = self.latency.get(endpoint)
+        if histogram is None:
+            # bucket counts (last one is +Inf), then the sum of durations
+            histogram = self.latency[endpoint] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        histogram[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram[-1] += seconds
+
+    def merge(self, other):
+        """ Add the counters of another ThreadMetrics to these """
+        # dict copies are atomic, the owning thread of other may keep writing
+        for key, count in other.requests.copy().items():
+            self.requests[key] += count
+        for endpoint, count in other.in_flight.copy().items():
+            self.in_flight[endpoint] += count
+        for endpoint, histogram in other.latency.copy().items():
+            total = self.latency.setdefault(endpoint, [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            for index, value in enumerate(list(histogram)):
+                total[index] += value
+
+class MetricsRegistry:
+
+    """
+    Request metrics of one worker process. Every live thread records into
+    its own ThreadMetrics, the counters of finished threads are folded into
+    one shared total and the scrape sums them up.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._threads = []
+        self._finished = ThreadMetrics()
+        self._lock = threading.Lock()
+
+    def _metrics(self):
+        metrics = getattr(self._local, "metrics", None)
+        if metrics is None:
+            metrics = self._local.metrics = ThreadMetrics()
+            with self._lock:
+                self._fold_finished()
+                self._threads.append((threading.current_thread(), metrics))
+        return metrics
+
+    def _fold_finished(self):
+        """ Move counters of finished threads to the shared total, lock held """
+        alive = []
+        for thread, metrics in self._threads:
+            if thread.is_alive():
+                alive.append((thread, metrics))
+            else:
+                self._finished.merge(metrics)
+        self._threads = alive
+
+    def request_started(self, endpoint):
+        """ Count a request of the endpoint as in flight """
+        self._metrics().in_flight[endpoint] += 1
+
+    def request_finished(self, endpoint, method, status, seconds):
+        """ Record the status and duration of a finished request """
+        metrics = self._metrics()
+        metrics.requests[(endpoint, method, status)] += 1
+        metrics.observe(endpoint, seconds)
+
+    def request_ended(self, endpoint):
+        """ Remove a request of the endpoint from the in-flight gauge """
+        self._metrics().in_flight[endpoint] -= 1
+
+    def collect(self):
+        """
+        Sum of the counters of every thread: requests by (endpoint, method,
+        status), in-flight requests and latency histograms by endpoint
+        """
+        total = ThreadMetrics()
+        with self._lock:
+            self._fold_finished()
+            total.merge(self._finished)
+            threads = [metrics for _, metrics in self._threads]
+        for metrics in threads:
+            total.merge(metrics)
+        return total.requests, total.in_flight, total.latency
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+def _family(lines, name, kind, description, samples):
+    """ Append one metric family in text exposition format """
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{labels} {value}")
+
+def render_metrics(registry, search_cache=None, engine=None):
+    """
+    Text exposition of request, booking conflict, cache and pool metrics
+    """
+    requests, in_flight, latency = registry.collect()
+    lines = []
+
+    _family(lines, "bookie_requests_total", "counter", "Requests by endpoint, method and status", [
+        (_labels(endpoint=endpoint, method=method, status=status), count)
+        for (endpoint, method, status), count in sorted(requests.items())
+        ])
+    _family(lines, "bookie_requests_in_flight", "gauge", "Requests being served by endpoint", [
+        (_labels(endpoint=endpoint), count) for endpoint, count in sorted(in_flight.items())
+        ])
+
+    _family(lines, "bookie_request_duration_seconds", "histogram", "Request latency by endpoint", [])
+    for endpoint, histogram in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram):
+            cumulative += count
+            lines.append(f"bookie_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}")
+        lines.append(f"bookie_request_duration_seconds_sum{_labels(endpoint=endpoint)} {histogram[-1]}")
+        lines.append(f"bookie_request_duration_seconds_count{_labels(endpoint=endpoint)} {cumulative}")
+
+    conflicts = defaultdict(int)
+    for (endpoint, _, status), count in requests.items():
+        if endpoint in BOOKING_ENDPOINTS and status == 409:
+            conflicts[endpoint] += count
+    _family(lines, "bookie_booking_conflicts_total", "counter", "Booking requests refused with 409 Conflict", [
+        (_labels(endpoint=endpoint), count) for endpoint, count in sorted(conflicts.items())
+        ])
+
+    caches = [("api_key", api_key_cache.stats())]
+    if search_cache is not None:
+        caches.append(("room_search", search_cache.stats()))
+    for name, kind, key in (
+            ("hits_total", "counter", "hits"),
+            ("misses_total", "counter", "misses"),
+            ("entries", "gauge", "size"),
+            ("hit_ratio", "gauge", None)):
+        samples = []
+        for cache, stats in caches:
+            if key is None:
+                lookups = stats["hits"] + stats["misses"]
+                value = stats["hits"] / lookups if lookups else 0.0
+            else:
+                value = stats[key]
+            samples.append((_labels(cache=cache), value))
+        _family(lines, f"bookie_cache_{name}", kind, f"Cache {name.replace('_', ' ')}", samples)
+
+    pool = engine.pool if engine is not None else None
+    if pool is not None and hasattr(pool, "checkedout"):
+        for name, value, description in (
+                ("size", pool.size(), "Configured connection pool size"),
+                ("checked_out", pool.checkedout(), "Connections in use"),
+                ("checked_in", pool.checkedin(), "Idle connections in the pool"),
+                ("overflow", pool.overflow(), "Connections opened beyond the pool size")):
+            _family(lines, f"bookie_db_pool_{name}", "gauge", description, [("", value)])
+
+    return "\n".join(lines) + "\n"
+
+def metrics_view():
+    """
+    Serve the metrics of this worker process
+    """
+    body = render_metrics(
+        current_app.extensions["metrics"],
+        current_app.extensions.get("search_cache"),
+        db.engine
+        )
+    return Response(body, status=200, content_type=CONTENT_TYPE)
+
+def init_metrics(app):
+    """
+    Record request metrics of an application and serve them at /metrics
+    """
+    if not app.config["METRICS_ENABLED"]:
+        return
+    app.extensions["metrics"] = MetricsRegistry()
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics = app.extensions["metrics"]
+        g.metrics_started = time.perf_counter()
+        g.metrics_endpoint = request.endpoint or "none"
+        g.metrics.request_started(g.metrics_endpoint)
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get("metrics_started")
+        if started is not None:
+            g.metrics.request_finished(
+                g.metrics_endpoint, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(exc):
+        endpoint = g.get("metrics_endpoint")
+        if endpoint is not None:
+            g.metrics.request_ended(endpoint)
+
+    app.add_url_rule("/metrics", view_func=metrics_view)
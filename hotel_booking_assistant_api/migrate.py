@@ -0,0 +1,58 @@
+"""
+Upgrade an existing Hotel-Booking-Assistant database to the current models
+
+db.create_all() only creates missing tables, so databases created with an
+older version of orm.py lack the columns and indexes added since. Run from the
+hotel_booking_assistant_api directory:
+    python migrate.py
+"""
+
+# IMPORTS
+import warnings
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+from flask import current_app
+from orm import db
+
+def index_names(conn, inspector, table_name):
+    """
+    Names of the indexes of a table. SQLAlchemy does not reflect SQLite
+    expression indexes, their names are read from sqlite_master.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "Skipped unsupported reflection of expression-based index")
+        names = {index["name"] for index in inspector.get_indexes(table_name)}
+    if conn.dialect.name == "sqlite":
+        names.update(conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table_name,)).scalars())
+    return names
+
+def migrate_db(app=None):
+    """
+    Create missing tables, columns and indexes of the given or current
+    application, return names of the created columns (table.column) and
+    indexes. Added columns must be nullable or have a server default.
+    """
+    created = []
+    with (app or current_app).app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            inspector = inspect(conn)
+            for table in db.metadata.sorted_tables:
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                        conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                        created.append(f"{table.name}.{column.name}")
+                existing = index_names(conn, inspector, table.name)
+                for index in table.indexes:
+                    if index.name not in existing:
+                        index.create(conn)
+                        created.append(index.name)
+    return created
+
+if __name__ == "__main__":
+    from app import create_app
+    for name in migrate_db(create_app({"SWAGGER_ENABLED": False})):
+        print(f"created {name}")
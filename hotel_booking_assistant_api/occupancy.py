@@ -0,0 +1,285 @@
+""" In-memory room occupancy index for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import and_
+from sqlalchemy.exc import OperationalError
+from orm import Hotel, Room, Booking, db
+from availability import overlap_clause
+from instrumentation import timed
+
+def night_mask(origin, days, check_in, check_out):
+    """
+    Bits of the nights of [check_in, check_out) in a horizon of the given
+    number of days starting at origin
+    """
+    start = max((check_in - origin).days, 0)
+    stop = min((check_out - origin).days, days)
+    if stop <= start:
+        return 0
+    return ((1 << (stop - start)) - 1) << start
+
+def count_nights(masks, days):
+    """
+    Number of masks having bit n set, for every night n < days. The masks
+    are summed into bit-sliced counters (one int per bit of the count), so
+    each mask costs a few int operations instead of one per night.
+    """
+    planes = []
+    for mask in masks:
+        carry = mask
+        for level, plane in enumerate(planes):
+            planes[level] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    return [
+        sum(((plane >> night) & 1) << level for level, plane in enumerate(planes))
+        for night in range(days)
+        ]
+
+class OccupancyIndex:
+
+    """
+    Booked nights of every room over a fixed horizon starting at origin.
+    Each room has a Python int used as a bitset, bit n set meaning the night
+    origin + n days is booked, so a stay is free when the room's bits AND the
+    mask of the requested nights is zero. Rooms are grouped by hotel and type
+    for location and type filtered searches.
+
+    The index is per process and serves room searches only, allocation
+    still checks the database under lock (availability.lock_allocation).
+    """
+
+    def __init__(self, origin, days):
+        self.origin = origin
+        self.days = days
+        self.rooms = {}
+        self.groups = {}
+        self.hotels = {}
+        self.built_at = None
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+        # changes applied while a rebuild is reading the database
+        self._replay = None
+
+    @property
+    def end(self):
+        """ First night after the horizon """
+        return self.origin + timedelta(days=self.days)
+
+    def covers(self, check_in, check_out):
+        """ True if every night of the stay is inside the horizon """
+        return self.origin <= check_in and check_out <= self.end
+
+    def mask(self, check_in, check_out):
+        """ Bits of the nights of [check_in, check_out) inside the horizon """
+        return night_mask(self.origin, self.days, check_in, check_out)
+
+    def rebuild(self, origin=None):
+        """
+        Load rooms, hotels and bookings inside the horizon from the database
+        and replace the index contents. Concurrent rebuilds are skipped.
+        """
+        if not self._rebuilding.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                self._replay = []
+            origin = origin or self.origin
+            end = origin + timedelta(days=self.days)
+
+            rooms = {}
+            groups = defaultdict(list)
+            for room_id, hotel_id, room_type in db.session.query(Room.id, Room.hotel_id, Room.type).order_by(Room.id):
+                rooms[room_id] = 0
+                groups[(hotel_id, room_type)].append(room_id)
+            hotels = {
+                hotel_id: (country, city)
+                for hotel_id, country, city in db.session.query(Hotel.id, Hotel.country, Hotel.city)
+                }
+            for room_id, check_in, check_out in db.session.query(
+                    Booking.room_id, Booking.check_in, Booking.check_out
+                    ).filter(Booking.check_in < end, Booking.check_out > origin):
+                if room_id in rooms:
+                    rooms[room_id] |= night_mask(origin, self.days, check_in, check_out)
+
+            with self._lock:
+                self.origin, self.rooms, self.groups, self.hotels = origin, rooms, dict(groups), hotels
+                replay, self._replay = self._replay, None
+                for change, args in replay:
+                    change(*args)
+                self.built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._replay = None
+            self._rebuilding.release()
+
+    def book(self, room_id, check_in, check_out):
+        """ Mark the nights of a new booking as booked """
+        with self._lock:
+            self._book(room_id, check_in, check_out)
+
+    def _book(self, room_id, check_in, check_out):
+        if self._replay is not None:
+            self._replay.append((self._book, (room_id, check_in, check_out)))
+        if room_id in self.rooms:
+            self.rooms[room_id] |= self.mask(check_in, check_out)
+
+    def refresh_room(self, room_id):
+        """
+        Reload the booked nights of one room, used after a booking is moved
+        or deleted (clearing its bits would be wrong if bookings overlap)
+        """
+        bookings = db.session.query(Booking.check_in, Booking.check_out).filter(
+            Booking.room_id == room_id).all()
+        with self._lock:
+            bits = 0
+            for check_in, check_out in bookings:
+                bits |= self.mask(check_in, check_out)
+            self._set(room_id, bits)
+
+    def _set(self, room_id, bits):
+        if self._replay is not None:
+            self._replay.append((self._set, (room_id, bits)))
+        if room_id in self.rooms:
+            self.rooms[room_id] = bits
+
+    @timed("availability")
+    def free_rooms(self, check_in, check_out, country=None, city=None, room_type=None,
+                   after=None, before=None, limit=None):
+        """
+        Ids of rooms matching the optional filters that are free for the
+        whole stay, sorted by id. Only ids above after and below before are
+        included, with limit only the first limit of them (the last limit
+        if before is given, i.e. when paging backwards).
+        """
+        free = []
+        low = after if after is not None else 0
+        high = before if before is not None else float("inf")
+        with self._lock:
+            mask = self.mask(check_in, check_out)
+            rooms = self.rooms
+            for (hotel_id, group_type), room_ids in self.groups.items():
+                if room_type and group_type != room_type:
+                    continue
+                if country or city:
+                    location = self.hotels.get(hotel_id)
+                    if location is None or (country and location[0] != country) or (city and location[1] != city):
+                        continue
+                free.extend(room_id for room_id in room_ids
+                            if low < room_id < high and not rooms[room_id] & mask)
+        if limit is None:
+            return sorted(free)
+        if before is not None:
+            return sorted(heapq.nlargest(limit, free))
+        return heapq.nsmallest(limit, free)
+
+    def hotel_masks(self, hotel_id, start, end):
+        """
+        Booked nights of [start, end) of every room of a hotel, shifted so
+        that bit 0 is start, as lists of masks by room type
+        """
+        offset = (start - self.origin).days
+        with self._lock:
+            window = self.mask(start, end)
+            rooms = self.rooms
+            return {
+                room_type: [(rooms[room_id] & window) >> offset for room_id in room_ids]
+                for (group_hotel, room_type), room_ids in self.groups.items()
+                if group_hotel == hotel_id
+                }
+
+def hotel_masks_from_db(hotel_id, start, end):
+    """
+    Same as OccupancyIndex.hotel_masks, read with one query joining the
+    rooms of the hotel to their bookings overlapping the window
+    """
+    days = (end - start).days
+    masks = {}
+    for room_id, room_type, check_in, check_out in db.session.query(
+            Room.id, Room.type, Booking.check_in, Booking.check_out
+            ).outerjoin(Booking, and_(Booking.room_id == Room.id, overlap_clause(start, end))
+            ).filter(Room.hotel_id == hotel_id):
+        rooms = masks.setdefault(room_type, {})
+        rooms[room_id] = rooms.get(room_id, 0)
+        if check_in is not None:
+            rooms[room_id] |= night_mask(start, days, check_in, check_out)
+    return {room_type: list(rooms.values()) for room_type, rooms in masks.items()}
+
+@timed("availability")
+def hotel_occupancy(hotel_id, start, end):
+    """
+    Room count and booked rooms per night of [start, end) for every room
+    type of a hotel, as {room_type: (rooms, [booked, ...])}. Uses the
+    occupancy index when it covers the window, the database otherwise.
+    """
+    index = occupancy_index()
+    if index is not None and index.covers(start, end):
+        masks = index.hotel_masks(hotel_id, start, end)
+    else:
+        masks = hotel_masks_from_db(hotel_id, start, end)
+    days = (end - start).days
+    return {
+        room_type: (len(room_masks), count_nights(room_masks, days))
+        for room_type, room_masks in sorted(masks.items())
+        }
+
+def init_occupancy(app):
+    """
+    Create the occupancy index of an application and build it from the
+    database if the tables exist already (otherwise on first use)
+    """
+    if not app.config["OCCUPANCY_INDEX_ENABLED"]:
+        return
+    index = OccupancyIndex(date.today(), app.config["OCCUPANCY_HORIZON_DAYS"])
+    app.extensions["occupancy"] = index
+    with app.app_context():
+        try:
+            index.rebuild()
+        except OperationalError:
+            db.session.rollback()
+
+def record_booking(room_id, check_in, check_out):
+    """
+    Add a committed booking to the occupancy index of the current application
+    """
+    index = current_app.extensions.get("occupancy")
+    if index is not None:
+        index.book(room_id, check_in, check_out)
+
+def refresh_rooms(*room_ids):
+    """
+    Reload rooms whose bookings were moved or deleted in the occupancy index
+    of the current application
+    """
+    index = current_app.extensions.get("occupancy")
+    if index is not None:
+        for room_id in set(room_ids):
+            if room_id is not None:
+                index.refresh_room(room_id)
+
+def occupancy_index():
+    """
+    Occupancy index of the current application, or None if disabled. The
+    index is rebuilt with a fresh horizon when older than
+    OCCUPANCY_MAX_AGE seconds, which also bounds how long changes made by
+    other worker processes stay invisible to searches.
+    """
+    index = current_app.extensions.get("occupancy")
+    if index is None:
+        return None
+    max_age = current_app.config["OCCUPANCY_MAX_AGE"]
+    if index.built_at is None or (max_age and time.monotonic() - index.built_at > max_age):
+        index.rebuild(date.today())
+    # another thread is still building the index for the first time
+    if index.built_at is None:
+        return None
+    return index
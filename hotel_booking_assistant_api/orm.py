@@ -2,23 +2,13 @@
 
 # IMPORTS
 import hashlib
-import json
-from flask import Flask, url_for, request, Response
+from flask import url_for, request
 from flask_sqlalchemy import SQLAlchemy
-from flasgger import Swagger
-from static.constants import LINK_RELATIONS_URL, MASON
-
-app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///hotel_booking_assistant.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SWAGGER"] = {
-    "title": "Booking Assistant API",
-    "openapi": "3.0.3",
-    "uiversion": 3,
-    "doc_dir": "./doc"
-}
-swagger = Swagger(app, template_file="doc/bookingassistant.yml")
-db = SQLAlchemy(app)
+from static.constants import LINK_RELATIONS_URL
+from render import mason_response
+
+# bound to applications in app.create_app()
+db = SQLAlchemy()
 
 class Hotel(db.Model):
 
@@ -34,6 +24,11 @@ class Hotel(db.Model):
     # relationships
     rooms = db.relationship("Room", back_populates="hotel")
     admins = db.relationship("Admin", back_populates="hotel")
+    # indexes for room search by location
+    __table_args__ = (
+        db.Index("ix_hotel_country_city", "country", "city"),
+        db.Index("ix_hotel_city", "city"),
+    )
 
 class Room(db.Model):
 
@@ -49,6 +44,10 @@ class Room(db.Model):
     # relationships
     hotel = db.relationship("Hotel", back_populates="rooms")
     bookings = db.relationship("Booking", back_populates="room")
+    # index for rooms of a given type in a hotel
+    __table_args__ = (
+        db.Index("ix_room_hotel_id_type", "hotel_id", "type"),
+    )
 
     def serialize(self):
         """
@@ -75,9 +74,17 @@ class Booking(db.Model):
     check_in = db.Column(db.DATE, nullable=False)
     check_out = db.Column(db.DATE, nullable=False)
     payment = db.Column(db.String(64), nullable=False)
+    # incremented on every update, used for ETags and optimistic locking
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
     # relationships
     room = db.relationship("Room", back_populates="bookings")
     customer = db.relationship("Customer", back_populates="bookings")
+    # indexes for availability checks and bookings of a customer
+    __table_args__ = (
+        db.Index("ix_booking_room_id_check_in_check_out", "room_id", "check_in", "check_out"),
+        db.Index("ix_booking_customer_id", "customer_id"),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
     def serialize(self, short_form = False):
         """
@@ -89,8 +96,8 @@ class Booking(db.Model):
             room_number = self.room.number,
             hotel = self.room.hotel.name,
             customer_id = self.customer_id,
-            check_in = self.check_in and self.check_in.isoformat(),
-            check_out = self.check_out and self.check_out.isoformat(),
+            check_in = self.check_in,
+            check_out = self.check_out,
             payment = self.payment
         )
         if short_form:
@@ -150,8 +157,16 @@ class Customer(db.Model):
     phone = db.Column(db.String(64), nullable=False)
     mail = db.Column(db.String(64), unique=True, nullable=False)
     address = db.Column(db.String(64), nullable=False)
+    # incremented on every update, used for ETags and optimistic locking
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
     # relationships
     bookings = db.relationship("Booking", back_populates="customer")
+    # indexes for customer search (mail is indexed by its unique constraint)
+    __table_args__ = (
+        db.Index("ix_customer_name_lower", db.func.lower(name)),
+        db.Index("ix_customer_phone", "phone"),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
     def serialize(self, short_form = False):
         """
@@ -222,6 +237,10 @@ class ApiKey(db.Model):
 
     # relationships
     admin = db.relationship("Admin", back_populates="apikey", uselist=False)
+    # index for key lookups by admin
+    __table_args__ = (
+        db.Index("ix_apikey_admin_username", "admin_username"),
+    )
 
     # method for hashing
     @staticmethod
@@ -345,37 +364,114 @@ class MasonBuilder(dict):
             title=title
         )
 
+class FrozenDict(dict):
+
+    """
+    Read-only dict used for hypermedia fragments shared between requests.
+    Still a dict, so it is serialized like any other Mason object.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("shared hypermedia fragment cannot be modified")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+def freeze(value):
+    """
+    Recursively convert dicts to FrozenDict and lists to tuples
+    """
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
 class BookingAssistantBuilder(MasonBuilder):
     """
     Class for building hypermedia
     """
+
+    # control fragments shared by every response, see build_fragments()
+    fragments = {}
+
+    # collection endpoint and query template of the controls that have no entity
+    collection_hrefs = {
+        "add-apikey": ("apikeycollection", ""),
+        "delete-apikey": ("apikeycollection", ""),
+        "add-customer": ("customercollection", ""),
+        "add-booking": ("bookingcollection", ""),
+        "rooms-av-all": (
+            "roomcollection",
+            "?country={country}&city={city}&room_type={room_type}&check_in={check_in}&check_out={check_out}"),
+    }
+
+    @classmethod
+    def build_fragments(cls):
+        """
+        Precompute the controls without their hrefs. Schemas and titles are
+        the same for every app and are built once and frozen. Hrefs are
+        filled in per request with url_for, so they follow the application
+        root (SCRIPT_NAME) of the app serving the request.
+        """
+        fragments = {
+            "add-apikey": dict(
+                method="POST", encoding="json", title="Create API key",
+                schema=ApiKey.json_schema()),
+            "delete-apikey": dict(method="DELETE", title="Delete API key"),
+            "add-customer": dict(
+                method="POST", encoding="json", title="Add new customer",
+                schema=Customer.json_schema()),
+            "add-booking": dict(
+                method="POST", encoding="json", title="Add new booking",
+                schema=Booking.json_schema()),
+            "get-customer": dict(method="GET", title="Get details of the customer"),
+            "delete-customer": dict(method="DELETE", title="Delete the customer"),
+            "edit-customer": dict(
+                method="PUT", encoding="json", title="Update customer", schema=Customer.json_schema()),
+            "get-booking": dict(method="GET", title="Get details of the booking"),
+            "delete-booking": dict(method="DELETE", title="Delete booking"),
+            "edit-booking": dict(
+                method="PUT", encoding="json", title="Edit the booking", schema=Booking.json_schema()),
+            "rooms-av-all": dict(title="Get available rooms", method="GET", isHrefTemplate=True),
+        }
+        cls.fragments = {name: freeze(control) for name, control in fragments.items()}
+
+    def add_shared_control(self, ctrl_name, fragment, href=None):
+        """
+        Add a precomputed control with an entity specific href, or the
+        href of its collection if none is given
+        """
+        if not self.fragments:
+            BookingAssistantBuilder.build_fragments()
+
+        if "@controls" not in self:
+            self["@controls"] = {}
+
+        if href is None:
+            endpoint, query = self.collection_hrefs[fragment]
+            href = url_for(endpoint) + query
+        self["@controls"][ctrl_name] = dict(self.fragments[fragment], href=href)
+
     def add_control_add_apikey(self):
         """
         Control for adding API keys
         """
-        self.add_control_post(
-            "bookie:add-apikey",
-            "Create API key",
-            url_for("apikeycollection"),
-            ApiKey.json_schema()
-        )
+        self.add_shared_control("bookie:add-apikey", "add-apikey")
 
     def add_control_delete_apikey(self):
         """
         Control for deleting API keys
         """
-        self.add_control_delete(
-            "Delete API key",
-            url_for("apikeycollection"),
-        )
+        self.add_shared_control("bookie:delete", "delete-apikey")
 
     def add_control_get_customer(self, customer):
         """
         Control for getting a customer
         """
-        self.add_control_get(
+        self.add_shared_control(
             "bookie:customer",
-            "Get details of the customer",
+            "get-customer",
             url_for("customer", customer = customer)
         )
 
@@ -383,19 +479,15 @@ class BookingAssistantBuilder(MasonBuilder):
         """
         Control for adding a customer
         """
-        self.add_control_post(
-            "bookie:add-customer",
-            title="Add new customer",
-            href=url_for("customercollection"),
-            schema=Customer.json_schema()
-        )
+        self.add_shared_control("bookie:add-customer", "add-customer")
 
     def add_control_delete_customer(self, customer):
         """
         Control for deleting a customer
         """
-        self.add_control_delete(
-            "Delete the customer",
+        self.add_shared_control(
+            "bookie:delete",
+            "delete-customer",
             url_for("customer", customer = customer)
         )
 
@@ -403,19 +495,19 @@ class BookingAssistantBuilder(MasonBuilder):
         """
         Control for editing a customer
         """
-        self.add_control_put(
-            "Update customer",
-            url_for("customer", customer = customer),
-            Customer.json_schema()
+        self.add_shared_control(
+            "edit",
+            "edit-customer",
+            url_for("customer", customer = customer)
         )
 
     def add_control_get_booking(self, booking):
         """
         Control for getting a booking
         """
-        self.add_control_get(
+        self.add_shared_control(
             "bookie:booking",
-            "Get details of the booking",
+            "get-booking",
             url_for("booking", booking = booking)
         )
 
@@ -423,8 +515,9 @@ class BookingAssistantBuilder(MasonBuilder):
         """
         Control for deleting a booking
         """
-        self.add_control_delete(
-            "Delete booking",
+        self.add_shared_control(
+            "bookie:delete",
+            "delete-booking",
             url_for("booking", booking = booking)
         )
 
@@ -432,34 +525,42 @@ class BookingAssistantBuilder(MasonBuilder):
         """
         Control for adding a booking
         """
-        self.add_control_post(
-            "bookie:add-booking",
-            "Add new booking",
-            url_for("bookingcollection"),
-            Booking.json_schema()
-        )
+        self.add_shared_control("bookie:add-booking", "add-booking")
 
     def add_control_edit_bookings(self, booking):
         """
         Control for editing a booking
         """
-        self.add_control_put(
-            "Edit the booking",
-            url_for("booking", booking = booking),
-            Booking.json_schema()
+        self.add_shared_control(
+            "edit",
+            "edit-booking",
+            url_for("booking", booking = booking)
         )
 
     def add_control_avl_rooms(self):
         """
         Control for getting rooms
         """
-        self.add_control(
-            "bookie:rooms-av-all",
-            url_for("roomcollection") +
-            "?country={country}&city={city}&room_type={room_type}&check_in={check_in}&check_out={check_out}",
-            title="Get available rooms",
-            method = "GET",
-            isHrefTemplate = True
+        self.add_shared_control("bookie:rooms-av-all", "rooms-av-all")
+
+    def add_control_next(self, href):
+        """
+        Control for getting the next page of a collection
+        """
+        self.add_control_get(
+            "next",
+            "Next page",
+            href
+        )
+
+    def add_control_prev(self, href):
+        """
+        Control for getting the previous page of a collection
+        """
+        self.add_control_get(
+            "prev",
+            "Previous page",
+            href
         )
 
 def create_error_response(status_code, title, message=None):
@@ -469,4 +570,4 @@ def create_error_response(status_code, title, message=None):
     resource_url = request.path
     data = MasonBuilder(resource_url=resource_url)
     data.add_error(title, message)
-    return Response(json.dumps(data), status=status_code, mimetype=MASON)
+    return mason_response(data, status_code)
@@ -0,0 +1,71 @@
+""" Keyset (cursor) pagination helpers for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+NEXT = "next"
+PREV = "prev"
+
+def parse_limit(value):
+    """
+    Convert the limit query parameter into a page size.
+    Raises ValueError for anything that is not a positive integer.
+    """
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+def encode_cursor(direction, key):
+    """
+    Build an opaque cursor token pointing past the given key
+    """
+    raw = json.dumps({"d": direction, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token):
+    """
+    Read a cursor token back into (direction, key).
+    Raises ValueError if the token was not produced by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        direction, key = data["d"], data["k"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("invalid cursor") from e
+    if direction not in (NEXT, PREV) or not isinstance(key, int):
+        raise ValueError("invalid cursor")
+    return direction, key
+
+def keyset_page(query, key, limit, cursor=None):
+    """
+    Fetch one page of query ordered by the unique integer column key.
+    Returns (rows, next_cursor, prev_cursor), cursors are None when there is
+    no page in that direction.
+    """
+    direction, value = decode_cursor(cursor) if cursor else (NEXT, None)
+    query = query.order_by(None)
+
+    if direction == NEXT:
+        if value is not None:
+            query = query.filter(key > value)
+        rows = query.order_by(key).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(NEXT, getattr(rows[-1], key.key)) if has_more else None
+        prev_cursor = encode_cursor(PREV, getattr(rows[0], key.key)) if value is not None and rows else None
+    else:
+        rows = query.filter(key < value).order_by(key.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        prev_cursor = encode_cursor(PREV, getattr(rows[0], key.key)) if has_more else None
+        next_cursor = encode_cursor(NEXT, getattr(rows[-1], key.key)) if rows else None
+
+    return rows, next_cursor, prev_cursor
@@ -1,112 +1,259 @@
 import json
 import os
 import datetime
-from orm import Hotel, Room, Booking, Customer, Admin, app, db
-from sqlalchemy import exc
+import random
+import time
+from flask import current_app
+from orm import Hotel, Room, Booking, Customer, Admin, db
+from sqlalchemy import exc, func, insert, select
+from sqlalchemy.orm import joinedload, selectinload
 
-def populate_db():
-    # work inside current app context
-    with app.app_context():
+# ijson parses large files incrementally, without it files are loaded at once
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-        # initiate database
-        db.create_all()
+# synthetic dataset scales: number of rooms and bookings per room
+SCALES = {
+    "10": (10, 10),
+    "1k": (1000, 20),
+    "100k": (100000, 20),
+}
 
-        # read json for populating the database
-        with open(os.getcwd() + "/data.json") as f:
+# layout of synthetic datasets
+SYNTHETIC_ROOMS_PER_HOTEL = 50
+SYNTHETIC_HOTELS_PER_CITY = 10
+SYNTHETIC_ROOM_TYPES = ("single", "double", "suite")
+SYNTHETIC_ORIGIN = datetime.date(2030, 1, 1)
+SYNTHETIC_PASSWORD = "bench"
+
+def json_arrays(path):
+    """
+    Function returning the items of a top-level array ("customers" or
+    "hotels") of a JSON file, parsed incrementally on every call if ijson
+    is installed, otherwise from the file loaded once
+    """
+    if ijson is None:
+        with open(path) as f:
             data = json.load(f)
+        return lambda name: data[name]
 
-        # add example customers to the database
-        customers = []
-        for customer in data["customers"]:
-            # create customer entry
-            customer_entry = Customer(name=customer["name"], phone=customer["phone"], mail=customer["mail"], address=customer["address"])
+    def items(name):
+        with open(path, "rb") as f:
+            yield from ijson.items(f, name + ".item", use_float=True)
+    return items
 
-            # add customer entry to list
-            customers.append(customer_entry)
+class BulkInserter:
 
-        # add example hotels to the database
-        rooms = []
-        hotels = []
-        admins = []
-        bookings = []
-        for hotel in data["hotels"]:
+    """
+    Rows buffered per model and inserted with Core executemany in chunks.
+    All buffers are flushed together in the order the models were given,
+    so rows are always inserted after the rows they refer to.
+    """
 
-            # append new hotel object to list
-            hotel_entry = Hotel(name=hotel["name"], country=hotel["country"], city=hotel["city"], street=hotel["street"])
+    def __init__(self, *models, chunk_size=10000, progress=None):
+        self.buffers = {model: [] for model in models}
+        self.counts = {model.__tablename__: 0 for model in models}
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.started = time.perf_counter()
 
-            # add hotel entry to list
-            hotels.append(hotel_entry)
+    def add(self, model, row):
+        """ Buffer a row, flushing once the buffer of the model is full """
+        buffer = self.buffers[model]
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            self.flush()
 
-            # add room entry to hotel
-            for room in hotel["rooms"]:
+    def flush(self):
+        """ Insert all buffered rows """
+        for model, rows in self.buffers.items():
+            if rows:
+                db.session.execute(insert(model.__table__), rows)
+                self.buffers[model] = []
+                table = model.__tablename__
+                self.counts[table] += len(rows)
+                if self.progress is not None:
+                    self.progress(table, self.counts[table], time.perf_counter() - self.started)
 
-                # create room entry
-                room_entry = Room(number=room["number"], type=room["type"], price=room["price"], hotel=hotel_entry)
+def print_progress(table, rows, seconds):
+    """
+    Progress callback printing rows inserted into a table and rows/sec
+    """
+    print("{}: {} rows, {:.0f} rows/s".format(table, rows, rows / max(seconds, 1e-9)))
 
-                # add room entry to list
-                rooms.append(room_entry)
+def populate_db(app=None, path=None, chunk_size=10000, progress=None):
+    """
+    Populate the database from data.json (or the JSON file at path) with
+    chunked Core inserts. Customers are read first to map every booking ref
+    to its customer, then hotels with their rooms, bookings and admins are
+    read one at a time. progress(table, rows, seconds) is called after
+    every chunk. Returns the number of rows inserted per table, or None if
+    nothing was inserted because the data conflicts with the database.
+    """
+    # work inside an app context of the given or current application
+    with (app or current_app).app_context():
 
-                # get bookings for each room
-                for booking in room["bookings"]:
+        # initiate database
+        db.create_all()
+        json_items = json_arrays(path or os.getcwd() + "/data.json")
 
-                    # get booking ref
-                    booking_ref = booking["booking_ref"]
+        # assign ids after existing rows so that new rows can refer to each other
+        next_ids = {model: (db.session.scalar(select(func.max(model.id))) or 0) + 1 for model in (Customer, Hotel, Room)}
+        inserter = BulkInserter(Customer, Hotel, Room, Admin, Booking, chunk_size=chunk_size, progress=progress)
 
-                    # create datetime variables for db
-                    check_in = booking["check_in"]
-                    check_out = booking["check_out"]
-                    check_in = datetime.datetime(check_in[0], check_in[1], check_in[2])
-                    check_out = datetime.datetime(check_out[0], check_out[1], check_out[2])
+        try:
+            # add example customers and remember the customer of every booking
+            booking_customers = {}
+            for customer in json_items("customers"):
+                customer_id = next_ids[Customer]
+                next_ids[Customer] += 1
+                inserter.add(Customer, {"id": customer_id, "name": customer["name"], "phone": customer["phone"],
+                                        "mail": customer["mail"], "address": customer["address"]})
+                for booking_ref in customer["bookings"]:
+                    booking_customers[booking_ref] = customer_id
 
-                    # find the corresponding customer entry
-                    try:
-                        # find customer
-                        customer = customers[[idx for idx, customer in enumerate(data["customers"]) if booking_ref in customer["bookings"]].pop()]
+            # add example hotels to the database
+            for hotel in json_items("hotels"):
+                hotel_id = next_ids[Hotel]
+                next_ids[Hotel] += 1
+                inserter.add(Hotel, {"id": hotel_id, "name": hotel["name"], "country": hotel["country"],
+                                     "city": hotel["city"], "street": hotel["street"]})
 
-                        # create new booking entry for customer
-                        bookings.append(Booking(booking_ref=booking_ref, check_in=check_in, check_out=check_out, payment=booking["payment"], room=room_entry, customer=customer))
+                # add rooms of the hotel
+                for room in hotel["rooms"]:
+                    room_id = next_ids[Room]
+                    next_ids[Room] += 1
+                    inserter.add(Room, {"id": room_id, "hotel_id": hotel_id, "number": room["number"],
+                                        "type": room["type"], "price": room["price"]})
 
-                    except IndexError:
-                        print("No customer information available for booking ref: {}. Booking is not added!".format(booking_ref))
+                    # add bookings of the room for known customers
+                    for booking in room["bookings"]:
+                        booking_ref = booking["booking_ref"]
+                        customer_id = booking_customers.get(booking_ref)
+                        if customer_id is None:
+                            print("No customer information available for booking ref: {}. Booking is not added!".format(booking_ref))
+                            continue
+                        inserter.add(Booking, {"booking_ref": booking_ref, "room_id": room_id, "customer_id": customer_id,
+                                               "check_in": datetime.date(*booking["check_in"]),
+                                               "check_out": datetime.date(*booking["check_out"]),
+                                               "payment": booking["payment"]})
 
-            # add admin entry to hotel
-            for admin in hotel["admins"]:
-                
-                # create and add admin entry to list
-                admins.append(Admin(username=admin["username"], password=admin["password"], hotel=hotel_entry))
-        
-        # add all to database
-        try:
-            db.session.add_all(bookings)
-            db.session.add_all(admins)
+                # add admins of the hotel
+                for admin in hotel["admins"]:
+                    inserter.add(Admin, {"username": admin["username"], "password": admin["password"], "hotel_id": hotel_id})
+
+            # add the rest to database
+            inserter.flush()
             db.session.commit()
         except exc.IntegrityError:
+            db.session.rollback()
             print("Hotel/Room/Admin entry exists in the DB or the data entered is incorrect. Remove the DB and try again!")
+            return None
+
+        return inserter.counts
+
+def insert_chunks(model, rows, chunk_size=10000, progress=None):
+    """
+    Insert rows (dicts, any iterable) into the table of a model with Core
+    executemany in chunks of chunk_size, so that generated rows never have
+    to be in memory at once. Returns the number of rows inserted.
+    """
+    inserter = BulkInserter(model, chunk_size=chunk_size, progress=progress)
+    for row in rows:
+        inserter.add(model, row)
+    inserter.flush()
+    return inserter.counts[model.__tablename__]
+
+def populate_synthetic(rooms, bookings_per_room, app=None, seed=1, chunk_size=10000, progress=None):
+    """
+    Populate the database with a reproducible synthetic dataset: hotels of
+    SYNTHETIC_ROOMS_PER_HOTEL rooms grouped into cities, as many customers as
+    rooms and bookings_per_room consecutive stays per room starting at
+    SYNTHETIC_ORIGIN. Hotel n is "Synth<n>" in "City<m>" with admin
+    "admin<n>" (password SYNTHETIC_PASSWORD). progress is passed on to
+    insert_chunks. Returns the number of rows inserted per table.
+    """
+    with (app or current_app).app_context():
+        db.create_all()
+        rng = random.Random(seed)
+        hotels = (rooms - 1) // SYNTHETIC_ROOMS_PER_HOTEL + 1
+        customers = max(rooms, 10)
+
+        def booking_rows():
+            booking_ref = 0
+            for room_id in range(1, rooms + 1):
+                night = SYNTHETIC_ORIGIN
+                for _ in range(bookings_per_room):
+                    night += datetime.timedelta(days=rng.randint(0, 6))
+                    check_out = night + datetime.timedelta(days=rng.randint(1, 7))
+                    booking_ref += 1
+                    yield {"booking_ref": booking_ref, "room_id": room_id,
+                           "customer_id": rng.randint(1, customers), "payment": rng.choice(("cash", "credit")),
+                           "check_in": night, "check_out": check_out}
+                    night = check_out
 
-def print_db():
+        counts = {
+            "hotel": insert_chunks(Hotel, ({
+                "id": hotel, "name": f"Synth{hotel}", "country": "Synthland",
+                "city": f"City{(hotel - 1) // SYNTHETIC_HOTELS_PER_CITY + 1}", "street": f"Street {hotel}"
+                } for hotel in range(1, hotels + 1)), chunk_size, progress),
+            "admin": insert_chunks(Admin, ({
+                "username": f"admin{hotel}", "password": SYNTHETIC_PASSWORD, "hotel_id": hotel
+                } for hotel in range(1, hotels + 1)), chunk_size, progress),
+            "room": insert_chunks(Room, ({
+                "id": room_id, "hotel_id": (room_id - 1) // SYNTHETIC_ROOMS_PER_HOTEL + 1, "number": room_id,
+                "type": SYNTHETIC_ROOM_TYPES[room_id % len(SYNTHETIC_ROOM_TYPES)], "price": 50 + room_id % 200
+                } for room_id in range(1, rooms + 1)), chunk_size, progress),
+            "customer": insert_chunks(Customer, ({
+                "id": customer, "name": f"Customer {customer}", "phone": f"+358{customer:09d}",
+                "mail": f"customer{customer}@example.com", "address": f"Street {customer}"
+                } for customer in range(1, customers + 1)), chunk_size, progress),
+            "booking": insert_chunks(Booking, booking_rows(), chunk_size, progress),
+        }
+        db.session.commit()
+        return counts
 
-    with app.app_context():
+def print_db(app=None):
+
+    with (app or current_app).app_context():
 
         # query hotels and rooms from the database
-        for hotel in Hotel.query.all():
+        for hotel in Hotel.query.options(selectinload(Hotel.rooms)):
             print("\n{} has the following rooms with prices:".format(hotel.name))
             for room in hotel.rooms:
                 print("Room type: {}, Price: {} eur".format(room.type, room.price))
 
         # query all bookings from the database
         print("\n")
-        for booking in Booking.query.all():
+        for booking in Booking.query.options(
+                joinedload(Booking.customer), joinedload(Booking.room).joinedload(Room.hotel)):
             print("{} has booked room No. {} in {} from {} to {}".format(booking.customer.name, booking.room.number, booking.room.hotel.name, booking.check_in, booking.check_out))
         
         # query all administrators from the database
         print("\n")
-        for admin in Admin.query.all():
+        for admin in Admin.query.options(joinedload(Admin.hotel)):
             print("{} is an administrator for {}".format(admin.username, admin.hotel.name))
 
 if __name__ == "__main__":
 
-    # populate database from json
-    populate_db()
+    import sys
+    from app import create_app
+    app = create_app({"SWAGGER_ENABLED": False})
+    started = time.perf_counter()
+
+    # populate database with a synthetic dataset of the given scale or
+    # from the given json file, otherwise from data.json
+    if len(sys.argv) > 1 and sys.argv[1] in SCALES:
+        counts = populate_synthetic(*SCALES[sys.argv[1]], app=app, progress=print_progress)
+    else:
+        counts = populate_db(app, sys.argv[1] if len(sys.argv) > 1 else None, progress=print_progress)
+        if counts is None:
+            sys.exit(1)
+    seconds = time.perf_counter() - started
+    print("{} rows in {:.1f} s, {:.0f} rows/s".format(sum(counts.values()), seconds, sum(counts.values()) / seconds))
 
     # print data from database
-    print_db()
\ No newline at end of file
+    if len(sys.argv) == 1:
+        print_db(app)
\ No newline at end of file
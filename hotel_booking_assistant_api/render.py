@@ -0,0 +1,66 @@
+""" Response rendering for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import json
+from datetime import date
+from flask import Response
+from static.constants import MASON
+from instrumentation import timed
+
+# faster encoders are used when installed, stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+def _stdlib_default(value):
+    """
+    Encode values stdlib json does not know (dates) the same way orjson does
+    """
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _stdlib_dumps(data):
+    return json.dumps(data, default=_stdlib_default).encode()
+
+ENCODERS = {"json": _stdlib_dumps}
+if msgspec is not None:
+    ENCODERS["msgspec"] = msgspec.json.Encoder().encode
+if orjson is not None:
+    ENCODERS["orjson"] = orjson.dumps
+
+# name of the encoder in use, see select_encoder()
+encoder = None
+_dumps = None
+
+def select_encoder(name=None):
+    """
+    Choose the JSON encoder by name, or the fastest installed one
+    (orjson, then msgspec, then stdlib json) if name is None
+    """
+    global encoder, _dumps
+    if name is None:
+        name = next(name for name in ("orjson", "msgspec", "json") if name in ENCODERS)
+    if name not in ENCODERS:
+        raise ValueError(f"JSON encoder {name} is not installed")
+    encoder, _dumps = name, ENCODERS[name]
+
+select_encoder()
+
+@timed("serialize")
+def dumps(data):
+    """
+    Serialize a Mason document (dicts, lists/tuples, numbers, strings, dates) to bytes
+    """
+    return _dumps(data)
+
+def mason_response(body, status=200, headers=None):
+    """
+    Build a Mason response from a document
+    """
+    return Response(dumps(body), status=status, headers=headers, mimetype=MASON)
@@ -6,9 +6,10 @@ import secrets
 from flask_restful import Resource
 from flask import Response, request
 from werkzeug.exceptions import HTTPException
-from jsonschema import validate, ValidationError, draft7_format_checker
+from jsonschema import ValidationError
 from orm import Admin, ApiKey, db, create_error_response
-from keyFunc import any_admin
+from keyFunc import any_admin, api_key_cache
+from validation import validate_request
 from static.constants import MASON
 
 class ApiKeyCollection(Resource):
@@ -23,10 +24,22 @@ class ApiKeyCollection(Resource):
         # get apikey of admin
         apikey = ApiKey.query.filter_by(admin_username=request.headers["Admin-User-Name"]).first()
 
+        # the key may have been verified from the cache after another worker deleted it
+        if apikey is None:
+            api_key_cache.invalidate(request.headers["Admin-User-Name"])
+            return create_error_response(
+                403,
+                "Forbidden",
+                "Admin has no API key!"
+                )
+
         # delete apikey of admin
         db.session.delete(apikey)
         db.session.commit()
 
+        # forget the verified key
+        api_key_cache.invalidate(apikey.admin_username)
+
         # return response
         return Response(status=204, mimetype=MASON)
 
@@ -44,7 +57,7 @@ class ApiKeyCollection(Resource):
 
         # validate request format
         try:
-            validate(request.json, ApiKey.json_schema(), format_checker=draft7_format_checker)
+            validate_request(ApiKey, request.json)
         except ValidationError as e:
             raise HTTPException(response=create_error_response(400, "BadRequest", str(e))) from e
 
@@ -79,5 +92,8 @@ class ApiKeyCollection(Resource):
         db.session.add(apikey_entry)
         db.session.commit()
 
+        # drop anything cached for the admin's previous key
+        api_key_cache.invalidate(admin.username)
+
         # return success response
         return Response(status=201, headers={"Hotels-Api-Key": token}, mimetype=MASON)
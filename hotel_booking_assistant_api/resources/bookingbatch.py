@@ -0,0 +1,156 @@
+"""
+Resource methods for BookingBatch
+"""
+from datetime import date
+from jsonschema import ValidationError
+from werkzeug.exceptions import HTTPException
+from flask import request, url_for
+from flask_restful import Resource
+from orm import Hotel, Room, Booking, Customer, db, BookingAssistantBuilder, create_error_response
+from keyFunc import batch_booking_admin
+from validation import validate_request
+from availability import booking_snapshot, lock_allocation
+from occupancy import record_booking
+from searchcache import booking_change, invalidate_searches
+from render import mason_response
+from static.constants import LINK_RELATIONS_URL
+
+# largest number of bookings accepted in one request
+MAX_BATCH_SIZE = 200
+
+class BookingBatch(Resource):
+
+    """ Class with method for adding a group of entries to Booking table in one request """
+
+    @batch_booking_admin
+    def post(self):
+
+        """ Create many Booking entries in one transaction (POST) """
+
+        # check request type
+        if request.headers["Content-Type"] != "application/json":
+            raise HTTPException(response=create_error_response(
+                415,
+                "UnsupportedMediaType",
+                "Request type was not JSON!")
+                )
+
+        # check batch size
+        items = request.json
+        if not items or len(items) > MAX_BATCH_SIZE:
+            raise HTTPException(response=create_error_response(
+                400,
+                "BadRequest",
+                f"A batch must contain between 1 and {MAX_BATCH_SIZE} bookings!")
+                )
+
+        # validate every item, invalid ones are reported but do not stop the batch
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            try:
+                validate_request(Booking, item)
+            except ValidationError as e:
+                results[index] = self._failure(index, "invalid", e.message)
+                continue
+
+            check_in = date.fromisoformat(item["check_in"])
+            check_out = date.fromisoformat(item["check_out"])
+            if check_out <= check_in:
+                results[index] = self._failure(index, "invalid", "Incorrect check-in/check-out dates")
+                continue
+            pending.append((index, item, check_in, check_out))
+
+        # load hotels, customers and candidate rooms once for the whole batch
+        hotels = {
+            hotel.name: hotel
+            for hotel in Hotel.query.filter(Hotel.name.in_({item["hotel"] for _, item, _, _ in pending}))
+            }
+        customers = {
+            customer.id: customer
+            for customer in Customer.query.filter(
+                Customer.id.in_({item["customer_id"] for _, item, _, _ in pending}))
+            }
+        room_types = {item["room_type"] for _, item, _, _ in pending}
+        rooms = {}
+        for room in Room.query.filter(
+                Room.hotel_id.in_([hotel.id for hotel in hotels.values()]),
+                Room.type.in_(room_types)
+                ).order_by(Room.id):
+            rooms.setdefault((room.hotel_id, room.type), []).append(room)
+
+        # availability snapshot covering every requested stay
+        snapshot = {}
+        if pending:
+            lock_allocation([hotel.id for hotel in hotels.values()], room_types)
+            snapshot = booking_snapshot(
+                [hotel.id for hotel in hotels.values()],
+                room_types,
+                min(check_in for _, _, check_in, _ in pending),
+                max(check_out for _, _, _, check_out in pending)
+                )
+
+        # allocate rooms in request order
+        created = []
+        for index, item, check_in, check_out in pending:
+            hotel = hotels.get(item["hotel"])
+            customer = customers.get(item["customer_id"])
+            if hotel is None:
+                results[index] = self._failure(
+                    index, "not_found", f'Hotel with name {item["hotel"]} was not found!')
+                continue
+            if customer is None:
+                results[index] = self._failure(
+                    index, "not_found", f'Customer with id {item["customer_id"]} was not found!')
+                continue
+
+            candidates = rooms.get((hotel.id, item["room_type"]), [])
+            room = next((room for room in candidates if snapshot[room.id].is_free(check_in, check_out)), None)
+            if room is None:
+                results[index] = self._failure(
+                    index, "conflict", "No room of the requested type is available")
+                continue
+
+            # reserve the nights in the snapshot for the rest of the batch
+            snapshot[room.id].add(check_in, check_out)
+            booking_entry = Booking(
+                check_in=check_in, check_out=check_out,
+                payment=item["payment"], room=room, customer=customer
+                )
+            created.append((index, booking_entry, room.id))
+
+        # add all bookings to db in one transaction, results are built
+        # before commit while rooms and hotels are still loaded
+        changes = [
+            booking_change(booking_entry.room, booking_entry.check_in, booking_entry.check_out)
+            for _, booking_entry, _ in created
+            ]
+        stays = [(room_id, booking_entry.check_in, booking_entry.check_out) for _, booking_entry, room_id in created]
+        db.session.add_all([booking_entry for _, booking_entry, _ in created])
+        db.session.flush()
+        for index, booking_entry, _ in created:
+            result = booking_entry.serialize(short_form=True)
+            result["index"] = index
+            result["status"] = "created"
+            results[index] = result
+        db.session.commit()
+
+        for room_id, check_in, check_out in stays:
+            record_booking(room_id, check_in, check_out)
+        invalidate_searches(*changes)
+
+        # generate hypermedia response
+        body = BookingAssistantBuilder()
+        body.add_namespace("bookie", LINK_RELATIONS_URL)
+        body.add_control("self", href=url_for("bookingbatch"))
+        body.add_control_add_bookings()
+        body["items"] = results
+
+        return mason_response(body, 200)
+
+    @staticmethod
+    def _failure(index, status, message):
+
+        """ Result entry for a booking that was not created """
+
+        return BookingAssistantBuilder(index=index, status=status, message=message)
@@ -1,19 +1,72 @@
 """
 Resource methods for BookingCollection
 """
-import json
-from datetime import date, timedelta
-from jsonschema import validate, ValidationError, draft7_format_checker
+from datetime import date
+from jsonschema import ValidationError
 from werkzeug.exceptions import HTTPException
-from flask import Response, request
+from flask import request, url_for
 from flask_restful import Resource
+from sqlalchemy.orm import joinedload
 from orm import Hotel, Room, Booking, Customer, db, BookingAssistantBuilder, create_error_response
-from keyFunc import new_booking_admin
-from static.constants import MASON, LINK_RELATIONS_URL
+from keyFunc import new_booking_admin, hotels_admin
+from validation import validate_request
+from availability import find_free_room, lock_allocation
+from occupancy import record_booking
+from searchcache import booking_change, invalidate_searches
+from render import mason_response
+from static.constants import LINK_RELATIONS_URL
+
+# most bookings looked up in one request
+MAX_LOOKUP_REFS = 500
 
 class BookingCollection(Resource):
 
-    """ Class with method for adding new entries to Booking table """
+    """ Class with methods for looking up and adding entries of Booking table """
+
+    @hotels_admin
+    def get(self, identity):
+
+        """ Get Booking entries by booking reference (GET) """
+
+        # get booking refs, comma separated and without duplicates
+        # (without refs the collection is empty but still offers its controls)
+        try:
+            refs = list(dict.fromkeys(int(ref) for ref in request.args["refs"].split(",")))
+        except KeyError:
+            refs = []
+        except ValueError:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         "Query parameter refs must be a comma separated list of booking refs")
+        if len(refs) > MAX_LOOKUP_REFS:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         f"At most {MAX_LOOKUP_REFS} bookings can be looked up at once")
+
+        # one query for all bookings with their rooms and hotels
+        bookings = {
+            booking.booking_ref: booking
+            for booking in Booking.query.options(
+                joinedload(Booking.room).joinedload(Room.hotel)
+                ).filter(Booking.booking_ref.in_(refs))
+            }
+
+        # every booking found must belong to one of the admin's hotels
+        if any(booking.room is None or booking.room.hotel_id not in identity.hotel_ids
+               for booking in bookings.values()):
+            return create_error_response(403,
+                                         "Forbidden",
+                                         "Admin is unauthorized!")
+
+        # generate hypermedia response, items in the order requested
+        body = BookingAssistantBuilder()
+        body.add_namespace("bookie", LINK_RELATIONS_URL)
+        body.add_control("self", href=url_for("bookingcollection", refs=",".join(map(str, refs)) or None))
+        body.add_control_add_bookings()
+        body["items"] = [bookings[ref].serialize(short_form=True) for ref in refs if ref in bookings]
+        body["missing"] = [ref for ref in refs if ref not in bookings]
+
+        return mason_response(body, 200)
 
     @new_booking_admin
     def post(self):
@@ -30,7 +83,7 @@ class BookingCollection(Resource):
 
         # validate request format
         try:
-            validate(request.json, Booking.json_schema(), format_checker=draft7_format_checker)
+            validate_request(Booking, request.json)
         except ValidationError as e:
             raise HTTPException(response=create_error_response(
                 400,
@@ -62,62 +115,50 @@ class BookingCollection(Resource):
         # get payment information
         payment = request.json["payment"]
 
-        # compute and check length of stay
-        duration = check_out - check_in
-        days_to_book = [check_in + timedelta(days=day) for day in range(duration.days)]
-        if duration.days <= 0:
+        # check length of stay
+        if check_out <= check_in:
             return create_error_response(400, "Bad Request", "Incorrect check-in/check-out dates")
 
-        # get possible rooms for booking
-        rooms = Room.query.filter_by(hotel_id=hotel.id, type=request.json["room_type"]).all()
-        if not rooms:
-            raise HTTPException(response=create_error_response(
-                404,
-                "NotFound",
-                f'Rooms in hotel {hotel.id} of type {request.json["room_type"]} are not currently available!'))
-
-        # find out availability of room
-        for room in rooms:
-
-            # initialize list for booked dates
-            dates_booked = []
-
-            # get booked dates
-            for booking in room.bookings:
-
-                # get length of booking
-                duration = booking.check_out - booking.check_in
-
-                # increment the list of booked dates
-                dates_booked.extend(
-                    [booking.check_in + timedelta(days=day) for day in range(duration.days)]
-                    )
-
-            # check if the room can be booked
-            if any(day_to_book in dates_booked for day_to_book in days_to_book):
-                continue
-
-            # add new booking entry for room that is available
-            booking_entry = Booking(
-                check_in=check_in, check_out=check_out,
-                payment=payment, room=room, customer=customer
+        # lock allocation, then find a room that is free for the whole stay
+        lock_allocation([hotel.id], [request.json["room_type"]])
+        room = find_free_room(hotel.id, request.json["room_type"], check_in, check_out)
+        if room is None:
+
+            # no rooms of the requested type at all
+            if Room.query.filter_by(hotel_id=hotel.id, type=request.json["room_type"]).first() is None:
+                raise HTTPException(response=create_error_response(
+                    404,
+                    "NotFound",
+                    f'Rooms in hotel {hotel.id} of type {request.json["room_type"]} are not currently available!'))
+
+            # return conflict response
+            return create_error_response(409,
+                "Conflict",
+                "Failure in POST: No room of the requested type is available"
                 )
 
-            # add booking to db
-            db.session.add(booking_entry)
-            db.session.commit()
-
-            # define hypermedia controls
-            body = BookingAssistantBuilder()
-            body.add_namespace("bookie", LINK_RELATIONS_URL)
-            body.add_control_get_booking(booking_entry)
-            body["item"] = [booking_entry.serialize(short_form=True)]
-
-            # return success response
-            return Response(json.dumps(body), status=201, mimetype=MASON)
-
-        # return conflict response
-        return create_error_response(409,
-            "Conflict",
-            "Failure in POST: No room of the requested type is available"
+        # add new booking entry for room that is available
+        booking_entry = Booking(
+            check_in=check_in, check_out=check_out,
+            payment=payment, room=room, customer=customer
             )
+
+        # add booking to db, the response is built before commit while
+        # room and hotel are still loaded (commit expires them)
+        room_id = room.id
+        change = booking_change(room, check_in, check_out)
+        db.session.add(booking_entry)
+        db.session.flush()
+
+        # define hypermedia controls
+        body = BookingAssistantBuilder()
+        body.add_namespace("bookie", LINK_RELATIONS_URL)
+        body.add_control_get_booking(booking_entry)
+        body["item"] = [booking_entry.serialize(short_form=True)]
+
+        db.session.commit()
+        record_booking(room_id, check_in, check_out)
+        invalidate_searches(change)
+
+        # return success response
+        return mason_response(body, 201)
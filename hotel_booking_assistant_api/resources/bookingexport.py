@@ -0,0 +1,58 @@
+"""
+Resource methods for BookingExport
+"""
+from datetime import datetime
+from flask import Response, request, stream_with_context
+from flask_restful import Resource
+from orm import Hotel, create_error_response
+from keyFunc import hotels_admin
+from export import EXPORT_FORMATS, export_chunks, export_rows
+
+class BookingExport(Resource):
+
+    """ Class with method for exporting bookings of the admin's hotels """
+
+    @hotels_admin
+    def get(self, identity):
+
+        """ Stream bookings joined with room, hotel and customer as CSV or NDJSON (GET) """
+
+        # get export format (optional)
+        export_format = request.args.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+        # get check-in range (optional), check_in_to is the first date not included
+        try:
+            check_in_from = request.args.get("check_in_from")
+            check_in_from = datetime.strptime(check_in_from, "%Y-%m-%d").date() if check_in_from else None
+            check_in_to = request.args.get("check_in_to")
+            check_in_to = datetime.strptime(check_in_to, "%Y-%m-%d").date() if check_in_to else None
+        except ValueError:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         "Invalid query parameter value(s)")
+
+        # get hotel (optional), every hotel of the admin by default
+        hotel_ids = identity.hotel_ids
+        hotel = request.args.get("hotel")
+        if hotel is not None:
+            if hotel not in identity.hotel_names:
+                return create_error_response(403,
+                                             "Forbidden",
+                                             "Admin is unauthorized!")
+            hotel_ids = [Hotel.query.filter_by(name=hotel).first().id]
+
+        # get payment type (optional)
+        payment = request.args.get("payment")
+
+        # rows are read from the database cursor while the response is sent
+        rows = export_rows(hotel_ids, check_in_from, check_in_to, payment)
+        return Response(
+            stream_with_context(export_chunks(rows, export_format)),
+            status=200,
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename=bookings.{export_format}"}
+            )
@@ -1,15 +1,21 @@
 """
 Resource methods for BookingItem
 """
-import json
-from datetime import date, timedelta
-from jsonschema import validate, ValidationError, draft7_format_checker
+from datetime import date
+from jsonschema import ValidationError
 from werkzeug.exceptions import HTTPException
 from flask import Response, request, url_for
 from flask_restful import Resource
+from sqlalchemy.orm.exc import ObjectDeletedError, StaleDataError
+from render import mason_response
 from static.constants import MASON, LINK_RELATIONS_URL
 from orm import Hotel, Room, Booking, Customer, db, BookingAssistantBuilder, create_error_response
 from keyFunc import booking_specific_admin, new_booking_admin
+from validation import validate_request
+from availability import find_free_room, lock_allocation
+from occupancy import refresh_rooms
+from searchcache import booking_change, invalidate_searches
+from conditional import entity_etag, etag_headers, not_modified, stale_write, check_if_match
 
 class BookingItem(Resource):
 
@@ -20,17 +26,23 @@ class BookingItem(Resource):
 
         """ Get Booking entry (GET) """
 
+        # nothing to send if the client has the current version
+        etag = entity_etag(booking.booking_ref, booking.version)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
         body = BookingAssistantBuilder()
         body.add_namespace("bookie", LINK_RELATIONS_URL)
         body.add_control("self", href=url_for("booking", booking=booking))
         body.add_control("collection", href=url_for("bookingcollection"))
         body.add_control_edit_bookings(booking)
         body.add_control_delete_bookings(booking)
-        body.add_control_get_customer(Customer.query.filter_by(id=booking.customer.id).first())
+        body.add_control_get_customer(booking.customer)
         body.add_control_avl_rooms()
         body["item"] = [booking.serialize(short_form=True)]
 
-        return Response(json.dumps(body), status=200, mimetype=MASON)
+        return mason_response(body, 200, etag_headers(etag))
 
     @booking_specific_admin
     def delete(self, booking):
@@ -38,8 +50,16 @@ class BookingItem(Resource):
         """ Delete existing Booking entry (DELETE) """
 
         # delete booking
+        room_id = booking.room_id
+        change = booking_change(booking.room, booking.check_in, booking.check_out)
         db.session.delete(booking)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            # modified or deleted by another request since it was loaded
+            return stale_write(booking)
+        refresh_rooms(room_id)
+        invalidate_searches(change)
 
         return Response(status=204, mimetype=MASON)
 
@@ -55,9 +75,14 @@ class BookingItem(Resource):
                 "UnsupportedMediaType",
                 "Request type was not JSON!"))
 
+        # check that the client edits the current version (kept, taking the
+        # allocation lock may roll back and reload the booking)
+        version = booking.version
+        check_if_match(entity_etag(booking.booking_ref, version))
+
         # validate request format
         try:
-            validate(request.json, Booking.json_schema(), format_checker=draft7_format_checker)
+            validate_request(Booking, request.json)
         except ValidationError as e:
             raise HTTPException(response=create_error_response(
                 400,
@@ -75,8 +100,8 @@ class BookingItem(Resource):
         check_in = date.fromisoformat(request.json["check_in"])
         check_out = date.fromisoformat(request.json["check_out"])
 
-        # get customer instance
-        customer = Customer.query.filter_by(id=request.json["customer_id"]).first()
+        # get customer instance (no query if it is the customer already loaded with the booking)
+        customer = db.session.get(Customer, request.json["customer_id"])
         if customer is None:
             raise HTTPException(response=create_error_response(
                 404,
@@ -86,56 +111,56 @@ class BookingItem(Resource):
         # get payment information
         payment = request.json["payment"]
 
-        # compute and check length of stay
-        duration = check_out - check_in
-        days_to_book = [check_in + timedelta(days=day) for day in range(duration.days)]
-        if duration.days <= 0:
+        # check length of stay
+        if check_out <= check_in:
             return create_error_response(400, "Bad Request", "Incorrect check-in/check-out dates")
 
-        # get possible rooms for booking
-        rooms = Room.query.filter_by(hotel_id=hotel.id, type=request.json["room_type"]).all()
-        if not rooms:
-            raise HTTPException(
-                response=create_error_response(
-                    404,
-                    "NotFound",
-                    f'Rooms in hotel {hotel.id} of type {request.json["room_type"]} are not currently available!')
-                )
-
-        # find out availability of room
-        for room in rooms:
-
-            # initialize list for booked dates
-            dates_booked = []
-
-            # get booked dates
-            for room_booking in room.bookings:
-
-                # get length of booking
-                duration = room_booking.check_out - room_booking.check_in
-
-                # increment the list of booked dates
-                dates_booked.extend(
-                    [room_booking.check_in + timedelta(days=day) for day in range(duration.days)]
+        # lock allocation, then find a room that is free for the whole stay
+        # (ignoring the booking being moved)
+        lock_allocation([hotel.id], [request.json["room_type"]])
+        try:
+            changed = booking.version != version
+        except ObjectDeletedError:
+            changed = True
+        if changed:
+            # modified or deleted by another request while waiting for the lock
+            return stale_write(booking)
+        room = find_free_room(hotel.id, request.json["room_type"], check_in, check_out, exclude=booking)
+        if room is None:
+
+            # no rooms of the requested type at all
+            if Room.query.filter_by(hotel_id=hotel.id, type=request.json["room_type"]).first() is None:
+                raise HTTPException(
+                    response=create_error_response(
+                        404,
+                        "NotFound",
+                        f'Rooms in hotel {hotel.id} of type {request.json["room_type"]} are not currently available!')
                     )
 
-            # check if the room can be booked
-            if any(day_to_book in dates_booked for day_to_book in days_to_book):
-                continue
-
-            # modify booking entry
-            booking.check_in = check_in
-            booking.check_out = check_out
-            booking.payment = payment
-            booking.room = room
-            booking.customer = customer
+            # return conflict response
+            return create_error_response(
+                409,
+                "Conflict",
+                "No rooms corresponding to the criteria are available")
+
+        # modify booking entry
+        room_ids = (booking.room_id, room.id)
+        changes = (
+            booking_change(booking.room, booking.check_in, booking.check_out),
+            booking_change(room, check_in, check_out)
+            )
+        booking.check_in = check_in
+        booking.check_out = check_out
+        booking.payment = payment
+        booking.room = room
+        booking.customer = customer
+        try:
             db.session.commit()
+        except StaleDataError:
+            # modified or deleted by another request since it was loaded
+            return stale_write(booking)
+        refresh_rooms(*room_ids)
+        invalidate_searches(*changes)
 
-            # return success response
-            return Response(status=204, mimetype=MASON)
-
-        # return conflict response
-        return create_error_response(
-            409,
-            "Conflict",
-            "No rooms corresponding to the criteria are available")
+        # return success response
+        return Response(status=204, mimetype=MASON)
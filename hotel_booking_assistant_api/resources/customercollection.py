@@ -1,19 +1,82 @@
 """
 Resource methods for CustomerCollection
 """
-import json
 from flask_restful import Resource
-from flask import Response, request
+from flask import request, url_for
 from werkzeug.exceptions import HTTPException
-from jsonschema import validate, ValidationError, draft7_format_checker
-from sqlalchemy import exc
+from jsonschema import ValidationError
+from sqlalchemy import exc, func
 from orm import Customer, db, BookingAssistantBuilder, create_error_response
 from keyFunc import any_admin
-from static.constants import MASON, LINK_RELATIONS_URL
+from validation import validate_request
+from pagination import parse_limit, keyset_page
+from render import mason_response
+from static.constants import LINK_RELATIONS_URL
+
+# sorts after every character, ends the range of names with a given prefix
+PREFIX_END = "\U0010ffff"
 
 class CustomerCollection(Resource):
 
-    """ Class with method for adding new entries to Customer table """
+    """ Class with methods for searching and adding entries of Customer table """
+
+    @any_admin
+    def get(self):
+
+        """ Search Customer entries, one page at a time (GET) """
+
+        # get page size (optional)
+        try:
+            limit = parse_limit(request.args.get("limit"))
+        except ValueError:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         "Invalid query parameter value(s)")
+
+        # get filters (optional), mail and phone must match exactly
+        query = Customer.query
+        mail = request.args.get("mail")
+        if mail:
+            query = query.filter(Customer.mail == mail)
+        phone = request.args.get("phone")
+        if phone:
+            query = query.filter(Customer.phone == phone)
+
+        # case-insensitive name prefix as a range on the lower(name) index
+        name = request.args.get("name")
+        if name:
+            prefix = func.lower(name, type_=db.String)
+            query = query.filter(func.lower(Customer.name) >= prefix,
+                                 func.lower(Customer.name) < prefix + PREFIX_END)
+
+        # one page after or before the cursor, by customer id
+        try:
+            customers, next_cursor, prev_cursor = keyset_page(query, Customer.id, limit, request.args.get("cursor"))
+        except ValueError:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         "Invalid query parameter value(s)")
+
+        # generate hypermedia response
+        body = BookingAssistantBuilder()
+        body.add_namespace("bookie", LINK_RELATIONS_URL)
+        body.add_control("self", href=url_for("customercollection", **request.args))
+        body.add_control_add_customer()
+        if next_cursor:
+            body.add_control_next(self._page_href(next_cursor, limit))
+        if prev_cursor:
+            body.add_control_prev(self._page_href(prev_cursor, limit))
+        body["items"] = [customer.serialize(short_form=True) for customer in customers]
+
+        return mason_response(body, 200)
+
+    @staticmethod
+    def _page_href(cursor, limit):
+
+        """ Link to another page with the same filters """
+
+        args = {key: value for key, value in request.args.items() if key not in ("cursor", "limit")}
+        return url_for("customercollection", cursor=cursor, limit=limit, **args)
 
     @any_admin
     def post(self):
@@ -29,7 +92,7 @@ class CustomerCollection(Resource):
 
         # validate request format
         try:
-            validate(request.json, Customer.json_schema(), format_checker=draft7_format_checker)
+            validate_request(Customer, request.json)
         except ValidationError as e:
             raise HTTPException(response=create_error_response(400,
                 "BadRequest", str(e))) from e
@@ -57,4 +120,4 @@ class CustomerCollection(Resource):
         body["item"] = [customer_entry.serialize(short_form=True)]
 
         # return success response
-        return Response(json.dumps(body), status=201, mimetype=MASON)
+        return mason_response(body, 201)
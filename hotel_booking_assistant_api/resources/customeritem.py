@@ -1,14 +1,17 @@
 """
 Resource methods for CustomerItem
 """
-import json
-from jsonschema import validate, ValidationError, draft7_format_checker
+from jsonschema import ValidationError
 from werkzeug.exceptions import HTTPException
 from flask import Response, request, url_for
 from flask_restful import Resource
 from sqlalchemy import exc
+from sqlalchemy.orm.exc import StaleDataError
 from orm import Booking, Customer, db, BookingAssistantBuilder, create_error_response
 from keyFunc import any_admin
+from validation import validate_request
+from conditional import entity_etag, etag_headers, not_modified, stale_write, check_if_match
+from render import mason_response
 from static.constants import MASON, LINK_RELATIONS_URL
 
 class CustomerItem(Resource):
@@ -21,6 +24,12 @@ class CustomerItem(Resource):
 
         """ Get Customer entry (GET) """
 
+        # nothing to send if the client has the current version
+        etag = entity_etag(customer.id, customer.version)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
         body = BookingAssistantBuilder()
         body.add_namespace("bookie", LINK_RELATIONS_URL)
         body.add_control("self", href=url_for("customer", customer=customer))
@@ -31,7 +40,7 @@ class CustomerItem(Resource):
         body.add_control_avl_rooms()
         body["item"] = [customer.serialize(short_form=True)]
 
-        return Response(json.dumps(body), status=200, mimetype = MASON)
+        return mason_response(body, 200, etag_headers(etag))
 
     # delete customer
     @any_admin
@@ -50,7 +59,11 @@ class CustomerItem(Resource):
 
         # delete customer
         db.session.delete(customer)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            # modified or deleted by another request since it was loaded
+            return stale_write(customer)
         return Response(status=204, mimetype = MASON)
 
     # modify customer
@@ -66,9 +79,12 @@ class CustomerItem(Resource):
                 "UnsupportedMediaType",
                 "Request type was not JSON!"))
 
+        # check that the client edits the current version
+        check_if_match(entity_etag(customer.id, customer.version))
+
         # validate request format
         try:
-            validate(request.json, Customer.json_schema(), format_checker=draft7_format_checker)
+            validate_request(Customer, request.json)
         except ValidationError as e:
             raise HTTPException(response=create_error_response(400,
                 "BadRequest", str(e))) from e
@@ -82,6 +98,9 @@ class CustomerItem(Resource):
             db.session.commit()
         except exc.IntegrityError:
             return create_error_response(409, "Conflict", "Failure in PUT: E-mail already in use")
+        except StaleDataError:
+            # modified or deleted by another request since it was loaded
+            return stale_write(customer)
 
         # return success response
         return Response(status=204, mimetype=MASON)
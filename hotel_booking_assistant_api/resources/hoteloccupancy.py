@@ -0,0 +1,69 @@
+"""
+Resource methods for HotelOccupancy
+"""
+from datetime import date, datetime, timedelta
+from flask import request, url_for
+from flask_restful import Resource
+from orm import BookingAssistantBuilder, create_error_response
+from keyFunc import hotel_specific_admin
+from occupancy import hotel_occupancy
+from render import mason_response
+from static.constants import LINK_RELATIONS_URL
+
+# nights returned when no end date is given
+DEFAULT_WINDOW = 30
+# longest window accepted in one request
+MAX_WINDOW = 366
+
+class HotelOccupancy(Resource):
+
+    """ Class with method for getting free and booked room counts of a hotel """
+
+    @hotel_specific_admin
+    def get(self, hotel):
+
+        """ Get free and booked rooms per room type and night (GET) """
+
+        # get window dates (optional), end is the first night not included
+        try:
+            start = request.args.get("start")
+            start = datetime.strptime(start, "%Y-%m-%d").date() if start else date.today()
+            end = request.args.get("end")
+            end = datetime.strptime(end, "%Y-%m-%d").date() if end else start + timedelta(days=DEFAULT_WINDOW)
+        except ValueError:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         "Invalid query parameter value(s)")
+
+        # check length of window
+        if not 0 < (end - start).days <= MAX_WINDOW:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         f"The window must be between 1 and {MAX_WINDOW} nights")
+
+        occupancy = hotel_occupancy(hotel.id, start, end)
+
+        # generate hypermedia response
+        body = BookingAssistantBuilder(hotel=hotel.name, start=start, end=end)
+        body.add_namespace("bookie", LINK_RELATIONS_URL)
+        body.add_control("self", href=url_for("hoteloccupancy", hotel=hotel, start=start, end=end))
+        body.add_control_get(
+            "bookie:rooms",
+            "Get available rooms for the whole window",
+            url_for("roomcollection", country=hotel.country, city=hotel.city,
+                    check_in=start, check_out=end)
+            )
+        body.add_control_avl_rooms()
+        body["rooms"] = {room_type: rooms for room_type, (rooms, _) in occupancy.items()}
+        body["items"] = [
+            {
+                "date": start + timedelta(days=night),
+                "room_types": {
+                    room_type: {"free": rooms - booked[night], "booked": booked[night]}
+                    for room_type, (rooms, booked) in occupancy.items()
+                    }
+            }
+            for night in range((end - start).days)
+            ]
+
+        return mason_response(body, 200)
@@ -1,13 +1,20 @@
 """
 Resource methods for RoomCollection
 """
-import json
-from datetime import datetime, timedelta
-from flask import Response, request
+from datetime import datetime
+from flask import Response, request, stream_with_context, url_for
 from flask_restful import Resource
 from static.constants import MASON, LINK_RELATIONS_URL
-from orm import Hotel, Room, BookingAssistantBuilder, create_error_response
+from orm import Room, BookingAssistantBuilder, create_error_response
 from keyFunc import any_admin
+from availability import available_rooms_query
+from occupancy import occupancy_index
+from searchcache import search_cache, search_scope, search_key
+from pagination import NEXT, parse_limit, decode_cursor, keyset_page
+from render import dumps, mason_response
+
+# rooms fetched from the database cursor at a time when streaming
+STREAM_BATCH_SIZE = 100
 
 class RoomCollection(Resource):
 
@@ -24,19 +31,6 @@ class RoomCollection(Resource):
         # get city (optional)
         city = request.args.get("city")
 
-        # filter by country and city if given
-        if country and city:
-            hotels = Hotel.query.filter_by(country=country, city=city).all()
-        # filter by country if given
-        elif country:
-            hotels = Hotel.query.filter_by(country=country).all()
-        # filter by city if given
-        elif city:
-            hotels = Hotel.query.filter_by(city=city).all()
-        # if not given, get all hotels
-        else:
-            hotels = Hotel.query.all()
-
         # get room type (optional)
         room_type = request.args.get("room_type")
 
@@ -56,63 +50,132 @@ class RoomCollection(Resource):
                                              "BadRequest",
                                              "Invalid query parameter value(s)")
 
-            # compute and check length of stay
-            duration = check_out - check_in
-            days_to_book = [check_in + timedelta(days=day) for day in range(duration.days)]
-            if duration.days <= 0:
+            # check length of stay
+            if check_out <= check_in:
                 return create_error_response(400,
                                              "BadRequest",
                                              "Incorrect check-in/check-out dates")
 
-        # get rooms
-        rooms_available = []
-        for hotel in hotels:
+        # get page size (optional)
+        try:
+            limit = parse_limit(request.args.get("limit"))
+        except ValueError:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         "Invalid query parameter value(s)")
+
+        # repeated searches are answered from the result cache
+        stream = request.args.get("stream") in ("1", "true")
+        cursor = request.args.get("cursor")
+        cache = None if stream else search_cache()
+        if cache is not None:
+            scope = search_scope(country, city, room_type, check_in, check_out)
+            key = search_key(scope, limit, cursor)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            generation = cache.generation()
+
+        # free rooms of the requested page come from the occupancy index when
+        # it covers the stay (streams check every room with SQL instead, their
+        # ids could exceed the bound parameter limit of the database)
+        free_room_ids = None
+        if check_in and check_out and not stream:
+            index = occupancy_index()
+            if index is not None and index.covers(check_in, check_out):
+                try:
+                    direction, value = decode_cursor(cursor) if cursor else (NEXT, None)
+                except ValueError:
+                    return create_error_response(400,
+                                                 "BadRequest",
+                                                 "Invalid query parameter value(s)")
+                # one id more than the page size tells whether a next page exists
+                bounds = {"after": value} if direction == NEXT else {"before": value}
+                free_room_ids = index.free_rooms(check_in, check_out, country, city, room_type,
+                                                 limit=limit + 1, **bounds)
+
+        # query for available rooms
+        query = available_rooms_query(country, city, room_type, check_in, check_out, free_room_ids)
+
+        # stream every matching room if requested
+        if stream:
+            return self._stream(query)
+
+        response = self._page(query, limit, cursor)
+        if cache is not None and response.status_code in (200, 409):
+            cache.put(key, response, scope, generation)
+        return response
+
+    def _page(self, query, limit, cursor):
+
+        """ One page of available rooms """
+
+        try:
+            rooms, next_cursor, prev_cursor = keyset_page(query, Room.id, limit, cursor)
+        except ValueError:
+            return create_error_response(400,
+                                         "BadRequest",
+                                         "Invalid query parameter value(s)")
 
-            # add to list of rooms
-            if room_type:
-                rooms = Room.query.filter_by(hotel_id=hotel.id, type=room_type).all()
-            else:
-                rooms = Room.query.filter_by(hotel_id=hotel.id).all()
+        # return conflict response
+        if not rooms and cursor is None:
+            return create_error_response(409,
+                "Conflict",
+                "Failure in GET: No rooms fulfilling the criteria are available"
+                )
 
-            # check each room for bookings
-            for room in rooms:
+        # return hypermedia response
+        body = self._collection_body()
+        if next_cursor:
+            body.add_control_next(self._page_href(next_cursor, limit))
+        if prev_cursor:
+            body.add_control_prev(self._page_href(prev_cursor, limit))
+        body["items"] = [room.serialize() for room in rooms]
+
+        # return available rooms
+        return mason_response(body, 200)
+
+    @staticmethod
+    def _collection_body():
+
+        """ Hypermedia shared by paged and streamed responses """
 
-                # filter available rooms if check_in and check_out are given
-                if check_in and check_out:
+        body = BookingAssistantBuilder()
+        body.add_namespace("bookie", LINK_RELATIONS_URL)
+        body.add_control_add_customer()
+        body.add_control_add_bookings()
+        return body
 
-                    # list for booked dates
-                    dates_booked = []
+    @staticmethod
+    def _page_href(cursor, limit):
 
-                    # check the dates of each booking
-                    for booking in room.bookings:
+        """ Link to another page with the same search parameters """
 
-                        # get length of booking
-                        duration = booking.check_out - booking.check_in
+        args = {key: value for key, value in request.args.items() if key not in ("cursor", "limit")}
+        return url_for("roomcollection", cursor=cursor, limit=limit, **args)
 
-                        # increment the list of booked dates
-                        dates_booked.extend(
-                        [booking.check_in + timedelta(days=day) for day in range(duration.days)])
+    def _stream(self, query):
 
-                    # check if the room can be booked
-                    if any(day_to_book in dates_booked for day_to_book in days_to_book):
-                        continue
+        """ Stream rooms as they are read from the database cursor """
 
-                # add room information to array of available rooms
-                rooms_available.append(room.serialize())
+        rooms = iter(query.yield_per(STREAM_BATCH_SIZE))
 
-        # return conflict response
-        if not rooms_available:
+        # peek the first room so that an empty result is still a conflict
+        first = next(rooms, None)
+        if first is None:
             return create_error_response(409,
                 "Conflict",
                 "Failure in GET: No rooms fulfilling the criteria are available"
                 )
 
-        # return hypermedia response
-        body = BookingAssistantBuilder()
-        body.add_namespace("bookie", LINK_RELATIONS_URL)
-        body.add_control_add_customer()
-        body.add_control_add_bookings()
-        body["items"] = rooms_available
+        # body without the closing brace, items are appended as they arrive
+        head = dumps(self._collection_body())[:-1] + b', "items": ['
 
-        # return available rooms
-        return Response(json.dumps(body), status=200, mimetype=MASON)
+        def generate():
+            yield head
+            yield dumps(first.serialize())
+            for room in rooms:
+                yield b", " + dumps(room.serialize())
+            yield b"]}"
+
+        return Response(stream_with_context(generate()), status=200, mimetype=MASON)
@@ -0,0 +1,290 @@
+""" Result cache for room searches of Hotel-Booking-Assistant API """
+
+# IMPORTS
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, current_app
+from availability import overlaps
+from static.constants import MASON
+
+# Redis is only needed for the shared backend
+try:
+    import redis
+except ImportError:
+    redis = None
+
+class MemoryBackend:
+
+    """
+    In-process TTL/LRU store. Entries are private to the worker process,
+    bookings made through other processes only show up after the TTL.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Stored value or None if missing or expired """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def generation(self):
+        """ Counter incremented by every invalidation """
+        return self._generation
+
+    def set(self, key, value, scope, ttl, generation):
+        """
+        Store a value unless an invalidation happened since generation was
+        read, evicting the least recently used entry
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, scope, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, match):
+        """ Drop entries whose scope matches, return how many were dropped """
+        with self._lock:
+            self._generation += 1
+            keys = [key for key, (_, scope, _) in self._entries.items() if match(scope)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        """ Drop every entry """
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+class RedisBackend:
+
+    """
+    Store shared by every worker in a Redis server or any client with the
+    redis-py interface (e.g. fakeredis). Entries expire by TTL, eviction
+    beyond that is left to the server's maxmemory-policy. Scopes of all
+    entries are kept in one hash for invalidation.
+    """
+
+    def __init__(self, client, prefix="bookie:rooms:"):
+        self.client = client
+        self.prefix = prefix
+        self.scopes_key = prefix + "scopes"
+        self.generation_key = prefix + "generation"
+
+    def __len__(self):
+        return self.client.hlen(self.scopes_key)
+
+    def get(self, key):
+        """ Stored value or None if missing or expired """
+        return self.client.get(self.prefix + key)
+
+    def generation(self):
+        """ Counter incremented by every invalidation """
+        return int(self.client.get(self.generation_key) or 0)
+
+    def set(self, key, value, scope, ttl, generation):
+        """
+        Store a value unless an invalidation happened since generation was
+        read (checked atomically with WATCH)
+        """
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.generation_key)
+                if int(pipe.get(self.generation_key) or 0) != generation:
+                    return
+                pipe.multi()
+                pipe.set(self.prefix + key, value, ex=ttl)
+                pipe.hset(self.scopes_key, key, json.dumps(scope))
+                pipe.execute()
+            except redis.WatchError:
+                return
+
+    def invalidate(self, match):
+        """
+        Drop entries whose scope matches, return how many were dropped.
+        Scopes of expired entries are pruned on the way.
+        """
+        self.client.incr(self.generation_key)
+        scopes = self.client.hgetall(self.scopes_key)
+        keys = [key.decode() for key in scopes]
+        with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.exists(self.prefix + key)
+            alive = pipe.execute()
+        matched = [key for key, exists in zip(keys, alive) if exists and match(json.loads(scopes[key.encode()]))]
+        stale = [key for key, exists in zip(keys, alive) if not exists]
+        if matched:
+            self.client.delete(*[self.prefix + key for key in matched])
+        if matched or stale:
+            self.client.hdel(self.scopes_key, *(matched + stale))
+        return len(matched)
+
+    def clear(self):
+        """ Drop every entry """
+        self.client.incr(self.generation_key)
+        keys = [key.decode() for key in self.client.hkeys(self.scopes_key)]
+        self.client.delete(self.scopes_key, *[self.prefix + key for key in keys])
+
+class SearchCache:
+
+    """
+    Room search responses keyed by the normalised search parameters. Every
+    entry remembers its search scope (location, room type and stay) so
+    that a booking change only drops the searches it can affect.
+    """
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Cached response for the search or None
+        """
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return Response(value[3:], status=int(value[:3]), mimetype=MASON, headers={"X-Cache": "HIT"})
+
+    def generation(self):
+        """
+        Token to read before running a search and pass to put()
+        """
+        return self.backend.generation()
+
+    def put(self, key, response, scope, generation):
+        """
+        Store the response of a search run after generation was read
+        """
+        value = str(response.status_code).encode() + response.get_data()
+        self.backend.set(key, value, scope, self.ttl, generation)
+        response.headers["X-Cache"] = "MISS"
+
+    def invalidate(self, changes):
+        """
+        Drop searches affected by the given booking changes, each a scope of
+        (country, city, room_type, check_in, check_out) of the hotel, room
+        and nights added or freed, None fields of a change match any search
+        """
+        def match(scope):
+            country, city, room_type, check_in, check_out = scope
+            if check_in is None:
+                # searches without dates do not depend on bookings
+                return False
+            return any(
+                (country is None or change[0] is None or country == change[0])
+                and (city is None or change[1] is None or city == change[1])
+                and (room_type is None or change[2] is None or room_type == change[2])
+                and (change[3] is None or overlaps(check_in, check_out, change[3], change[4]))
+                for change in changes
+                )
+
+        removed = self.backend.invalidate(match)
+        with self._lock:
+            self.invalidated += removed
+
+    def clear(self):
+        """
+        Drop every cached search
+        """
+        self.backend.clear()
+
+    def stats(self):
+        """
+        Hit/miss counters, hit rate, invalidated entries and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidated": self.invalidated,
+                "size": len(self.backend),
+            }
+
+def search_scope(country, city, room_type, check_in, check_out):
+    """
+    Scope of a search or of a booking change, dates as ISO strings so that
+    scopes can be stored as JSON (searches only filter by a complete stay)
+    """
+    stay = check_in and check_out
+    return [
+        country or None,
+        city or None,
+        room_type or None,
+        check_in.isoformat() if stay else None,
+        check_out.isoformat() if stay else None,
+        ]
+
+def search_key(scope, limit, cursor):
+    """
+    Cache key of one page of a search
+    """
+    return json.dumps(scope + [limit, cursor or None], separators=(",", ":"))
+
+def booking_change(room, check_in, check_out):
+    """
+    Scope of the nights of a room that were booked or freed, to be read
+    before the change is committed (committing expires the room). A booking
+    whose room or hotel was deleted matches every search.
+    """
+    if room is None or room.hotel is None:
+        return search_scope(None, None, None, None, None)
+    return search_scope(room.hotel.country, room.hotel.city, room.type, check_in, check_out)
+
+def init_search_cache(app):
+    """
+    Create the room search cache of an application with the configured
+    backend
+    """
+    if not app.config["SEARCH_CACHE_ENABLED"]:
+        return
+    if app.config["SEARCH_CACHE_BACKEND"] == "redis":
+        if redis is None:
+            raise RuntimeError("SEARCH_CACHE_BACKEND redis requires the redis package")
+        backend = RedisBackend(redis.Redis.from_url(app.config["SEARCH_CACHE_REDIS_URL"]))
+    else:
+        backend = MemoryBackend(app.config["SEARCH_CACHE_SIZE"])
+    app.extensions["search_cache"] = SearchCache(backend, app.config["SEARCH_CACHE_TTL"])
+
+def search_cache():
+    """
+    Room search cache of the current application, or None if disabled
+    """
+    return current_app.extensions.get("search_cache")
+
+def invalidate_searches(*changes):
+    """
+    Drop cached searches affected by committed booking changes (see
+    booking_change) in the current application
+    """
+    cache = search_cache()
+    if cache is not None and changes:
+        cache.invalidate(changes)
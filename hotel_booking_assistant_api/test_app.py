@@ -1,18 +1,44 @@
 import pytest
+import asyncio
 import json
 import tempfile
 import os
 from flask import Flask, url_for
 from flask import json
-from sqlalchemy import event
+from sqlalchemy import event, create_engine
 from sqlalchemy.orm import close_all_sessions
-from orm import db, app, Hotel, Room, Booking, Customer, Admin, ApiKey
-from populate import populate_db, print_db
+from orm import db, Hotel, Room, Booking, Customer, Admin, ApiKey
+import populate
+from populate import populate_db, print_db, populate_synthetic, SYNTHETIC_PASSWORD
+from migrate import migrate_db
+from config import DefaultConfig, engine_options, apply_sqlite_pragmas
 from werkzeug.exceptions import NotFound
-from app import app as flask_app, db
+from app import create_app
+from availability import overlaps, RoomIntervals, available_rooms_query
+from occupancy import OccupancyIndex
+from keyFunc import api_key_cache
+from searchcache import SearchCache, MemoryBackend, RedisBackend
+from instrumentation import SlowestProfiles, Profiler
+from metrics import MetricsRegistry
+from asgi import PooledWsgiToAsgi
+from export import export_rows, export_chunks
+from datetime import date
+from http import HTTPStatus
+from werkzeug.test import Client
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import requests
 BASE_URL = "http://127.0.0.1:5000/"
 
+# the application is bound to its database when created, every test
+# creates and drops the tables of this temporary one
+test_db_dir = tempfile.TemporaryDirectory()
+app = create_app({
+    "TESTING": True,
+    "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(test_db_dir.name, "test.db"),
+})
+asgi_app = PooledWsgiToAsgi(app, threads=4)
+
 
 
 def apply_sqlite_foreign_keys(dbapi_connection, connection_record):
@@ -35,26 +61,94 @@ def add_admin_and_api_key(): #creating test_apikey before hand to test apikey ad
 
 
 
-@pytest.fixture #fixer sets up a temporary test environment and database
-def test_client():
-    db_fd, db_fname = tempfile.mkstemp() # creats temporary database file
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_fname 
-    app.config["TESTING"] = True # sets Flask app to run in testing mode
-
+class AsgiTestBridge:
+    """WSGI callable sending every request of the test client through an ASGI application."""
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+
+    def __call__(self, environ, start_response):
+        headers = [(key[5:].replace("_", "-").lower().encode("latin1"), value.encode("latin1"))
+                   for key, value in environ.items() if key.startswith("HTTP_")]
+        headers += [(key.replace("_", "-").lower().encode("latin1"), environ[key].encode("latin1"))
+                    for key in ("CONTENT_TYPE", "CONTENT_LENGTH") if environ.get(key)]
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+        scope = {
+            "type": "http", "http_version": "1.1", "method": environ["REQUEST_METHOD"],
+            "scheme": environ["wsgi.url_scheme"], "path": environ["PATH_INFO"].encode("latin1").decode("utf8"),
+            "raw_path": environ["PATH_INFO"].encode("latin1"), "query_string": environ["QUERY_STRING"].encode("latin1"),
+            "root_path": environ.get("SCRIPT_NAME", ""), "headers": headers,
+            "client": ("127.0.0.1", 1234), "server": (environ["SERVER_NAME"], int(environ["SERVER_PORT"])),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.asgi_app(scope, receive, send))
+        start = messages[0]
+        start_response(f"{start['status']} {HTTPStatus(start['status']).phrase}",
+                       [(name.decode("latin1"), value.decode("latin1")) for name, value in start["headers"]])
+        return [message.get("body", b"") for message in messages[1:]]
+
+class QueryCounter:
+    """Counts SQL statements sent to the database inside a with block."""
+    def __init__(self):
+        self.count = 0
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        with app.app_context():
+            self.engine = db.engine
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+def count_queries(test_client, method, url, **kwargs):
+    """Sends one request through the test client, returns the response and the number of SQL statements it ran."""
+    with QueryCounter() as counter:
+        response = getattr(test_client, method)(url, **kwargs)
+        response.get_data() # streamed bodies query while they are read
+    return response, counter.count
+
+def get_local_api_key(test_client, username="aino", password="root"):
+    """Generates an API key through the test client (no live server needed)."""
+    response = test_client.post('/api/keys/', json={"username": username, "password": password})
+    assert response.status_code == 201
+    return {"Hotels-Api-Key": response.headers["Hotels-Api-Key"], "Admin-User-Name": username}
+
+
+@pytest.fixture(params=["wsgi", "asgi"]) #fixer sets up a temporary test environment and database, served through WSGI and ASGI
+def test_client(request):
     with app.app_context(): 
         event.listen(db.engine, "connect", apply_sqlite_foreign_keys) # this function enables foreign key support on database connection
         db.create_all() #creats database table
         populate_db() # populate the database with the initial data
         add_admin_and_api_key()  #ensure an Admin and Apikey is present
+        app.extensions["occupancy"].rebuild() # index the bookings of the new database
+        app.extensions["search_cache"].clear() # forget searches of the previous database
 
-    yield app.test_client() #create test client for making requests to the Flask application
+    #create test client for making requests to the Flask application, directly or through asgi.py
+    if request.param == "asgi":
+        yield Client(AsgiTestBridge(asgi_app), app.response_class)
+    else:
+        yield app.test_client()
 
     with app.app_context():
         close_all_sessions()
-        db.drop_all()
+        db.drop_all() #cleans the temporary database
 
-    os.close(db_fd) #cleans filesystem
-    os.unlink(db_fname) #and delete the temporary file
+# Test that the suite runs on the temporary database, not the instance one
+def test_temporary_database(test_client):
+    with app.app_context():
+        assert db.engine.url.database == os.path.join(test_db_dir.name, "test.db")
 
 def test_populate_db(test_client): #fixer generated test client
     with app.app_context(): 
@@ -688,3 +782,840 @@ def test_booking_hypermedia(test_client, api_credentials):
     assert "self" in booking["@controls"]
     assert "href" in booking["@controls"]["self"]
     assert booking["@controls"]["self"]["href"] == "/api/bookings/1003/"
+
+
+#### AVAILABILITY TEST ####
+
+# Test half-open interval checks used for room availability
+def test_availability_half_open_intervals():
+    # back-to-back stays do not overlap
+    assert not overlaps(date(2024, 3, 1), date(2024, 3, 5), date(2024, 3, 5), date(2024, 3, 9))
+    assert overlaps(date(2024, 3, 1), date(2024, 3, 6), date(2024, 3, 5), date(2024, 3, 9))
+
+    intervals = RoomIntervals([(date(2024, 3, 5), date(2024, 3, 9)), (date(2024, 3, 1), date(2024, 3, 3))])
+    assert intervals.is_free(date(2024, 3, 3), date(2024, 3, 5))
+    assert not intervals.is_free(date(2024, 3, 2), date(2024, 3, 4))
+    assert not intervals.is_free(date(2024, 2, 1), date(2024, 4, 1))
+
+    intervals.remove(date(2024, 3, 5), date(2024, 3, 9))
+    assert intervals.is_free(date(2024, 3, 3), date(2024, 4, 1))
+
+
+# Test that room search runs a bounded number of SQL statements
+def test_room_collection_get_query_count(test_client):
+    headers = get_local_api_key(test_client)
+
+    with QueryCounter() as counter:
+        response = test_client.get(
+            '/api/rooms/?country=Finland&city=Oulu&check_in=2024-03-05&check_out=2024-03-07',
+            headers=headers)
+
+    assert response.status_code == 200
+    # one statement for authentication, one for the search itself
+    assert counter.count <= 2, f"Room search used {counter.count} SQL statements"
+
+    # rooms with overlapping bookings are not listed
+    data = json.loads(response.data)
+    assert len(data["items"]) == 8
+    assert {"hotel_name": "Hotel2", "room_type": "single"} not in [
+        {"hotel_name": room["hotel_name"], "room_type": room["room_type"]} for room in data["items"]]
+
+
+# Test cursor pagination and streaming of room search
+def test_room_collection_get_pages_and_stream(test_client):
+    headers = get_local_api_key(test_client)
+
+    # walk all pages forward through the "next" controls
+    seen = []
+    url = '/api/rooms/?city=Oulu&limit=4'
+    while url:
+        response = test_client.get(url, headers=headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data["items"]) <= 4
+        seen.extend(data["items"])
+        url = data["@controls"].get("next", {}).get("href")
+    assert len(seen) == 9
+
+    # the last page links back to the previous one
+    response = test_client.get(data["@controls"]["prev"]["href"], headers=headers)
+    assert json.loads(response.data)["items"] == seen[4:8]
+
+    # streamed response has the same items in one body
+    response = test_client.get('/api/rooms/?city=Oulu&stream=true', headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.data)["items"] == seen
+
+    # invalid cursor or limit
+    assert test_client.get('/api/rooms/?cursor=notacursor', headers=headers).status_code == 400
+    assert test_client.get('/api/rooms/?limit=-1', headers=headers).status_code == 400
+
+
+# Test that verified API keys are cached and invalidated on deletion
+def test_api_key_cache(test_client):
+    headers = get_local_api_key(test_client)
+    url = '/api/rooms/?country=Finland&city=Oulu'
+
+    # first request verifies the key against the database
+    assert test_client.get(url, headers=headers).status_code == 200
+    before = api_key_cache.stats()
+
+    # second request (a search not cached yet) authenticates without touching the database
+    with QueryCounter() as counter:
+        assert test_client.get(url + '&room_type=double', headers=headers).status_code == 200
+    assert api_key_cache.stats()["hits"] == before["hits"] + 1
+    assert counter.count == 1, f"Cached authentication used {counter.count - 1} SQL statements"
+
+    # deleting the key invalidates the cache
+    assert test_client.delete('/api/keys/', headers=headers).status_code == 204
+    assert test_client.get(url, headers=headers).status_code == 403
+
+    # a key deleted by another worker is still cached here: deleting it again is refused
+    headers = get_local_api_key(test_client)
+    assert test_client.get(url, headers=headers).status_code == 200
+    with app.app_context():
+        ApiKey.query.filter_by(admin_username=headers["Admin-User-Name"]).delete()
+        db.session.commit()
+    assert test_client.delete('/api/keys/', headers=headers).status_code == 403
+    assert test_client.get(url, headers=headers).status_code == 403
+
+
+# Test batch booking creation with per-item results
+def test_booking_batch_post(test_client):
+    headers = get_local_api_key(test_client)
+    booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+               "check_in": "2024-06-01", "check_out": "2024-06-05"}
+    batch = [
+        booking,
+        booking,
+        dict(booking, check_in="2024-06-05", check_out="2024-06-07"),
+        dict(booking, customer_id=1000),
+        dict(booking, payment="bitcoin"),
+    ]
+
+    response = test_client.post('/api/bookings/batch/', headers=headers, json=batch)
+    assert response.status_code == 200
+    items = json.loads(response.data)["items"]
+    assert [item["status"] for item in items] == ["created", "conflict", "created", "not_found", "invalid"]
+    assert items[0]["@controls"]["self"]["href"] == f'/api/bookings/{items[0]["booking_ref"]}/'
+
+    # the admin of Hotel3 cannot book rooms in other hotels
+    response = test_client.post('/api/bookings/batch/', headers=headers, json=[dict(booking, hotel="Hotel1")])
+    assert response.status_code == 403
+    response = test_client.post('/api/bookings/batch/', headers=headers, json=booking)
+    assert response.status_code == 400
+
+
+# Test that parallel bookings of the last free room never double-book it
+def test_booking_collection_post_concurrent(test_client):
+    headers = get_local_api_key(test_client)
+    booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+               "check_in": "2024-07-01", "check_out": "2024-07-05"}
+    threads = 8
+    barrier = threading.Barrier(threads)
+
+    def post_booking():
+        client = app.test_client()
+        barrier.wait()
+        return client.post('/api/bookings/', headers=headers, json=booking).status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        statuses = sorted(executor.map(lambda _: post_booking(), range(threads)))
+    assert statuses == [201] + [409] * (threads - 1)
+
+    with app.app_context():
+        room_ids = [room.id for room in Room.query.join(Room.hotel).filter(Hotel.name == "Hotel3", Room.type == "double")]
+        booked = Booking.query.filter(Booking.room_id.in_(room_ids), Booking.check_in == date(2024, 7, 1)).count()
+    assert booked == 1
+
+
+# Test that the hot lookup paths are served by indexes instead of table scans
+def test_hot_queries_use_indexes(test_client):
+    headers = get_local_api_key(test_client)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+                   "check_in": "2024-08-01", "check_out": "2024-08-05"}
+        assert test_client.get('/api/rooms/?country=Finland&city=Oulu&room_type=double'
+                               '&check_in=2024-08-01&check_out=2024-08-05', headers=headers).status_code == 200
+        assert test_client.post('/api/bookings/', headers=headers, json=booking).status_code == 201
+        assert test_client.post('/api/bookings/batch/', headers=headers, json=[booking]).status_code == 200
+        assert test_client.delete('/api/customers/1/', headers=headers).status_code == 405
+        for search in ("name=mai", "mail=maija.meikalainen@gmail.com", "phone=NaN"):
+            assert test_client.get(f'/api/customers/?{search}', headers=headers).status_code == 200
+        api_key_cache.invalidate()
+        assert test_client.delete('/api/keys/', headers=headers).status_code == 204
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            scans = [row[3] for row in plan if row[3].startswith("SCAN")]
+            assert not scans, f"{scans} in plan of {statement}"
+
+
+# Test that migrate_db adds indexes missing from an older database
+def test_migrate_db_creates_indexes(test_client):
+    with app.app_context():
+        db.session.execute(db.text("DROP INDEX ix_booking_customer_id"))
+        db.session.execute(db.text("DROP INDEX ix_customer_name_lower"))
+        db.session.commit()
+    assert sorted(migrate_db(app)) == ["ix_booking_customer_id", "ix_customer_name_lower"]
+    assert migrate_db(app) == []
+
+
+# Test engine options for server databases and SQLite connection pragmas
+def test_config_engine_options_and_pragmas(tmp_path):
+    config = {key: getattr(DefaultConfig, key) for key in dir(DefaultConfig) if key.isupper()}
+    assert engine_options(config) == {}
+    config["SQLALCHEMY_DATABASE_URI"] = "postgresql://booking@localhost/booking"
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": 4}
+    assert engine_options(config) == {"pool_size": 4, "max_overflow": 20, "pool_recycle": 1800, "pool_pre_ping": True}
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    apply_sqlite_pragmas(engine, DefaultConfig.SQLITE_PRAGMAS)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    engine.dispose()
+
+
+# Test that applications built by the factory are independent of each other
+def test_create_app_isolated(tmp_path):
+    other = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'other.db'}", "SWAGGER_ENABLED": False})
+    assert "flasgger" not in other.blueprints
+    assert "flasgger" in app.blueprints
+
+    with other.app_context():
+        db.create_all()
+        assert Hotel.query.count() == 0
+        other_url = db.engine.url
+    with app.app_context():
+        assert db.engine.url != other_url
+    response = other.test_client().get('/api/')
+    assert response.status_code == 200
+    assert "bookie:add-booking" in json.loads(response.data)["@controls"]
+
+
+# Test that shared hypermedia controls follow the application root of each request
+def test_controls_application_root(test_client):
+    response = test_client.get('/api/', environ_overrides={"SCRIPT_NAME": "/hotels"})
+    assert response.status_code == 200
+    controls = json.loads(response.data)["@controls"]
+    assert controls["bookie:add-booking"]["href"] == "/hotels/api/bookings/"
+    assert controls["bookie:add-apikey"]["href"] == "/hotels/api/keys/"
+    assert controls["bookie:add-booking"]["schema"] == Booking.json_schema()
+
+    # the next request without a root gets plain hrefs
+    controls = json.loads(test_client.get('/api/').data)["@controls"]
+    assert controls["bookie:add-booking"]["href"] == "/api/bookings/"
+
+
+# Test that the ASGI mode serves the same Mason payloads as WSGI
+def test_asgi_mode_same_payloads(test_client):
+    wsgi_client = app.test_client()
+    asgi_client = Client(AsgiTestBridge(asgi_app), app.response_class)
+    headers = get_local_api_key(wsgi_client)
+
+    for path in ['/api/', '/api/customers/1/', '/api/bookings/1001/',
+                 '/api/rooms/?country=Finland&city=Oulu&check_in=2024-03-05&check_out=2024-03-07']:
+        expected = wsgi_client.get(path, headers=headers)
+        response = asgi_client.get(path, headers=headers)
+        assert (response.status_code, response.data) == (expected.status_code, expected.data)
+
+    booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+               "check_in": "2024-09-01", "check_out": "2024-09-05"}
+    response = asgi_client.post('/api/bookings/', headers=headers, json=booking)
+    assert response.status_code == 201
+    assert response.get_json()["item"][0]["check_in"] == "2024-09-01"
+
+
+# Test that an ASGI worker thread is released when the client goes away
+def test_asgi_client_disconnect(test_client):
+    headers = get_local_api_key(app.test_client())
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/api/rooms/", "raw_path": b"/api/rooms/", "root_path": "", "client": ("127.0.0.1", 1234),
+        "query_string": b"country=Finland&city=Oulu&check_in=2024-03-05&check_out=2024-03-07&stream=true",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body":
+            raise ConnectionResetError()
+
+    async def request():
+        with pytest.raises(ConnectionResetError):
+            await asgi_app(scope, receive, send)
+        # every thread of the pool is free again
+        barrier = threading.Barrier(4, timeout=5)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(asgi_app.executor, barrier.wait) for _ in range(4)))
+
+    asyncio.run(request())
+    assert sent[0]["status"] == 200
+
+
+# Test the occupancy index against SQL and its incremental updates
+def test_occupancy_index(test_client):
+    headers = get_local_api_key(test_client)
+    with app.app_context():
+        index = OccupancyIndex(date(2024, 1, 1), 730)
+        index.rebuild()
+        for check_in, check_out in [(date(2024, 3, 1), date(2024, 3, 10)), (date(2024, 3, 5), date(2024, 3, 7))]:
+            expected = [room.id for room in available_rooms_query(check_in=check_in, check_out=check_out)]
+            assert index.free_rooms(check_in, check_out) == expected
+            expected = [room.id for room in available_rooms_query("Finland", "Oulu", "double", check_in, check_out)]
+            assert index.free_rooms(check_in, check_out, "Finland", "Oulu", "double") == expected
+        free = index.free_rooms(date(2024, 3, 1), date(2024, 3, 10))
+        assert index.free_rooms(date(2024, 3, 1), date(2024, 3, 10), after=free[1], limit=2) == free[2:4]
+        assert index.free_rooms(date(2024, 3, 1), date(2024, 3, 10), before=free[4], limit=2) == free[2:4]
+
+    previous = app.extensions["occupancy"]
+    app.extensions["occupancy"] = index
+    try:
+        search = '/api/rooms/?country=Finland&city=Oulu&room_type=double&check_in=2024-10-01&check_out=2024-10-03'
+        free = len(json.loads(test_client.get(search, headers=headers).data)["items"])
+        booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+                   "check_in": "2024-10-01", "check_out": "2024-10-03"}
+        response = test_client.post('/api/bookings/', headers=headers, json=booking)
+        assert response.status_code == 201
+        location = json.loads(response.data)["item"][0]["@controls"]["self"]["href"]
+        assert len(json.loads(test_client.get(search, headers=headers).data)["items"]) == free - 1
+
+        # moving the booking frees the searched nights, deleting it frees the new ones
+        moved = dict(booking, check_in="2024-11-01", check_out="2024-11-03")
+        assert test_client.put(location, headers=headers, json=moved).status_code == 204
+        assert len(json.loads(test_client.get(search, headers=headers).data)["items"]) == free
+        moved_search = search.replace("2024-10-01", "2024-11-01").replace("2024-10-03", "2024-11-03")
+        moved_free = len(json.loads(test_client.get(moved_search, headers=headers).data)["items"])
+        assert test_client.delete(location, headers=headers).status_code == 204
+        assert len(json.loads(test_client.get(moved_search, headers=headers).data)["items"]) == moved_free + 1
+
+        # pages only send the ids of their own rooms to the database
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        record = lambda conn, cursor, statement, parameters, *args: statements.append(parameters)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            seen = []
+            url = '/api/rooms/?check_in=2024-03-01&check_out=2024-03-10&limit=2'
+            while url:
+                data = json.loads(test_client.get(url, headers=headers).data)
+                seen.extend(data["items"])
+                url = data["@controls"].get("next", {}).get("href")
+            back = json.loads(test_client.get(data["@controls"]["prev"]["href"], headers=headers).data)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        everything = json.loads(test_client.get('/api/rooms/?check_in=2024-03-01&check_out=2024-03-10',
+                                                headers=headers).data)["items"]
+        assert seen == everything
+        assert len(seen) > 4 and max(len(parameters) for parameters in statements) <= 6
+        assert len(back["items"]) == 2
+    finally:
+        app.extensions["occupancy"] = previous
+
+
+# Test free and booked counts per room type from the database and from the occupancy index
+def test_hotel_occupancy_get(test_client):
+    headers = get_local_api_key(test_client)
+    url = '/api/hotels/Hotel3/occupancy/?start=2024-02-28&end=2024-03-05'
+    suite_booked = [0, 0, 1, 1, 1, 0]
+
+    response = test_client.get(url, headers=headers)
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["rooms"] == {"double": 1, "single": 1, "suite": 1}
+    assert [item["date"] for item in data["items"]] == [
+        "2024-02-28", "2024-02-29", "2024-03-01", "2024-03-02", "2024-03-03", "2024-03-04"]
+    assert [item["room_types"]["suite"]["booked"] for item in data["items"]] == suite_booked
+    assert [item["room_types"]["suite"]["free"] for item in data["items"]] == [1 - booked for booked in suite_booked]
+    assert data["@controls"]["bookie:rooms"]["href"] == \
+        "/api/rooms/?country=Finland&city=Oulu&check_in=2024-02-28&check_out=2024-03-05"
+
+    # same answer when the occupancy index covers the window
+    previous = app.extensions["occupancy"]
+    with app.app_context():
+        app.extensions["occupancy"] = OccupancyIndex(date(2024, 1, 1), 730)
+        app.extensions["occupancy"].rebuild()
+    try:
+        assert json.loads(test_client.get(url, headers=headers).data)["items"] == data["items"]
+    finally:
+        app.extensions["occupancy"] = previous
+
+    # other hotels, unknown hotels and invalid windows
+    assert test_client.get('/api/hotels/Hotel1/occupancy/', headers=headers).status_code == 403
+    assert test_client.get('/api/hotels/Hotel9/occupancy/', headers=headers).status_code == 404
+    assert test_client.get('/api/hotels/Hotel3/occupancy/?start=2024-03-05&end=2024-03-05', headers=headers).status_code == 400
+    assert test_client.get('/api/hotels/Hotel3/occupancy/?start=2024-13-01', headers=headers).status_code == 400
+
+
+# Test ETags, If-None-Match and If-Match for bookings and customers
+def test_item_conditional_requests(test_client):
+    headers = get_local_api_key(test_client)
+    booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "suite", "payment": "cash",
+               "check_in": "2024-03-01", "check_out": "2024-03-04"}
+    customer = {"name": "Etag Customer", "phone": "123", "mail": "etag@example.com", "address": "Street 1"}
+
+    for url, body in [('/api/bookings/1004/', booking), ('/api/customers/1/', customer)]:
+        response = test_client.get(url, headers=headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        # unchanged entity is not sent again
+        response = test_client.get(url, headers=dict(headers, **{"If-None-Match": etag}))
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+
+        # edits of the current version succeed and change the ETag
+        response = test_client.put(url, headers=dict(headers, **{"If-Match": etag}), json=body)
+        assert response.status_code == 204
+        response = test_client.get(url, headers=dict(headers, **{"If-None-Match": etag}))
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+        # edits of an outdated version are refused
+        response = test_client.put(url, headers=dict(headers, **{"If-Match": etag}), json=body)
+        assert response.status_code == 412
+        assert test_client.put(url, headers=headers, json=body).status_code == 204
+
+
+# Test that writes racing with other requests are refused instead of overwriting them
+def test_item_concurrent_writes(test_client, monkeypatch):
+    headers = get_local_api_key(test_client)
+    with app.app_context():
+        engine = db.engine
+
+    def concurrently(statement):
+        with engine.begin() as conn:
+            conn.exec_driver_sql(statement)
+
+    # a booking edited while the PUT waits for the allocation lock (which
+    # rolls back the session on contention) keeps the other edit
+    import resources.bookingitem
+    lock_allocation = resources.bookingitem.lock_allocation
+
+    def contended_lock(hotel_ids, room_types):
+        concurrently("UPDATE booking SET payment = 'cash', version = version + 1 WHERE booking_ref = 1004")
+        db.session.rollback()
+        lock_allocation(hotel_ids, room_types)
+
+    etag = test_client.get('/api/bookings/1004/', headers=headers).headers["ETag"]
+    booking = {"customer_id": 3, "hotel": "Hotel3", "room_type": "suite", "payment": "credit",
+               "check_in": "2024-03-01", "check_out": "2024-03-05"}
+    monkeypatch.setattr(resources.bookingitem, "lock_allocation", contended_lock)
+    response = test_client.put('/api/bookings/1004/', headers=dict(headers, **{"If-Match": etag}), json=booking)
+    monkeypatch.undo()
+    assert response.status_code == 412
+    assert test_client.get('/api/bookings/1004/', headers=headers).get_json()["item"][0]["payment"] == "cash"
+
+    # deletes of entities changed or deleted since they were loaded
+    customer = {"name": "Race Customer", "phone": "123", "mail": "race@example.com", "address": "Street 1"}
+    customer_id = test_client.post('/api/customers/', headers=headers, json=customer).get_json()["item"][0]["id"]
+    for url, statement, status in [
+            ('/api/bookings/1004/', "UPDATE booking SET version = version + 1 WHERE booking_ref = 1004", 412),
+            (f'/api/customers/{customer_id}/', f"DELETE FROM customer WHERE id = {customer_id}", 404)]:
+        event.listen(db.session, "before_flush", lambda *args: concurrently(statement), once=True)
+        assert test_client.delete(url, headers=headers).status_code == status
+
+
+# Test that migrate_db adds columns missing from an older database
+def test_migrate_db_adds_columns(test_client):
+    with app.app_context():
+        db.session.execute(db.text("ALTER TABLE customer DROP COLUMN version"))
+        db.session.commit()
+    assert migrate_db(app) == ["customer.version"]
+    with app.app_context():
+        assert {customer.version for customer in Customer.query} == {1}
+
+
+# Test that room searches are cached and dropped only by bookings they depend on
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_room_search_cache(test_client, backend):
+    if backend == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        cache = SearchCache(RedisBackend(fakeredis.FakeRedis()), 30)
+    else:
+        cache = SearchCache(MemoryBackend(16), 30)
+    headers = get_local_api_key(test_client)
+    search = '/api/rooms/?country=Finland&city=Oulu&room_type=double&check_in=2024-10-01&check_out=2024-10-03'
+    later = search.replace("2024-10-01", "2024-12-01").replace("2024-10-03", "2024-12-03")
+    suites = search.replace("double", "suite")
+
+    previous = app.extensions["search_cache"]
+    app.extensions["search_cache"] = cache
+    try:
+        first = test_client.get(search, headers=headers)
+        assert first.headers["X-Cache"] == "MISS"
+        second = test_client.get(search, headers=headers)
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.data == first.data
+        for url in (later, suites):
+            assert test_client.get(url, headers=headers).headers["X-Cache"] == "MISS"
+
+        # a double room booked for the searched nights drops only that search
+        booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+                   "check_in": "2024-10-02", "check_out": "2024-10-04"}
+        response = test_client.post('/api/bookings/', headers=headers, json=booking)
+        assert response.status_code == 201
+        response = test_client.get(search, headers=headers)
+        assert response.headers["X-Cache"] == "MISS"
+        assert len(json.loads(response.data)["items"]) == len(json.loads(first.data)["items"]) - 1
+        for url in (later, suites):
+            assert test_client.get(url, headers=headers).headers["X-Cache"] == "HIT"
+
+        # deleting a booking frees the room again
+        response = test_client.post('/api/bookings/', headers=headers, json=dict(
+            booking, check_in="2024-12-02", check_out="2024-12-04"))
+        location = json.loads(response.data)["item"][0]["@controls"]["self"]["href"]
+        assert test_client.get(later, headers=headers).headers["X-Cache"] == "MISS"
+        assert test_client.delete(location, headers=headers).status_code == 204
+        response = test_client.get(later, headers=headers)
+        assert response.headers["X-Cache"] == "MISS"
+        assert test_client.get(later, headers=headers).data == response.data
+
+        stats = cache.stats()
+        assert stats["hits"] == 4 and stats["misses"] == 6 and stats["invalidated"] == 3
+
+        # moving a booking whose room was deleted drops every dated search
+        with app.app_context():
+            db.session.execute(db.text("UPDATE booking SET room_id = NULL WHERE booking_ref = 1004"))
+            db.session.commit()
+        moved = {"customer_id": 3, "hotel": "Hotel3", "room_type": "suite", "payment": "credit",
+                 "check_in": "2025-01-01", "check_out": "2025-01-03"}
+        assert test_client.put('/api/bookings/1004/', headers=headers, json=moved).status_code == 204
+        for url in (search, later, suites):
+            assert test_client.get(url, headers=headers).headers["X-Cache"] == "MISS"
+    finally:
+        app.extensions["search_cache"] = previous
+
+
+# Test SQL statements per request of the booking and room endpoints (authentication is cached)
+def test_endpoint_query_counts(test_client):
+    headers = get_local_api_key(test_client)
+    test_client.get('/api/customers/1/', headers=headers)
+    booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+               "check_in": "2024-10-01", "check_out": "2024-10-03"}
+    moved = {"customer_id": 3, "hotel": "Hotel3", "room_type": "suite", "payment": "cash",
+             "check_in": "2024-03-10", "check_out": "2024-03-12"}
+    requests_and_budgets = [
+        # converter query with room, hotel and customer joined
+        ("get", '/api/bookings/1004/', {}, 1),
+        # hotel, customer, lock, free room, insert
+        ("post", '/api/bookings/', {"json": booking}, 5),
+        # hotel, customer, rooms, lock, bookings, insert
+        ("post", '/api/bookings/batch/', {"json": [dict(booking, check_in="2024-11-01", check_out="2024-11-03")]}, 6),
+        # converter, hotel, lock, free room, update, occupancy refresh
+        ("put", '/api/bookings/1004/', {"json": moved}, 6),
+        # converter, delete, occupancy refresh
+        ("delete", '/api/bookings/1004/', {}, 3),
+        ("get", '/api/rooms/?country=Finland&city=Oulu&check_in=2024-05-01&check_out=2024-05-03', {}, 1),
+        ("get", '/api/rooms/?country=Finland&city=Oulu&check_in=2024-05-02&check_out=2024-05-03&stream=1', {}, 1),
+    ]
+    for method, url, kwargs, budget in requests_and_budgets:
+        response, count = count_queries(test_client, method, url, headers=headers, **kwargs)
+        assert response.status_code < 300, f"{method} {url} returned {response.status_code}"
+        assert count <= budget, f"{method} {url} used {count} SQL statements, expected at most {budget}"
+
+
+# Test Server-Timing headers, timing log lines and profiles of the slowest requests
+def test_request_instrumentation(test_client, caplog, tmp_path):
+    headers = get_local_api_key(test_client)
+    previous = app.extensions["profiles"]
+    app.config.update(INSTRUMENTATION_ENABLED=True, PROFILE_MODE="cprofile", PROFILE_SAMPLE_RATE=1.0)
+    app.extensions["profiles"] = SlowestProfiles(str(tmp_path), 2)
+    try:
+        with caplog.at_level("INFO", logger="bookie.timing"):
+            for day in range(1, 4):
+                response = test_client.get(
+                    f'/api/rooms/?country=Finland&city=Oulu&check_in=2024-05-0{day}&check_out=2024-05-0{day + 1}',
+                    headers=headers)
+                assert response.status_code == 200
+                timing = response.headers["Server-Timing"]
+                assert "auth;dur=" in timing and "serialize;dur=" in timing and "total;dur=" in timing
+                assert 'sql;desc="' in timing
+    finally:
+        app.config.update(INSTRUMENTATION_ENABLED=False, PROFILE_MODE=None)
+        app.extensions["profiles"] = previous
+
+    lines = [json.loads(record.getMessage()) for record in caplog.records if record.name == "bookie.timing"]
+    assert [line["endpoint"] for line in lines] == ["roomcollection"] * 3
+    assert all(line["sql_count"] >= 1 and line["status"] == 200 for line in lines)
+    assert len(list(tmp_path.glob("*-roomcollection-*.prof"))) == 2
+
+    # nothing is recorded once disabled
+    assert "Server-Timing" not in test_client.get('/api/customers/1/', headers=headers).headers
+
+    # pyinstrument mode without the package fails at startup, not in requests
+    if Profiler is None:
+        with pytest.raises(RuntimeError):
+            create_app({"PROFILE_MODE": "pyinstrument", "SWAGGER_ENABLED": False,
+                        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'pyinstrument.db'}"})
+        app.config.update(INSTRUMENTATION_ENABLED=True, PROFILE_MODE="pyinstrument", PROFILE_SAMPLE_RATE=1.0)
+        try:
+            assert test_client.get('/api/customers/1/', headers=headers).status_code == 200
+        finally:
+            app.config.update(INSTRUMENTATION_ENABLED=False, PROFILE_MODE=None)
+
+
+# Test the Prometheus metrics of requests, conflicts, caches and the pool
+def test_metrics_endpoint(test_client):
+    headers = get_local_api_key(test_client)
+    previous = app.extensions["metrics"]
+    app.extensions["metrics"] = MetricsRegistry()
+    try:
+        booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+                   "check_in": "2024-08-01", "check_out": "2024-08-05"}
+        assert test_client.post('/api/bookings/', headers=headers, json=booking).status_code == 201
+        assert test_client.post('/api/bookings/', headers=headers, json=booking).status_code == 409
+        for _ in range(2):
+            assert test_client.get('/api/customers/1/', headers=headers).status_code == 200
+        response = test_client.get('/metrics')
+    finally:
+        app.extensions["metrics"] = previous
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    body = response.get_data(as_text=True)
+    assert 'bookie_requests_total{endpoint="bookingcollection",method="POST",status="201"} 1' in body
+    assert 'bookie_requests_total{endpoint="bookingcollection",method="POST",status="409"} 1' in body
+    assert 'bookie_requests_total{endpoint="customer",method="GET",status="200"} 2' in body
+    assert 'bookie_request_duration_seconds_bucket{endpoint="customer",le="+Inf"} 2' in body
+    assert 'bookie_request_duration_seconds_count{endpoint="customer"} 2' in body
+    assert 'bookie_booking_conflicts_total{endpoint="bookingcollection"} 1' in body
+    # the scrape itself is still in flight, everything else has finished
+    assert 'bookie_requests_in_flight{endpoint="metrics_view"} 1' in body
+    assert 'bookie_requests_in_flight{endpoint="customer"} 0' in body
+    assert 'bookie_cache_hits_total{cache="api_key"}' in body
+    assert 'bookie_cache_hit_ratio{cache="room_search"}' in body
+    assert "bookie_db_pool_checked_out" in body
+
+    # counters recorded by several threads are summed on scrape
+    registry = MetricsRegistry()
+
+    def record():
+        for _ in range(100):
+            registry.request_started("booking")
+            registry.request_finished("booking", "GET", 200, 0.002)
+            registry.request_ended("booking")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: record(), range(4)))
+    requests_total, in_flight, latency = registry.collect()
+    assert requests_total[("booking", "GET", 200)] == 400
+    assert in_flight["booking"] == 0
+    assert sum(latency["booking"][:-1]) == 400
+
+    # threads started per request are folded into one total when they finish
+    registry = MetricsRegistry()
+    for _ in range(200):
+        thread = threading.Thread(target=lambda: registry.request_finished("booking", "GET", 200, 0.002))
+        thread.start()
+        thread.join()
+        assert len(registry._threads) <= 1
+    requests_total, _, latency = registry.collect()
+    assert requests_total[("booking", "GET", 200)] == 200
+    assert sum(latency["booking"][:-1]) == 200
+    assert registry._threads == []
+
+
+# Test the synthetic datasets used by the load test
+def test_populate_synthetic(tmp_path):
+    other = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'synthetic.db'}", "SWAGGER_ENABLED": False})
+    counts = populate_synthetic(120, 5, app=other, chunk_size=64)
+    assert counts == {"hotel": 3, "admin": 3, "room": 120, "customer": 120, "booking": 600}
+
+    with other.app_context():
+        assert Hotel.query.filter_by(city="City1").count() == 3
+        assert Room.query.filter_by(hotel_id=3).count() == 20
+        # stays of a room never overlap
+        for room_id in (1, 60, 120):
+            stays = [(booking.check_in, booking.check_out)
+                     for booking in Booking.query.filter_by(room_id=room_id).order_by(Booking.check_in)]
+            assert len(stays) == 5
+            assert all(check_in < check_out for check_in, check_out in stays)
+            assert all(previous[1] <= following[0] for previous, following in zip(stays, stays[1:]))
+
+    # admins of the synthetic hotels can log in
+    response = other.test_client().post('/api/keys/', json={"username": "admin2", "password": SYNTHETIC_PASSWORD})
+    assert response.status_code == 201
+
+
+# Test loading a JSON file in chunks with progress reports
+def test_populate_db_chunks(tmp_path, capsys):
+    data = {
+        "hotels": [{"name": f"Chunk{hotel}", "country": "Finland", "city": "Oulu", "street": "-",
+                    "rooms": [{"number": number, "type": "single", "price": 80,
+                               "bookings": [{"booking_ref": hotel * 100 + number, "check_in": [2024, 5, 1],
+                                             "check_out": [2024, 5, 3], "payment": "cash"}]}
+                              for number in range(1, 4)],
+                    "admins": [{"username": f"chunk{hotel}", "password": "root"}]}
+                   for hotel in range(1, 4)],
+        "customers": [{"name": "Chunk Customer", "phone": "-", "mail": "chunk@example.com", "address": "-",
+                       "bookings": [ref for hotel in range(1, 4) for ref in (hotel * 100 + 1, hotel * 100 + 2)]}],
+    }
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(data))
+    other = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'chunks.db'}", "SWAGGER_ENABLED": False})
+    reports = []
+    counts = populate_db(other, str(path), chunk_size=2, progress=lambda *report: reports.append(report))
+
+    # bookings without a customer are skipped
+    assert counts == {"customer": 1, "hotel": 3, "room": 9, "admin": 3, "booking": 6}
+    assert "booking ref: 103" in capsys.readouterr().out
+    booked = [rows for table, rows, _ in reports if table == "booking"]
+    assert booked == sorted(booked) and booked[-1] == 6 and len(booked) > 1
+
+    with other.app_context():
+        assert {booking.room.hotel.name for booking in Booking.query} == {"Chunk1", "Chunk2", "Chunk3"}
+        assert all(booking.customer.mail == "chunk@example.com" for booking in Booking.query)
+        assert Admin.query.filter_by(username="chunk3").one().hotel.name == "Chunk3"
+
+    # conflicting data inserts nothing and reports no rows
+    assert populate_db(other, str(path), chunk_size=2) is None
+    with other.app_context():
+        assert Hotel.query.count() == 3 and Booking.query.count() == 6
+
+
+# Test that incremental parsing with ijson reads the same items as json.load
+def test_json_arrays_ijson(tmp_path, monkeypatch):
+    real_ijson = pytest.importorskip("ijson")
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"customers": [{"name": "Ijson", "bookings": [1, 2]}],
+                                "hotels": [{"name": "Ijson", "rooms": [{"price": 80.5, "bookings": []}]}]}))
+
+    monkeypatch.setattr(populate, "ijson", None)
+    loaded = populate.json_arrays(str(path))
+    expected = {name: list(loaded(name)) for name in ("customers", "hotels")}
+    monkeypatch.setattr(populate, "ijson", real_ijson)
+    parsed = populate.json_arrays(str(path))
+    for name in ("customers", "hotels"):
+        assert list(parsed(name)) == expected[name]
+        assert list(parsed(name)) == expected[name] # parsed again on every call
+
+
+# Test the streamed CSV/NDJSON export of bookings
+def test_booking_export(test_client):
+    headers = get_local_api_key(test_client)
+    booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+               "check_in": "2024-06-01", "check_out": "2024-06-03"}
+    booking_ref = test_client.post('/api/bookings/', headers=headers, json=booking).get_json()["item"][0]["booking_ref"]
+
+    # CSV of every booking of the admin's hotel (Hotel3 only)
+    response = test_client.get('/api/bookings/export/', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.headers["Content-Disposition"] == "attachment; filename=bookings.csv"
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "booking_ref,hotel,room_number,room_type,check_in,check_out,payment,customer_id,customer_name,customer_mail"
+    assert lines[1] == "1004,Hotel3,301,suite,2024-03-01,2024-03-04,credit,3,Mikko Mikkonen,mikko.mikkonen@gmail.com"
+    assert lines[2].startswith(f"{booking_ref},Hotel3,201,double,2024-06-01,2024-06-03,cash,1,")
+    assert len(lines) == 3
+
+    # NDJSON with filters
+    response = test_client.get('/api/bookings/export/?format=ndjson&hotel=Hotel3&payment=cash'
+                               '&check_in_from=2024-05-01&check_in_to=2024-07-01', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    items = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(item["booking_ref"], item["check_in"], item["customer_id"]) for item in items] == [(booking_ref, "2024-06-01", 1)]
+    response = test_client.get('/api/bookings/export/?format=ndjson&check_in_to=2024-03-01', headers=headers)
+    assert response.get_data() == b""
+
+    # other hotels and bad parameters are refused
+    assert test_client.get('/api/bookings/export/?hotel=Hotel1', headers=headers).status_code == 403
+    assert test_client.get('/api/bookings/export/?format=xml', headers=headers).status_code == 400
+    assert test_client.get('/api/bookings/export/?check_in_from=2024-13-01', headers=headers).status_code == 400
+    assert test_client.get('/api/bookings/export/').status_code == 400
+
+    # every hotel without the endpoint, small batches
+    with app.app_context():
+        chunks = list(export_chunks(export_rows(batch_size=2), "csv", batch_size=2))
+    assert len(chunks) == 3
+    assert [line.split(",")[0] for line in b"".join(chunks).decode().splitlines()[1:]] == ["1001", "1002", "1003", "1004", str(booking_ref)]
+
+
+# Test looking up several bookings by reference in one request
+def test_booking_collection_get_refs(test_client):
+    headers = get_local_api_key(test_client)
+    booking = {"customer_id": 1, "hotel": "Hotel3", "room_type": "double", "payment": "cash",
+               "check_in": "2024-06-01", "check_out": "2024-06-03"}
+    booking_ref = test_client.post('/api/bookings/', headers=headers, json=booking).get_json()["item"][0]["booking_ref"]
+
+    # one query for every booking, items in the order requested
+    response, count = count_queries(test_client, "get", f'/api/bookings/?refs={booking_ref},1004,9999,1004', headers=headers)
+    assert response.status_code == 200
+    assert count <= 1
+    body = response.get_json()
+    assert [item["booking_ref"] for item in body["items"]] == [booking_ref, 1004]
+    assert body["items"][1]["hotel"] == "Hotel3" and body["items"][1]["room_type"] == "suite"
+    assert body["items"][1]["@controls"]["self"]["href"] == "/api/bookings/1004/"
+    assert body["missing"] == [9999]
+    assert "bookie:add-booking" in body["@controls"]
+
+    # bookings of other hotels are refused as a whole
+    assert test_client.get('/api/bookings/?refs=1004,1001', headers=headers).status_code == 403
+
+    # bad refs
+    for refs in ("", "1004,x", ",".join(str(ref) for ref in range(1, 502))):
+        assert test_client.get(f'/api/bookings/?refs={refs}', headers=headers).status_code == 400
+    assert test_client.get('/api/bookings/?refs=1004').status_code == 400
+
+    # the collection control of a booking leads to an empty collection
+    href = test_client.get('/api/bookings/1004/', headers=headers).get_json()["@controls"]["collection"]["href"]
+    response = test_client.get(href, headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["items"], body["missing"]) == ([], [])
+    assert body["@controls"]["self"]["href"] == "/api/bookings/"
+    assert "bookie:add-booking" in body["@controls"]
+
+
+# Test customer search filters and keyset pagination
+def test_customer_collection_get(test_client):
+    headers = get_local_api_key(test_client)
+
+    # name prefix is case-insensitive, mail and phone match exactly
+    body = test_client.get('/api/customers/?name=mAi', headers=headers).get_json()
+    assert [item["name"] for item in body["items"]] == ["Maija Meikalainen"]
+    assert body["items"][0]["@controls"]["self"]["href"] == "/api/customers/2/"
+    assert "bookie:add-customer" in body["@controls"]
+    body = test_client.get('/api/customers/?mail=mikko.mikkonen@gmail.com', headers=headers).get_json()
+    assert [item["id"] for item in body["items"]] == [3]
+    body = test_client.get('/api/customers/?phone=NaN&name=M', headers=headers).get_json()
+    assert [item["id"] for item in body["items"]] == [1, 2, 3]
+    response = test_client.get('/api/customers/?name=zz', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["items"] == []
+
+    # pages follow the next and prev controls with the same filters
+    body = test_client.get('/api/customers/?name=m&limit=2', headers=headers).get_json()
+    assert [item["id"] for item in body["items"]] == [1, 2]
+    assert "prev" not in body["@controls"]
+    body = test_client.get(body["@controls"]["next"]["href"], headers=headers).get_json()
+    assert [item["id"] for item in body["items"]] == [3]
+    assert "next" not in body["@controls"]
+    body = test_client.get(body["@controls"]["prev"]["href"], headers=headers).get_json()
+    assert [item["id"] for item in body["items"]] == [1, 2]
+
+    # bad parameters and missing authentication
+    assert test_client.get('/api/customers/?cursor=bad', headers=headers).status_code == 400
+    assert test_client.get('/api/customers/?limit=0', headers=headers).status_code == 400
+    assert test_client.get('/api/customers/').status_code == 400
@@ -0,0 +1,78 @@
+""" Request body validation for Hotel-Booking-Assistant API """
+
+# IMPORTS
+import threading
+from jsonschema import Draft7Validator, draft7_format_checker
+from jsonschema.exceptions import best_match
+
+# fastjsonschema (optional) generates a plain Python function per schema
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+# formats are checked with the jsonschema checkers so both paths agree
+FAST_FORMATS = {
+    name: (lambda value, name=name: draft7_format_checker.conforms(value, name))
+    for name in ("date", "email")
+}
+
+class CompiledSchema:
+
+    """
+    Validator for a single model schema, built once and reused.
+    The generated fast path only answers "valid or not", errors are always
+    reported by jsonschema so messages stay the same.
+    """
+
+    def __init__(self, schema):
+        Draft7Validator.check_schema(schema)
+        self.validator = Draft7Validator(schema, format_checker=draft7_format_checker)
+        self.fast = None
+        if fastjsonschema is not None:
+            self.fast = fastjsonschema.compile(dict(schema), formats=FAST_FORMATS)
+
+    def validate(self, instance):
+        """
+        Raise the most relevant ValidationError, like jsonschema.validate
+        """
+        if self.fast is not None:
+            try:
+                self.fast(instance)
+                return
+            except fastjsonschema.JsonSchemaException:
+                pass
+        error = best_match(self.validator.iter_errors(instance))
+        if error is not None:
+            raise error
+
+class ValidatorRegistry:
+
+    """
+    Compiled validators per model, created on first use
+    """
+
+    def __init__(self):
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def get(self, model):
+        """
+        Return the CompiledSchema for model.json_schema()
+        """
+        compiled = self._compiled.get(model)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(model)
+                if compiled is None:
+                    compiled = self._compiled[model] = CompiledSchema(model.json_schema())
+        return compiled
+
+validators = ValidatorRegistry()
+
+def validate_request(model, instance):
+    """
+    Validate a request body against the schema of the given model.
+    Raises jsonschema.ValidationError if the body is not valid.
+    """
+    validators.get(model).validate(instance)